@@ -96,6 +96,38 @@ def disjoint_5(*sets):
     return disjoint, joint
 
 
+def disjoint_union_find(*sets):
+    parents = list(range(len(sets)))
+
+    def find(i):
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    first_seen = {}
+    for i, s in enumerate(sets):
+        for item in s:
+            j = first_seen.setdefault(item, i)
+            if j != i:
+                parents[find(i)] = find(j)
+
+    sizes = {}
+    for i in range(len(sets)):
+        root = find(i)
+        sizes[root] = sizes.get(root, 0) + 1
+
+    disjoint = set()
+    joint = set()
+    for i, s in enumerate(sets):
+        if sizes[find(i)] == 1:
+            disjoint.add(s)
+        else:
+            joint.add(s)
+
+    return disjoint, joint
+
+
 def setup():
     return tuple(
         frozenset(
@@ -109,6 +141,21 @@ def setup():
 data = setup()
 
 
+def setup_children(n, *, transcript_size=40):
+    """
+    Something like a general-education audit: many children, each matching a
+    handful of the courses on one transcript.
+    """
+    rng = random.Random(n)
+    return tuple(
+        frozenset(rng.sample(range(transcript_size), rng.randrange(0, 4)))
+        for _ in range(n)
+    )
+
+
+children = {n: setup_children(n) for n in (50, 100, 200)}
+
+
 def test_disjoint():
     dis_1, joint_1 = find_entirely_disjoint_sets(*data)
     dis_2, joint_2 = disjoint_2(*data)
@@ -120,6 +167,11 @@ def test_disjoint():
     assert joint_1 == joint_2 == joint_3 == joint_4 == joint_5
 
 
+@pytest.mark.parametrize("n", sorted(children))
+def test_union_find_disjoint(n):
+    assert disjoint_union_find(*children[n]) == disjoint_5(*children[n])
+
+
 @pytest.mark.benchmark(group="disjoint")
 def test_disjoint_1(benchmark):
     dis, joint = benchmark(find_entirely_disjoint_sets, *data)
@@ -143,3 +195,20 @@ def test_disjoint_4(benchmark):
 @pytest.mark.benchmark(group="disjoint")
 def test_disjoint_5(benchmark):
     dis_5, joint_5 = benchmark(disjoint_5, *data)
+
+
+@pytest.mark.benchmark(group="disjoint")
+def test_disjoint_union_find(benchmark):
+    dis, joint = benchmark(disjoint_union_find, *data)
+
+
+@pytest.mark.parametrize("n", sorted(children))
+@pytest.mark.benchmark(group="disjoint-scaling")
+def test_scaling_pairwise(benchmark, n):
+    dis, joint = benchmark(disjoint_5, *children[n])
+
+
+@pytest.mark.parametrize("n", sorted(children))
+@pytest.mark.benchmark(group="disjoint-scaling")
+def test_scaling_union_find(benchmark, n):
+    dis, joint = benchmark(disjoint_union_find, *children[n])
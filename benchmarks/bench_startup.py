@@ -0,0 +1,30 @@
+import pathlib
+import subprocess
+import sys
+import pytest
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+
+def run(*args):
+    subprocess.run([sys.executable, *args], cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+
+
+@pytest.mark.benchmark(group="startup")
+def test_startup_bare_interpreter(benchmark):
+    benchmark(run, '-c', 'pass')
+
+
+@pytest.mark.benchmark(group="startup")
+def test_startup_dp_help(benchmark):
+    benchmark(run, 'dp.py', '--help')
+
+
+@pytest.mark.benchmark(group="startup")
+def test_startup_import_engine(benchmark):
+    benchmark(run, '-c', 'import degreepath.audit, degreepath.area_cache')
+
+
+@pytest.mark.benchmark(group="startup")
+def test_startup_import_common(benchmark):
+    benchmark(run, '-c', 'from degreepath.entrypoint import load_common; load_common()')
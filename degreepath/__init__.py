@@ -1,6 +1,39 @@
 # flake8: noqa
 
-from .data import CourseInstance, AreaPointer, load_course
-from .area import AreaOfStudy
-from .constants import Constants
-from .exception import load_exception
+# The names below are imported from their submodules on first use, rather
+# than when the package is imported, so that importing a small, self-contained
+# module (say, degreepath.ms from a CLI that was only asked for --help) doesn't
+# drag in the whole engine.
+
+from typing import Any, Dict, TYPE_CHECKING
+import importlib
+import sys
+
+# Module-level __getattr__ (PEP 562) is new in Python 3.7, so 3.6 imports
+# the names eagerly, as it always has.
+if TYPE_CHECKING or sys.version_info < (3, 7):
+    from .data import CourseInstance, AreaPointer, load_course
+    from .area import AreaOfStudy
+    from .constants import Constants
+    from .exception import load_exception
+
+_exports: Dict[str, str] = {
+    'CourseInstance': '.data',
+    'AreaPointer': '.data',
+    'load_course': '.data',
+    'AreaOfStudy': '.area',
+    'Constants': '.constants',
+    'load_exception': '.exception',
+}
+
+__all__ = list(_exports.keys())
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _exports.get(name, None)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,242 @@
+from typing import Dict, Tuple, List, Optional, Iterator, Any
+import contextlib
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tarfile
+import tempfile
+import zlib
+
+from .cache import cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Finding one student in a tar archive with the tarfile module means reading
+# every header that comes before them (and, for a compressed archive,
+# decompressing everything before them, too). Each process that audits a
+# student from an archive paid that cost again.
+#
+# Instead, an archive gets a sidecar index, built the first time that it's
+# opened and reused until the archive changes:
+#
+#     archive.tar.dpindex     JSON: the archive's size and mtime, and an
+#                             (offset, length) span for each member
+#     archive.tar.dpchunks    for compressed archives only: each member,
+#                             compressed on its own, so that any one of
+#                             them can be read without the others
+#
+# For an uncompressed tar, the spans point into the archive itself, which is
+# memory-mapped. For a compressed one, they point into the chunks file.
+#
+# If the archive's directory isn't writable, the sidecars go into the
+# `archives` cache directory (or the system's temporary directory) instead.
+
+INDEX_SUFFIX = '.dpindex'
+CHUNKS_SUFFIX = '.dpchunks'
+INDEX_VERSION = 1
+
+# gzip, bzip2, and xz
+COMPRESSED_MAGIC = (b'\x1f\x8b', b'BZh', b'\xfd7zXZ\x00')
+
+Span = Tuple[int, int]
+
+
+class ArchiveIndex:
+    def __init__(self, *, members: Dict[str, Span], chunked: bool, stamp: Tuple[int, int]) -> None:
+        self.members = members
+        self.chunked = chunked
+        self.stamp = stamp
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'version': INDEX_VERSION,
+            'stamp': list(self.stamp),
+            'chunked': self.chunked,
+            'members': self.members,
+        })
+
+    @staticmethod
+    def from_json(data: Dict[str, Any]) -> Optional['ArchiveIndex']:
+        if data.get('version', None) != INDEX_VERSION:
+            return None
+
+        return ArchiveIndex(
+            members={name: (offset, length) for name, (offset, length) in data['members'].items()},
+            chunked=data['chunked'],
+            stamp=(data['stamp'][0], data['stamp'][1]),
+        )
+
+
+def archive_stamp(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def is_compressed(path: str) -> bool:
+    with open(path, 'rb') as infile:
+        head = infile.read(6)
+    return any(head.startswith(magic) for magic in COMPRESSED_MAGIC)
+
+
+def sidecar_base(path: str) -> str:
+    """Returns the path that the archive's sidecar files are named after."""
+    path = os.path.abspath(path)
+    if os.access(os.path.dirname(path), os.W_OK):
+        return path
+
+    directory = cache_dir('archives') or os.path.join(tempfile.gettempdir(), 'degreepath-archives')
+    os.makedirs(directory, exist_ok=True)
+    name = hashlib.sha256(path.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(directory, f"{name}-{os.path.basename(path)}")
+
+
+_indexes: Dict[str, ArchiveIndex] = {}
+
+
+def load_index(path: str) -> ArchiveIndex:
+    """
+    Returns the index for the archive, reading it from its sidecar, or
+    building (and saving) it if it's missing or stale.
+    """
+    stamp = archive_stamp(path)
+
+    index = _indexes.get(path, None)
+    if index is not None and index.stamp == stamp:
+        return index
+
+    index = read_index(path, stamp=stamp)
+    if index is None:
+        index = build_index(path)
+
+    _indexes[path] = index
+    return index
+
+
+def read_index(path: str, *, stamp: Tuple[int, int]) -> Optional[ArchiveIndex]:
+    base = sidecar_base(path)
+    try:
+        with open(base + INDEX_SUFFIX, 'r', encoding='utf-8') as infile:
+            index = ArchiveIndex.from_json(json.load(infile))
+    except FileNotFoundError:
+        return None
+    except Exception as ex:
+        logger.warning("could not read the index for %s: %s", path, ex)
+        return None
+
+    if index is None or index.stamp != stamp:
+        return None
+
+    if index.chunked and not os.path.exists(base + CHUNKS_SUFFIX):
+        return None
+
+    return index
+
+
+def build_index(path: str) -> ArchiveIndex:
+    """Scans the archive once, and writes its index (and chunks) alongside it."""
+    stamp = archive_stamp(path)
+    chunked = is_compressed(path)
+    members: Dict[str, Span] = {}
+
+    base = sidecar_base(path)
+    directory = os.path.dirname(base)
+    temporary: List[str] = []
+
+    try:
+        chunks = None
+        if chunked:
+            fd, chunks_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            temporary.append(chunks_path)
+            chunks = os.fdopen(fd, 'wb')
+
+        with tarfile.open(path, 'r') as tarball:
+            for member in tarball:
+                if not member.isfile():
+                    continue
+
+                if chunks is None:
+                    members[member.name] = (member.offset_data, member.size)
+                    continue
+
+                data = tarball.extractfile(member)
+                assert data is not None
+                compressed = zlib.compress(data.read())
+                members[member.name] = (chunks.tell(), len(compressed))
+                chunks.write(compressed)
+
+        if chunks is not None:
+            chunks.close()
+            os.replace(chunks_path, base + CHUNKS_SUFFIX)
+
+        index = ArchiveIndex(members=members, chunked=chunked, stamp=stamp)
+
+        # write to a temporary file and then move it into place, so that
+        # concurrent readers never see a partially-written index
+        fd, index_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        temporary.append(index_path)
+        with os.fdopen(fd, 'w', encoding='utf-8') as outfile:
+            outfile.write(index.to_json())
+        os.replace(index_path, base + INDEX_SUFFIX)
+
+    finally:
+        for leftover in temporary:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(leftover)
+
+    logger.info("indexed %s members of %s", len(members), path)
+    return index
+
+
+class IndexedArchive:
+    """
+    A read-only view of a tar archive's members, through its sidecar index.
+
+    >>> import io, tarfile, tempfile, os
+    >>> path = os.path.join(tempfile.mkdtemp(), 'students.tar')
+    >>> with tarfile.open(path, 'w') as tarball:
+    ...     info = tarfile.TarInfo('1.json'); info.size = 2
+    ...     tarball.addfile(info, io.BytesIO(b'{}'))
+    >>> with IndexedArchive.open(path) as archive:
+    ...     archive.read('1.json')
+    b'{}'
+    """
+
+    def __init__(self, buffer: Any, *, index: ArchiveIndex) -> None:
+        self._buffer = buffer
+        self._index = index
+
+    @staticmethod
+    @contextlib.contextmanager
+    def open(path: str) -> Iterator['IndexedArchive']:
+        index = load_index(path)
+        source = sidecar_base(path) + CHUNKS_SUFFIX if index.chunked else path
+
+        with open(source, 'rb') as infile:
+            # mmap refuses to map an empty file (an archive with no members)
+            if os.fstat(infile.fileno()).st_size == 0:
+                yield IndexedArchive(b'', index=index)
+                return
+
+            with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                yield IndexedArchive(buffer, index=index)
+
+    def names(self) -> List[str]:
+        return list(self._index.members.keys())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index.members
+
+    def read(self, name: str) -> bytes:
+        try:
+            offset, length = self._index.members[name]
+        except KeyError:
+            raise KeyError(f'{name} is not in this archive') from None
+
+        data: bytes = self._buffer[offset:offset + length]
+        return zlib.decompress(data) if self._index.chunked else data
+
+
+def clear_index_cache() -> None:
+    _indexes.clear()
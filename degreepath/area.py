@@ -1,19 +1,25 @@
 import attr
-from typing import Dict, List, Tuple, Optional, Sequence, Iterator, Iterable, Any, TYPE_CHECKING
+from typing import Dict, List, Set, Tuple, Optional, Sequence, Iterator, Iterable, FrozenSet, Any, TYPE_CHECKING
+from concurrent.futures import Executor
+from functools import lru_cache
 import logging
 import decimal
 
 from .base import Solution, Result, Rule, Base, Summable
 from .constants import Constants
-from .context import RequirementContext
+from .context import RequirementContext, TranscriptIndexes, SubtreeCache
 from .data import CourseInstance, AreaPointer, AreaType
 from .exception import RuleException, InsertionException
 from .limit import LimitSet
 from .load_rule import load_rule
 from .result.count import CountResult
+from .rule.count import CountRule
+from .rule.query import QueryRule
+from .rule.requirement import RequirementRule
 from .result.requirement import RequirementResult
 from .lib import grade_point_average
 from .solve import find_best_solution
+from .warm_start import SearchHints
 
 if TYPE_CHECKING:
     from .claim import ClaimAttempt  # noqa: F401
@@ -120,12 +126,33 @@ class AreaOfStudy(Base):
             limit=limit,
             path=('$',),
             code=this_code,
-            common_rules=tuple(prepare_common_rules(
-                other_areas=tuple(areas),
+            common_rules=common_rules_for(
+                other_area_codes=frozenset(p.code for p in areas),
                 dept_code=dept,
                 degree=degree,
                 area_code=this_code,
-            ))
+            ),
+        )
+
+    def with_areas(self, areas: Sequence[AreaPointer]) -> 'AreaOfStudy':
+        """
+        Re-attaches the parts of an area that depend on the student's other
+        areas of study (the department pointer, and the common major
+        requirements). This lets a loaded area be reused between students.
+        """
+        pointers = {p.code: p for p in areas}
+        this_pointer = pointers.get(self.code, None)
+        dept = this_pointer.dept if this_pointer else None
+
+        return attr.evolve(
+            self,
+            dept=dept,
+            common_rules=common_rules_for(
+                other_area_codes=frozenset(p.code for p in areas),
+                dept_code=dept,
+                degree=self.degree,
+                area_code=self.code,
+            ),
         )
 
     def validate(self) -> None:
@@ -139,13 +166,25 @@ class AreaOfStudy(Base):
         transcript_with_failed: Sequence[CourseInstance] = tuple(),
         areas: Sequence[AreaPointer],
         exceptions: List[RuleException],
+        hints: Optional[SearchHints] = None,
+        indexes: Optional[TranscriptIndexes] = None,
+        executor: Optional[Executor] = None,
     ) -> Iterable['AreaSolution']:
         logger.debug("evaluating area.result")
 
         forced_clbids = set(e.clbid for e in exceptions if isinstance(e, InsertionException) and e.forced is True)
         forced_courses = {c.clbid: c for c in transcript if c.clbid in forced_clbids}
 
-        for limited_transcript in self.limit.limited_transcripts(courses=transcript):
+        # A query that doesn't claim its courses judges its whole item set,
+        # so it may pass with fewer of the limited courses than the largest
+        # transcripts have; then we need every limited transcript.
+        maximal = not has_unclaimed_query(self.result)
+
+        # most of the rule tree can't see the limited courses, so what it
+        # finds for one limited transcript is kept for the next ones
+        subtree_cache = SubtreeCache() if self.limit.count_limited_transcripts(transcript, maximal=maximal) > 1 else None
+
+        for limited_transcript in self.limit.limited_transcripts(courses=transcript, maximal=maximal):
             limited_transcript = tuple(sorted(limited_transcript))
 
             logger.debug("%s evaluating area.result with limited transcript", limited_transcript)
@@ -154,6 +193,11 @@ class AreaOfStudy(Base):
                 areas=tuple(areas),
                 exceptions=exceptions,
                 multicountable=self.multicountable,
+                hints=hints,
+                indexes=indexes,
+                area_rule=self.result,
+                executor=executor,
+                subtree_cache=subtree_cache,
             ).with_transcript(limited_transcript, forced=forced_courses, including_failed=transcript_with_failed)
 
             for sol in self.result.solutions(ctx=ctx, depth=1):
@@ -165,7 +209,7 @@ class AreaOfStudy(Base):
     def estimate(self, *, transcript: Tuple[CourseInstance, ...], areas: Tuple[AreaPointer, ...]) -> int:
         iterations = 0
 
-        for limited_transcript in self.limit.limited_transcripts(courses=transcript):
+        for limited_transcript in self.limit.limited_transcripts(courses=transcript, maximal=not has_unclaimed_query(self.result)):
             ctx = RequirementContext(
                 areas=areas,
                 multicountable=self.multicountable,
@@ -309,6 +353,9 @@ class AreaResult(AreaOfStudy, Result):
     def claims(self) -> List['ClaimAttempt']:
         return self.result.claims()
 
+    def matched(self) -> Set[CourseInstance]:
+        return self.result.matched()
+
     def claims_for_gpa(self) -> List['ClaimAttempt']:
         return self.result.claims_for_gpa()
 
@@ -316,22 +363,56 @@ class AreaResult(AreaOfStudy, Result):
         return self.result.was_overridden()
 
 
+def has_unclaimed_query(rule: Optional[Base]) -> bool:
+    """Checks whether any query in the rule tree has `claim: false`."""
+    if isinstance(rule, CountRule):
+        return any(has_unclaimed_query(item) for item in rule.items)
+
+    if isinstance(rule, RequirementRule):
+        return has_unclaimed_query(rule.result)
+
+    if isinstance(rule, QueryRule):
+        return not rule.attempt_claims
+
+    return False
+
+
+@lru_cache(256)
+def common_rules_for(
+    *,
+    degree: Optional[str],
+    dept_code: Optional[str],
+    other_area_codes: FrozenSet[str] = frozenset(),
+    area_code: str,
+) -> Tuple[Rule, ...]:
+    """
+    The common major requirements only vary by a handful of inputs, so we
+    share them between every area (and every student) that has the same ones.
+    """
+    return tuple(prepare_common_rules(
+        degree=degree,
+        dept_code=dept_code,
+        other_area_codes=other_area_codes,
+        area_code=area_code,
+    ))
+
+
 def prepare_common_rules(
     *,
     degree: Optional[str],
     dept_code: Optional[str],
-    other_areas: Tuple[AreaPointer, ...] = tuple(),
+    other_area_codes: Iterable[str] = tuple(),
     area_code: str,
 ) -> Iterator[Rule]:
     c = Constants(matriculation_year=0)
 
-    other_area_codes = set(p.code for p in other_areas if p.code != area_code)
+    other_codes = set(code for code in other_area_codes if code != area_code)
 
     studio_art_code = '140'
     art_history_code = '135'
     is_history_and_studio = \
-        (area_code == studio_art_code and art_history_code in other_area_codes)\
-        or (area_code == art_history_code and studio_art_code in other_area_codes)
+        (area_code == studio_art_code and art_history_code in other_codes)\
+        or (area_code == art_history_code and studio_art_code in other_codes)
 
     if is_history_and_studio:
         credits_message = " Students who double-major in studio art and art history are required to complete at least 18 full-course credits outside the SIS 'ART' subject code."
@@ -0,0 +1,165 @@
+from typing import Dict, Tuple, Sequence, Any, Optional, cast
+import hashlib
+import logging
+
+from .area import AreaOfStudy
+from .constants import Constants
+from .data import CourseInstance, AreaPointer, AreaType
+from .cache import cache_dir, engine_version, read_pickle, write_pickle
+
+logger = logging.getLogger(__name__)
+
+_specifications: Dict[str, Dict[str, Any]] = {}
+_areas: Dict[str, AreaOfStudy] = {}
+
+
+def load_area_file(
+    path: str,
+    *,
+    c: Constants,
+    areas: Sequence[AreaPointer] = tuple(),
+    transcript: Sequence[CourseInstance] = tuple(),
+    cache_root: Optional[str] = None,
+) -> AreaOfStudy:
+    """
+    Loads (and validates) an area of study from a YAML file, reusing the
+    parsed specification and the loaded rules whenever the file's content
+    has been seen before.
+
+    Loading happens in two stages. The first stage (parsing the YAML and
+    building the rule tree) only depends on the file, the constants, and the
+    emphases that the student has declared, so it is cached in-process and,
+    if DP_CACHE_DIR is set, on disk. The second stage attaches the parts that
+    depend on the student's other areas, which is cheap.
+
+    Areas with `if:` requirements are evaluated against the transcript while
+    they load, so their rules are rebuilt for every student.
+    """
+    with open(path, 'rb') as infile:
+        raw = infile.read()
+
+    return load_area_source(raw, digest=specification_digest(raw), c=c, areas=areas, transcript=transcript, cache_root=cache_root)
+
+
+def load_area_source(
+    raw: bytes,
+    *,
+    digest: str,
+    c: Constants,
+    areas: Sequence[AreaPointer] = tuple(),
+    transcript: Sequence[CourseInstance] = tuple(),
+    cache_root: Optional[str] = None,
+) -> AreaOfStudy:
+    """Like load_area_file, for a specification that has already been read (and hashed)."""
+    specification = load_specification(raw, digest=digest, cache_root=cache_root)
+
+    return load_area(specification, digest=digest, c=c, areas=areas, transcript=transcript, cache_root=cache_root)
+
+
+def specification_digest(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def load_specification(raw: bytes, *, digest: str, cache_root: Optional[str] = None) -> Dict[str, Any]:
+    specification = _specifications.get(digest, None)
+    if specification is not None:
+        return specification
+
+    directory = cache_dir('specs', root=cache_root)
+    if directory:
+        specification = read_pickle(directory, digest)
+
+    if specification is None:
+        logger.debug("parsing area specification %s", digest)
+        specification = parse_specification(raw)
+
+        if directory:
+            write_pickle(directory, digest, specification)
+
+    _specifications[digest] = specification
+    return specification
+
+
+def parse_specification(raw: bytes) -> Dict[str, Any]:
+    # yaml is imported here, rather than at the top of the module, because
+    # runs that are served from the on-disk cache never need it
+    import yaml
+
+    # prefer the libyaml-backed loader when it's available; it is much faster
+    # than the pure-Python one
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+    return cast(Dict[str, Any], yaml.load(stream=raw, Loader=loader))
+
+
+def load_area(
+    specification: Dict[str, Any],
+    *,
+    digest: str,
+    c: Constants,
+    areas: Sequence[AreaPointer] = tuple(),
+    transcript: Sequence[CourseInstance] = tuple(),
+    cache_root: Optional[str] = None,
+) -> AreaOfStudy:
+    if is_conditional(specification):
+        logger.debug("area %s has conditional requirements; skipping the rule cache", digest)
+        conditional_area = AreaOfStudy.load(specification=specification, c=c, areas=areas, transcript=transcript)
+        conditional_area.validate()
+        return conditional_area
+
+    emphasis_codes = selected_emphases(specification, areas=areas)
+    key = hashlib.sha256(repr((digest, c, emphasis_codes, engine_version())).encode('utf-8')).hexdigest()
+
+    area: Optional[AreaOfStudy] = _areas.get(key, None)
+
+    if area is None:
+        directory = cache_dir('areas', root=cache_root)
+        if directory:
+            area = read_pickle(directory, key)
+
+        if area is None:
+            logger.debug("loading area %s", digest)
+            emphasis_pointers = [p for p in areas if p.kind is AreaType.Emphasis and str(p.code) in emphasis_codes]
+            area = AreaOfStudy.load(specification=specification, c=c, areas=emphasis_pointers)
+            area.validate()
+
+            if directory:
+                write_pickle(directory, key, area)
+
+        _areas[key] = area
+
+    return area.with_areas(areas)
+
+
+def selected_emphases(specification: Dict[str, Any], *, areas: Sequence[AreaPointer]) -> Tuple[str, ...]:
+    declared_emphasis_codes = set(str(a.code) for a in areas if a.kind is AreaType.Emphasis)
+
+    return tuple(sorted(
+        str(code)
+        for code in specification.get('emphases', {}).keys()
+        if str(code) in declared_emphasis_codes
+    ))
+
+
+def is_conditional(data: Any) -> bool:
+    """
+    >>> is_conditional({'requirements': {'A': {'if': {}, 'result': {}}}})
+    True
+    >>> is_conditional({'requirements': {'A': {'result': {'course': 'A 101'}}}})
+    False
+    """
+    if isinstance(data, dict):
+        if 'if' in data:
+            return True
+        return any(is_conditional(v) for v in data.values())
+
+    if isinstance(data, list):
+        return any(is_conditional(v) for v in data)
+
+    return False
+
+
+def clear_area_cache() -> None:
+    """Empties the in-process registries (but not the on-disk cache)."""
+    _specifications.clear()
+    _areas.clear()
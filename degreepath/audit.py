@@ -1,5 +1,6 @@
 import attr
 from typing import List, Optional, Tuple, Sequence, Iterator, Union, Dict, Any, cast
+from concurrent.futures import Executor
 from datetime import datetime
 from decimal import Decimal
 import time
@@ -10,6 +11,8 @@ from .area import AreaOfStudy, AreaResult
 from .ms import pretty_ms
 from .data import CourseInstance, AreaPointer
 from .discover_potentials import discover_clause_potential
+from .warm_start import SearchHints
+from .context import TranscriptIndexes
 
 
 @attr.s(slots=True, kw_only=True, auto_attribs=True)
@@ -17,8 +20,12 @@ class Arguments:
     area_files: List[str]
     student_files: List[str]
     archive_file: Optional[str]
+    cohort_file: Optional[str] = None
     print_all: bool = False
     estimate_only: bool = False
+    dedupe: bool = False
+    warm_start_file: Optional[str] = None
+    solver_workers: int = 0
 
 
 @attr.s(slots=True, kw_only=True, auto_attribs=True)
@@ -90,6 +97,9 @@ def audit(
     area_pointers: Sequence[AreaPointer],
     print_all: bool,
     estimate_only: bool,
+    warm_start: Optional[SearchHints] = None,
+    indexes: Optional[TranscriptIndexes] = None,
+    executor: Optional[Executor] = None,
 ) -> Iterator[Message]:  # noqa: C901
     best_sol: Optional[AreaResult] = None
     total_count = 0
@@ -112,6 +122,9 @@ def audit(
         areas=tuple(area_pointers),
         exceptions=exceptions,
         transcript_with_failed=transcript_with_failed,
+        hints=warm_start,
+        indexes=indexes,
+        executor=executor,
     ):
         if total_count == 0:
             startup_time = time.perf_counter() - iter_start
@@ -1,6 +1,6 @@
 # flake8: noqa
 
-from .bases import Base, Rule, Result, Solution, ResultStatus, RuleState, Summable, sort_by_path
+from .bases import Base, Rule, Result, Solution, ResultStatus, RuleState, Summable, sort_by_path, memoized
 from .course import BaseCourseRule
 from .count import BaseCountRule
 from .query import BaseQueryRule
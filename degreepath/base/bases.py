@@ -1,9 +1,9 @@
 import abc
-from typing import Iterator, Dict, Set, Any, List, Tuple, Collection, Optional, Union, TYPE_CHECKING
+from typing import Iterator, Dict, Set, Any, List, Tuple, Collection, Optional, Union, Callable, TypeVar, cast, TYPE_CHECKING
 from decimal import Decimal
 import enum
 import attr
-from functools import cmp_to_key, lru_cache
+from functools import wraps
 from ..status import ResultStatus
 
 if TYPE_CHECKING:
@@ -14,6 +14,8 @@ if TYPE_CHECKING:
 
 Summable = Union[int, Decimal]
 
+F = TypeVar('F', bound=Callable[..., Any])
+
 
 @enum.unique
 class RuleState(enum.Enum):
@@ -95,6 +97,27 @@ class Base(abc.ABC):
         return False
 
 
+# A result is never changed after it's built, but asking the root of a result
+# tree for its rank, status, or claims asks every node below it, and the audit
+# loop and the output both ask the root over and over. Result classes with
+# children keep a `memo_` dict, so that each of those aggregates is computed
+# once per node, from the already-computed values of its children.
+
+
+def memoized(method: F) -> F:
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self: Any) -> Any:
+        try:
+            return self.memo_[name]
+        except KeyError:
+            value = self.memo_[name] = method(self)
+            return value
+
+    return cast(F, wrapper)
+
+
 class Result(Base):
     __slots__ = ()
 
@@ -144,64 +167,43 @@ class Rule(Base):
         raise NotImplementedError(f'must define an all_matches() method')
 
 
-def compare_path_tuples(a: Base, b: Base) -> int:
-    if a.path == b.path:
-        # a equals b
-        return 0
-    elif compare_path_tuples__lt(a.path, b.path):
-        # a is less-than b
-        return -1
-    else:
-        # a is greater than b
-        return 1
+# (length, kind, segment, kind, segment, ...), where indices are kind 0 and
+# are compared as numbers, and every other segment is kind 1
+PathSortKey = Tuple[Union[int, str], ...]
 
+_path_sort_keys: Dict[Tuple[str, ...], PathSortKey] = {}
 
-sort_by_path = cmp_to_key(compare_path_tuples)
 
+def sort_by_path(item: Base) -> PathSortKey:
+    key = _path_sort_keys.get(item.path, None)
+    if key is None:
+        if len(_path_sort_keys) >= 16_384:
+            _path_sort_keys.clear()
+        key = _path_sort_keys[item.path] = path_sort_key(item.path)
+    return key
 
-@lru_cache(2048)
-def compare_path_tuples__lt(a: Tuple[str, ...], b: Tuple[str, ...]) -> bool:
+
+def path_sort_key(path: Tuple[str, ...]) -> PathSortKey:
     """
-    >>> compare_path_tuples__lt(('$', '.count', '[2]'), ('$', '.count', '[10]'))
+    Returns a key that orders paths: shorter paths first, and then segment
+    by segment, with indices compared as numbers and placed before any other
+    segment.
+
+    >>> path_sort_key(('$', '.count', '[2]')) < path_sort_key(('$', '.count', '[10]'))
     True
-    >>> compare_path_tuples__lt(('$', '.count'), ('$', '[10]'))
+    >>> path_sort_key(('$', '.count')) < path_sort_key(('$', '[10]'))
     False
-    >>> compare_path_tuples__lt(('$', '[10]'), ('$', '.count'))
+    >>> path_sort_key(('$', '[10]')) < path_sort_key(('$', '.count'))
     True
-    >>> compare_path_tuples__lt(('$', '.count', '[2]'), ('$', '.count'))
+    >>> path_sort_key(('$', '.count', '[2]')) < path_sort_key(('$', '.count'))
     False
-    >>> compare_path_tuples__lt(('$', '.count', '[2]'), ('$', '.count', '[3]', '.count', '[1]'))
+    >>> path_sort_key(('$', '.count', '[2]')) < path_sort_key(('$', '.count', '[3]', '.count', '[1]'))
     True
     """
-    a_len = len(a)
-    b_len = len(b)
-
-    if a_len < b_len:
-        return True
-
-    if b_len < a_len:
-        return False
-
-    _1: Any
-    _2: Any
-    for _1, _2 in zip(a, b):
-        # convert indices to integers
-        if _1 and _1[0] == '[':
-            _1 = int(_1[1:-1])
-
-        if _2 and _2[0] == '[':
-            _2 = int(_2[1:-1])
-
-        if type(_1) == type(_2):
-            if _1 == _2:
-                continue
-            if _1 < _2:
-                return True
-            else:
-                return False
-        elif type(_1) == int:
-            return True
+    key: List[Union[int, str]] = [len(path)]
+    for segment in path:
+        if segment and segment[0] == '[':
+            key.extend((0, int(segment[1:-1])))
         else:
-            return False
-
-    return True
+            key.extend((1, segment))
+    return tuple(key)
@@ -1,5 +1,6 @@
 import attr
-from typing import Optional, Dict, Any, List, TYPE_CHECKING
+from typing import Optional, Dict, Any, List, cast, TYPE_CHECKING
+from functools import lru_cache
 import enum
 
 from .bases import Base, Summable
@@ -27,7 +28,7 @@ class BaseRequirementRule(Base):
         return {
             **super().to_dict(),
             "name": self.name,
-            "message": self.message,
+            "message": render_message(self.message) if self.message else None,
             "result": self.result.to_dict() if self.result is not None else None,
             "audited_by": self.audited_by.value if self.audited_by else None,
             "contract": self.is_contract,
@@ -68,3 +69,18 @@ class BaseRequirementRule(Base):
             return self.result.claims_for_gpa()
 
         return []
+
+
+@lru_cache(maxsize=None)
+def render_message(message: str) -> str:
+    """
+    Renders a requirement message from markdown into HTML.
+
+    Rendering is deferred until a result is serialized, and memoized for the
+    whole process, because the same handful of messages are rendered for
+    every audit of an area. This also keeps `markdown` from being imported at
+    all by runs that never serialize a result.
+    """
+    import markdown  # type: ignore
+
+    return cast(str, markdown.markdown(message, extensions=['markdown.extensions.sane_lists', 'markdown.extensions.smarty']))
@@ -0,0 +1,68 @@
+from typing import Optional, Any
+from functools import lru_cache
+import hashlib
+import logging
+import os
+import pathlib
+import pickle
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def cache_dir(name: str, *, root: Optional[str] = None) -> Optional[str]:
+    """
+    Returns the directory for the named on-disk cache, creating it if needed.
+
+    On-disk caching is opt-in: it is only enabled when the DP_CACHE_DIR
+    environment variable is set (or a root is given explicitly).
+    """
+    root = root or os.getenv('DP_CACHE_DIR', None)
+    if not root:
+        return None
+
+    path = os.path.join(root, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@lru_cache(1)
+def engine_version() -> str:
+    """
+    A fingerprint of the source of the degreepath package. Cached data that
+    was produced by the engine is keyed on this, so that any change to the
+    engine invalidates it.
+    """
+    digest = hashlib.sha256()
+    package_root = pathlib.Path(__file__).parent
+
+    for source_file in sorted(package_root.glob('**/*.py')):
+        digest.update(str(source_file.relative_to(package_root)).encode('utf-8'))
+        digest.update(source_file.read_bytes())
+
+    return digest.hexdigest()[:16]
+
+
+def read_pickle(directory: str, key: str) -> Optional[Any]:
+    try:
+        with open(os.path.join(directory, f"{key}.pickle"), 'rb') as infile:
+            return pickle.load(infile)
+    except FileNotFoundError:
+        return None
+    except Exception as ex:
+        # a corrupt or incompatible cache entry is just a cache miss
+        logger.warning("could not read cache entry %s/%s: %s", directory, key, ex)
+        return None
+
+
+def write_pickle(directory: str, key: str, value: Any) -> None:
+    # write to a temporary file and then move it into place, so that
+    # concurrent readers never see a partially-written entry
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as outfile:
+            pickle.dump(value, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, os.path.join(directory, f"{key}.pickle"))
+    except Exception:
+        os.unlink(tmp_path)
+        raise
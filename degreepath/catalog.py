@@ -0,0 +1,185 @@
+from typing import Dict, List, Tuple, Optional, FrozenSet, Iterable, Any, cast
+from collections import defaultdict
+import hashlib
+import json
+import logging
+import os
+
+import attr
+
+from .clause import Clause, ResolvedClause, AndClause, OrClause, SingleClause
+from .data import CourseInstance, load_course
+from .discover_potentials import extract_positive_buckets, extract_negative_buckets
+from .operator import Operator
+
+logger = logging.getLogger(__name__)
+
+# A course catalog is a JSON-lines file of course offerings, one per line, in
+# the same shape as the rows of a student's transcript. The student-specific
+# fields (grades and flags) may be omitted; they are filled in from
+# CATALOG_DEFAULTS, because a potential course is one that hasn't been taken.
+
+CATALOG_DEFAULTS: Dict[str, Any] = {
+    "attributes": [],
+    "credits": "1.00",
+    "flag_gpa": True,
+    "flag_in_progress": False,
+    "flag_incomplete": False,
+    "flag_repeat": False,
+    "flag_stolaf": True,
+    "gereqs": [],
+    "grade_code": "A",
+    "grade_option": "grade",
+    "grade_points": "0.00",
+    "grade_points_gpa": "0.00",
+    "section": None,
+    "sub_type": "",
+    "transcript_code": "",
+}
+
+# the clause keys that the catalog keeps an inverted index for. Clauses on
+# any other key fall back to checking every course.
+INDEXED_KEYS = ('attributes', 'gereqs', 'subject', 'course', 'level')
+
+
+@attr.s(slots=True, kw_only=True, auto_attribs=True)
+class CourseCatalog:
+    courses: Tuple[CourseInstance, ...]
+    digest: str
+
+    # key -> stringified value -> the positions of the courses with that value
+    index: Dict[str, Dict[str, FrozenSet[int]]]
+
+    def matching_clbids(self, clause: ResolvedClause, *, since_year: Optional[int] = None) -> List[str]:
+        """
+        Returns the clbids of the courses that satisfy the clause, offered in
+        or after since_year (if given).
+
+        The index only narrows the candidates down; each candidate is still
+        checked with the clause itself, so the answer is exactly what the
+        audit would decide for that course.
+        """
+        applicable = cast(Clause, clause)
+        candidates = self.candidates(clause)
+        positions: Iterable[int] = range(len(self.courses)) if candidates is None else sorted(candidates)
+
+        clbids = set()
+        for i in positions:
+            course = self.courses[i]
+            if since_year and course.year < since_year:
+                continue
+            if applicable.apply(course):
+                clbids.add(course.clbid)
+
+        return sorted(clbids)
+
+    def candidates(self, clause: ResolvedClause) -> Optional[FrozenSet[int]]:
+        """
+        Returns a superset of the positions of the courses that can satisfy
+        the clause, or None if the index can't narrow it down.
+        """
+        if isinstance(clause, AndClause):
+            narrowed = [c for c in (self.candidates(child) for child in clause.children) if c is not None]
+            if not narrowed:
+                return None
+            return frozenset.intersection(*narrowed)
+
+        elif isinstance(clause, OrClause):
+            alternatives = [self.candidates(child) for child in clause.children]
+            if not alternatives or any(c is None for c in alternatives):
+                return None
+            return frozenset().union(*alternatives)  # type: ignore
+
+        elif isinstance(clause, SingleClause):
+            return self.single_clause_candidates(clause)
+
+        return None
+
+    def single_clause_candidates(self, clause: SingleClause) -> Optional[FrozenSet[int]]:
+        postings = self.index.get(clause.key, None)
+        if postings is None:
+            return None
+
+        if clause.key == 'attributes':
+            if clause.operator in (Operator.EqualTo, Operator.In):
+                return self.lookup(postings, extract_positive_buckets(clause))
+            if clause.operator in (Operator.NotEqualTo, Operator.NotIn):
+                everything = frozenset(range(len(self.courses)))
+                return everything - self.lookup(postings, extract_negative_buckets(clause))
+            return None
+
+        if clause.operator is Operator.EqualTo:
+            return self.lookup(postings, [clause.expected])
+        if clause.operator is Operator.In:
+            return self.lookup(postings, clause.expected)
+
+        return None
+
+    @staticmethod
+    def lookup(postings: Dict[str, FrozenSet[int]], values: Iterable[Any]) -> FrozenSet[int]:
+        # clauses compare values as strings; see apply_operator
+        found: FrozenSet[int] = frozenset()
+        for value in values:
+            found = found | postings.get(str(value), frozenset())
+        return found
+
+
+_catalogs: Dict[str, Tuple[Tuple[int, int], CourseCatalog]] = {}
+
+
+def load_catalog(path: str) -> CourseCatalog:
+    """
+    Loads the catalog at path, reusing the already-loaded copy until the file
+    changes.
+    """
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    loaded = _catalogs.get(path, None)
+    if loaded is not None and loaded[0] == signature:
+        return loaded[1]
+
+    with open(path, 'rb') as infile:
+        raw = infile.read()
+
+    catalog = build_catalog(raw)
+    logger.debug("loaded %s courses from the catalog at %s", len(catalog.courses), path)
+
+    _catalogs[path] = (signature, catalog)
+    return catalog
+
+
+def build_catalog(raw: bytes) -> CourseCatalog:
+    courses = tuple(
+        load_course({**CATALOG_DEFAULTS, **json.loads(line)})
+        for line in raw.splitlines()
+        if line.strip()
+    )
+
+    index: Dict[str, Dict[str, set]] = {key: defaultdict(set) for key in INDEXED_KEYS}
+    for i, course in enumerate(courses):
+        for attribute in course.attributes:
+            index['attributes'][attribute].add(i)
+        for gereq in course.gereqs:
+            index['gereqs'][gereq].add(i)
+        index['subject'][indexed_subject(course)].add(i)
+        index['course'][course.identity_].add(i)
+        index['level'][str(course.level)].add(i)
+
+    return CourseCatalog(
+        courses=courses,
+        digest=hashlib.sha256(raw).hexdigest(),
+        index={key: {value: frozenset(positions) for value, positions in postings.items()} for key, postings in index.items()},
+    )
+
+
+def indexed_subject(course: CourseInstance) -> str:
+    # CH/BI courses count as CHEM or BIO when compared by subject; see
+    # apply_single_clause__subject
+    if course.is_chbi_ is not None:
+        return 'CHEM' if course.is_chbi_ in (125, 126) else 'BIO'
+    return course.subject
+
+
+def clear_catalog_cache() -> None:
+    _catalogs.clear()
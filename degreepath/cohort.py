@@ -0,0 +1,335 @@
+from typing import Dict, List, Tuple, Iterable, Iterator, Any, Callable, Optional
+from array import array
+import contextlib
+import copy
+import json
+import mmap
+import struct
+import sys
+
+from .data import CourseInstance, load_course
+from .data.course_enums import GradeCode, GradeOption, SubType, CourseType, TranscriptCode
+from .data.offering import intern_decimal
+
+# A packed cohort file holds the transcripts of many students in one file,
+# laid out so that a single student's courses can be materialized without
+# reading (or parsing) anyone else's.
+#
+#     header
+#     value table       every distinct field value, stored once, as JSON
+#     columns           one array of value ids per course field, for every row
+#     student index     (stnum, first row, row count, metadata span), by stnum
+#     metadata          a small JSON document per student (areas, exceptions, …)
+#
+# Values are referenced from the columns by their index, so the subjects,
+# attributes, and course names that thousands of students share are only
+# decoded once per process. They keep their JSON types, so that a student
+# unpacks to exactly the document that was packed: a null stays null, and a
+# number stays a number. A row's fields that aren't one of the columns are
+# kept together, as a single JSON object, in the last column.
+
+MAGIC = b'DPCOHRT1'
+VERSION = 2
+
+# magic, version, byteorder, then (count, offset) for values, rows, and
+# students, followed by the offset of the metadata section
+HEADER = struct.Struct('<8sII' + 'IQ' * 3 + 'Q')
+
+COLUMNS = (
+    'attributes', 'clbid', 'course_type', 'credits', 'crsid', 'flag_gpa',
+    'flag_in_progress', 'flag_incomplete', 'flag_repeat', 'flag_stolaf',
+    'gereqs', 'grade_code', 'grade_option', 'grade_points', 'grade_points_gpa',
+    'level', 'name', 'number', 'section', 'sub_type', 'subject', 'subjects',
+    'term', 'transcript_code', 'year',
+)
+EXTRA_COLUMN = 'extra'
+
+# the value id of a field that the row doesn't have
+ABSENT = 0
+
+# the columns whose values are converted into richer types before they're
+# handed to load_course; the conversions are cached per value
+CONVERTERS: Dict[str, Callable[[Any], Any]] = {
+    'attributes': lambda value: tuple(value) if value else tuple(),
+    'gereqs': lambda value: tuple(value) if value else tuple(),
+    'credits': intern_decimal,
+    'grade_points': intern_decimal,
+    'grade_points_gpa': intern_decimal,
+    'course_type': CourseType,
+    'grade_code': GradeCode,
+    'grade_option': GradeOption,
+    'sub_type': SubType,
+    'transcript_code': TranscriptCode,
+}
+
+INDEX_ENTRY = struct.Struct('<IIIQI')
+
+_MISSING = object()
+
+
+def write_cohort(path: str, students: Iterable[Dict[str, Any]]) -> int:
+    """
+    Packs the given student documents (in the same shape as the per-student
+    JSON files) into a single cohort file. Returns the number of students.
+    """
+    # the absent value has no encoding, and every other id points past it
+    values: Dict[str, int] = {'': ABSENT}
+
+    def intern_value(value: Any) -> int:
+        encoded = json.dumps(value, sort_keys=True, separators=(',', ':'))
+        if encoded not in values:
+            values[encoded] = len(values)
+        return values[encoded]
+
+    columns: Dict[str, array] = {name: array('I') for name in COLUMNS + (EXTRA_COLUMN,)}
+
+    index: List[Tuple[str, int, int, bytes]] = []
+    row_count = 0
+
+    for student in students:
+        first_row = row_count
+
+        for row in student['courses']:
+            for name in COLUMNS:
+                columns[name].append(intern_value(row[name]) if name in row else ABSENT)
+
+            extra = {key: value for key, value in row.items() if key not in COLUMNS}
+            columns[EXTRA_COLUMN].append(intern_value(extra) if extra else ABSENT)
+
+            row_count += 1
+
+        document = {k: v for k, v in student.items() if k != 'courses'}
+        index.append((str(student['stnum']), first_row, row_count - first_row, json.dumps(document).encode('utf-8')))
+
+    # the index is sorted, so that a student can be found by binary search
+    index.sort(key=lambda entry: entry[0])
+    stnum_ids = [intern_value(stnum) for stnum, _, _, _ in index]
+
+    with open(path, 'wb') as outfile:
+        outfile.write(b'\0' * HEADER.size)
+
+        value_offset = _align(outfile)
+        encoded = [s.encode('utf-8') for s in values.keys()]
+        value_ends = array('I', _running_total(len(s) for s in encoded))
+        outfile.write(value_ends.tobytes())
+        outfile.write(b''.join(encoded))
+
+        column_offset = _align(outfile)
+        for name in COLUMNS + (EXTRA_COLUMN,):
+            outfile.write(columns[name].tobytes())
+
+        index_offset = _align(outfile)
+        metadata_position = 0
+        for stnum_id, (_, first_row, count, metadata) in zip(stnum_ids, index):
+            outfile.write(INDEX_ENTRY.pack(stnum_id, first_row, count, metadata_position, len(metadata)))
+            metadata_position += len(metadata)
+
+        metadata_offset = outfile.tell()
+        for _, _, _, metadata in index:
+            outfile.write(metadata)
+
+        outfile.seek(0)
+        outfile.write(HEADER.pack(
+            MAGIC, VERSION, 0 if sys.byteorder == 'little' else 1,
+            len(values), value_offset,
+            row_count, column_offset,
+            len(index), index_offset,
+            metadata_offset,
+        ))
+
+    return len(index)
+
+
+def _align(outfile: Any, to: int = 8) -> int:
+    position: int = outfile.tell()
+    padding = -position % to
+    if padding:
+        outfile.write(b'\0' * padding)
+    return position + padding
+
+
+def _running_total(sizes: Iterable[int]) -> Iterator[int]:
+    total = 0
+    yield total
+    for size in sizes:
+        total += size
+        yield total
+
+
+class CohortFile:
+    """
+    A memory-mapped, read-only view of a packed cohort file.
+
+    >>> import tempfile, os
+    >>> path = os.path.join(tempfile.mkdtemp(), 'cohort.bin')
+    >>> write_cohort(path, [{'stnum': '1', 'courses': []}])
+    1
+    >>> with CohortFile.open(path) as cohort:
+    ...     cohort.stnums(), cohort.courses('1')
+    (['1'], ())
+    """
+
+    def __init__(self, buffer: Any) -> None:
+        self._buffer = buffer
+        self._values: Dict[int, Any] = {}
+        self._converted: Dict[Tuple[str, int], Any] = {}
+
+        magic, version, byteorder, \
+            n_values, value_offset, \
+            self._n_rows, column_offset, \
+            self._n_students, self._index_offset, \
+            self._metadata_offset = HEADER.unpack_from(buffer, 0)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'not a version {VERSION} cohort file')
+        if byteorder != (0 if sys.byteorder == 'little' else 1):
+            raise ValueError('this cohort file was written on a machine with a different byte order')
+
+        self._view = view = memoryview(buffer)
+
+        self._value_ends = view[value_offset:value_offset + (n_values + 1) * 4].cast('I')
+        self._value_base = value_offset + (n_values + 1) * 4
+
+        self._columns: Dict[str, memoryview] = {}
+        position = column_offset
+        for name in COLUMNS + (EXTRA_COLUMN,):
+            self._columns[name] = view[position:position + self._n_rows * 4].cast('I')
+            position += self._n_rows * 4
+
+    @staticmethod
+    @contextlib.contextmanager
+    def open(path: str) -> Iterator['CohortFile']:
+        with open(path, 'rb') as infile:
+            with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                cohort = CohortFile(buffer)
+                try:
+                    yield cohort
+                finally:
+                    cohort.release()
+
+    def release(self) -> None:
+        # memoryviews into the mmap must be released before it can be closed
+        for column in self._columns.values():
+            column.release()
+        for view in (self._value_ends, self._view):
+            view.release()
+
+    def stnums(self) -> List[str]:
+        return [self.value(self._entry(i)[0]) for i in range(self._n_students)]
+
+    def __contains__(self, stnum: str) -> bool:
+        return self._find(str(stnum)) is not None
+
+    def value(self, i: int) -> Any:
+        """The decoded value; shared between every row that has it, so don't change it."""
+        value = self._values.get(i, _MISSING)
+        if value is _MISSING:
+            start = self._value_base + self._value_ends[i]
+            end = self._value_base + self._value_ends[i + 1]
+            value = json.loads(self._buffer[start:end].decode('utf-8'))
+            self._values[i] = value
+        return value
+
+    def load(self, stnum: str) -> Tuple[Dict[str, Any], Tuple[CourseInstance, ...]]:
+        """Returns the student's document and their courses, reading each of their rows once."""
+        first_row, count, metadata_position, metadata_length = self._lookup(stnum)
+
+        rows = []
+        courses = []
+        for r in range(first_row, first_row + count):
+            ids = [(name, self._columns[name][r]) for name in COLUMNS]
+            rows.append(self._row(r, ids))
+            courses.append(load_course(self._course_data(ids)))
+
+        data = self._metadata(metadata_position, metadata_length)
+        data['courses'] = rows
+        return data, tuple(courses)
+
+    def student(self, stnum: str) -> Dict[str, Any]:
+        """Returns the student's document, including the raw course rows."""
+        first_row, count, metadata_position, metadata_length = self._lookup(stnum)
+
+        data = self._metadata(metadata_position, metadata_length)
+        data['courses'] = [self._row(r, [(name, self._columns[name][r]) for name in COLUMNS]) for r in range(first_row, first_row + count)]
+        return data
+
+    def rows(self, stnum: str) -> Iterator[Dict[str, Any]]:
+        """Yields the student's course rows, in the same shape as the JSON files."""
+        first_row, count, _, _ = self._lookup(stnum)
+
+        for r in range(first_row, first_row + count):
+            yield self._row(r, [(name, self._columns[name][r]) for name in COLUMNS])
+
+    def courses(self, stnum: str) -> Tuple[CourseInstance, ...]:
+        """
+        Materializes the student's courses. Values, decimals, and enums are
+        decoded once per file and shared between students.
+        """
+        first_row, count, _, _ = self._lookup(stnum)
+
+        return tuple(
+            load_course(self._course_data([(name, self._columns[name][r]) for name in COLUMNS]))
+            for r in range(first_row, first_row + count)
+        )
+
+    def _row(self, r: int, ids: List[Tuple[str, int]]) -> Dict[str, Any]:
+        # the rows are handed out, so they get their own copies of any lists
+        row = {name: copy.deepcopy(self.value(value_id)) for name, value_id in ids if value_id != ABSENT}
+
+        extra_id = self._columns[EXTRA_COLUMN][r]
+        if extra_id != ABSENT:
+            row.update(copy.deepcopy(self.value(extra_id)))
+
+        return row
+
+    def _course_data(self, ids: List[Tuple[str, int]]) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+
+        for name, value_id in ids:
+            if value_id == ABSENT:
+                continue
+
+            converter = CONVERTERS.get(name, None)
+            if converter is None:
+                data[name] = self.value(value_id)
+                continue
+
+            key = (name, value_id)
+            value = self._converted.get(key, _MISSING)
+            if value is _MISSING:
+                value = converter(self.value(value_id))
+                self._converted[key] = value
+            data[name] = value
+
+        return data
+
+    def _metadata(self, position: int, length: int) -> Dict[str, Any]:
+        start = self._metadata_offset + position
+        data: Dict[str, Any] = json.loads(self._buffer[start:start + length].decode('utf-8'))
+        return data
+
+    def _entry(self, i: int) -> Tuple[int, int, int, int, int]:
+        entry: Tuple[int, int, int, int, int] = INDEX_ENTRY.unpack_from(self._view, self._index_offset + i * INDEX_ENTRY.size)
+        return entry
+
+    def _find(self, stnum: str) -> Optional[Tuple[int, int, int, int]]:
+        # the index is sorted by stnum, so only log(n) entries are decoded
+        lo, hi = 0, self._n_students
+        while lo < hi:
+            mid = (lo + hi) // 2
+            stnum_id, first_row, count, metadata_position, metadata_length = self._entry(mid)
+            found = self.value(stnum_id)
+            if found == stnum:
+                return first_row, count, metadata_position, metadata_length
+            if found < stnum:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return None
+
+    def _lookup(self, stnum: str) -> Tuple[int, int, int, int]:
+        entry = self._find(str(stnum))
+        if entry is None:
+            raise KeyError(f'student {stnum} is not in this cohort file')
+        return entry
@@ -1,24 +1,64 @@
 import attr
-from typing import List, Optional, Tuple, Dict, Union, Set, Sequence, Iterable, Iterator
+from typing import List, Optional, Tuple, Dict, Union, Set, Sequence, Iterable, Iterator, Hashable, Any
 from collections import defaultdict
 from contextlib import contextmanager
+from concurrent.futures import Executor
 import logging
 
 from .data import CourseInstance, AreaPointer
+from .data.clausable import Clausable
 from .data.course_enums import CourseType
-from .base import BaseCourseRule
+from .base import BaseCourseRule, Rule, Result, Solution
 from .clause import Clause, SingleClause
 from .claim import ClaimAttempt, Claim
 from .operator import Operator
 from .exception import RuleException, OverrideException, InsertionException, ValueException
 from .rule.course import CourseRule
+from .warm_start import SearchHints
 
 
 logger = logging.getLogger(__name__)
 debug: Optional[bool] = None
 
 
-@attr.s(slots=True, kw_only=True, frozen=False, auto_attribs=True)
+@attr.s(slots=True, kw_only=True, auto_attribs=True)
+class TranscriptIndexes:
+    """
+    Indexes over one student's courses, which all of the student's audits
+    share (see session.py). Clauses and courses are both hashed by value, so
+    an entry stays correct no matter which area's rule asked for it.
+    """
+
+    # (clause, course) -> whether the clause matches the course
+    matches: Dict[Tuple[Clause, CourseInstance], bool] = attr.ib(factory=dict)
+
+    # transcript -> (course_set, clbid_lookup_map)
+    lookups: Dict[Tuple[CourseInstance, ...], Tuple[Set[str], Dict[str, CourseInstance]]] = attr.ib(factory=dict)
+
+
+@attr.s(slots=True, kw_only=True, auto_attribs=True)
+class SubtreeCache:
+    """
+    The solutions and results of rules, shared between the limited
+    transcripts of one area (see AreaOfStudy.solutions). Each entry is keyed
+    by the rule and the part of the transcript that the rule can see, so an
+    entry is reused by every transcript that shows the rule the same courses.
+    """
+
+    solutions: Dict[Hashable, Tuple[Solution, ...]] = attr.ib(factory=dict)
+    results: Dict[Hashable, Optional[Result]] = attr.ib(factory=dict)
+
+    # rule -> its key, for the current transcript only
+    keys: Dict[Rule, Hashable] = attr.ib(factory=dict)
+
+    def for_variant(self) -> 'SubtreeCache':
+        return SubtreeCache(solutions=self.solutions, results=self.results)
+
+
+PROCESS_LOCAL_FIELDS = frozenset(['executor', 'subtree_cache', 'claimants_', 'indexes'])
+
+
+@attr.s(slots=True, kw_only=True, frozen=False, auto_attribs=True, getstate_setstate=False)
 class RequirementContext:
     transcript_: List[CourseInstance] = attr.ib(factory=list)
     course_set_: Set[str] = attr.ib(factory=set)
@@ -31,6 +71,38 @@ class RequirementContext:
     claims: Dict[str, Set[Claim]] = attr.ib(factory=lambda: defaultdict(set))
     exceptions: List[RuleException] = attr.ib(factory=dict)
 
+    # the choices of a previous audit, for the rules to try first; see warm_start.py
+    hints: Optional[SearchHints] = None
+
+    # indexes shared with the student's other audits
+    indexes: Optional[TranscriptIndexes] = None
+
+    # the area's top-level rule, and the rules that could claim each course
+    # in this transcript; see CountRule.is_self_contained
+    area_rule: Optional[Rule] = None
+    claimants_: Optional[Dict[Clausable, Set[Tuple[str, ...]]]] = None
+
+    # an executor for solving independent children concurrently; see solve.py
+    executor: Optional[Executor] = None
+
+    # solutions and results shared between the area's limited transcripts
+    subtree_cache: Optional[SubtreeCache] = None
+
+    # The executor, the caches that only help the search that filled them,
+    # and the student's indexes (which cover all of their areas) aren't sent
+    # to other processes along with the context: results
+    # keep their context, and are pickled into the result cache and sent to
+    # clients, and contexts are pickled into process-pool workers.
+    def __getstate__(self) -> Dict[str, Any]:
+        return {
+            a.name: None if a.name in PROCESS_LOCAL_FIELDS else getattr(self, a.name)
+            for a in attr.fields(RequirementContext)
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
     def with_transcript(
         self,
         transcript: Iterable[CourseInstance],
@@ -39,8 +111,13 @@ class RequirementContext:
         including_failed: Iterable[CourseInstance] = tuple(),
     ) -> 'RequirementContext':
         transcript = list(transcript)
-        course_set = set(c.course() for c in transcript)
-        clbid_lookup_map = {c.clbid: c for c in transcript}
+
+        lookups = self.indexes.lookups.get(tuple(transcript), None) if self.indexes is not None else None
+        if lookups is None:
+            lookups = (set(c.course() for c in transcript), {c.clbid: c for c in transcript})
+            if self.indexes is not None:
+                self.indexes.lookups[tuple(transcript)] = lookups
+        course_set, clbid_lookup_map = lookups
 
         return attr.evolve(
             self,
@@ -49,11 +126,35 @@ class RequirementContext:
             course_set_=course_set,
             clbid_lookup_map_=clbid_lookup_map,
             forced_clbid_lookup_map_=forced or {},
+            claimants_=None,
+            subtree_cache=self.subtree_cache.for_variant() if self.subtree_cache is not None else None,
         )
 
     def transcript(self) -> List[CourseInstance]:
         return self.transcript_
 
+    def matching(self, clause: Clause, items: Iterable[Clausable]) -> List[Clausable]:
+        """Returns the items that the clause matches, through the shared match cache when there is one."""
+        if self.indexes is None:
+            return [item for item in items if clause.apply(item)]
+
+        matches = self.indexes.matches
+        result = []
+        for item in items:
+            if not isinstance(item, CourseInstance):
+                if clause.apply(item):
+                    result.append(item)
+                continue
+
+            key = (clause, item)
+            matched = matches.get(key, None)
+            if matched is None:
+                matched = matches[key] = clause.apply(item)
+            if matched:
+                result.append(item)
+
+        return result
+
     def find_ap_ib_credit_course(self, *, name: str) -> Optional[CourseInstance]:
         for c in self.transcript():
             if c.course_type is CourseType.AP and c.name == name:
@@ -3,5 +3,5 @@
 from .area_pointer import AreaPointer
 from .area_enums import AreaType
 from .course import CourseInstance, load_course, course_from_str
-from .course_enums import SubType, GradeCode, GradeOption, TranscriptCode
+from .course_enums import SubType, GradeCode, GradeOption, TranscriptCode, CourseType
 from .clausable import Clausable
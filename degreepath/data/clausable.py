@@ -9,6 +9,9 @@ logger = logging.getLogger(__name__)
 
 
 class Clausable(abc.ABC):
+    # so that the slotted attrs classes below don't each carry a __dict__
+    __slots__ = ()
+
     @abc.abstractmethod
     def to_dict(self) -> Dict[str, Any]:
         ...
@@ -5,7 +5,7 @@ import logging
 
 from .clausable import Clausable
 from .course_enums import GradeCode, GradeOption, SubType, CourseType, TranscriptCode
-from ..lib import str_to_grade_points
+from .offering import CourseOffering, intern_offering, intern_decimal
 
 if TYPE_CHECKING:
     from ..clause import SingleClause
@@ -16,12 +16,10 @@ Decimal = decimal.Decimal
 
 @attr.s(cache_hash=True, slots=True, kw_only=True, frozen=True, auto_attribs=True)
 class CourseInstance(Clausable):
-    clbid: str
-    attributes: Tuple[str, ...]
+    # the fields that describe the offering are shared between every student
+    # who took it; the rest belong to this student
+    offering: CourseOffering
     credits: decimal.Decimal
-    crsid: str
-    course_type: CourseType
-    gereqs: Tuple[str, ...]
     grade_code: GradeCode
     grade_option: GradeOption
     grade_points: decimal.Decimal
@@ -31,19 +29,71 @@ class CourseInstance(Clausable):
     is_incomplete: bool
     is_repeat: bool
     is_stolaf: bool
-    is_lab: bool
-    level: int
-    name: str
-    number: str
-    section: Optional[str]
-    sub_type: SubType
-    subject: str
-    term: str
     transcript_code: TranscriptCode
-    year: int
 
-    identity_: str
-    is_chbi_: Optional[int]
+    @property
+    def clbid(self) -> str:
+        return self.offering.clbid
+
+    @property
+    def attributes(self) -> Tuple[str, ...]:
+        return self.offering.attributes
+
+    @property
+    def crsid(self) -> str:
+        return self.offering.crsid
+
+    @property
+    def course_type(self) -> CourseType:
+        return self.offering.course_type
+
+    @property
+    def gereqs(self) -> Tuple[str, ...]:
+        return self.offering.gereqs
+
+    @property
+    def is_lab(self) -> bool:
+        return self.offering.sub_type is SubType.Lab
+
+    @property
+    def level(self) -> int:
+        return self.offering.level
+
+    @property
+    def name(self) -> str:
+        return self.offering.name
+
+    @property
+    def number(self) -> str:
+        return self.offering.number
+
+    @property
+    def section(self) -> Optional[str]:
+        return self.offering.section
+
+    @property
+    def sub_type(self) -> SubType:
+        return self.offering.sub_type
+
+    @property
+    def subject(self) -> str:
+        return self.offering.subject
+
+    @property
+    def term(self) -> int:
+        return self.offering.term
+
+    @property
+    def year(self) -> int:
+        return self.offering.year
+
+    @property
+    def identity_(self) -> str:
+        return self.offering.identity_
+
+    @property
+    def is_chbi_(self) -> Optional[int]:
+        return self.offering.is_chbi_
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -80,7 +130,12 @@ class CourseInstance(Clausable):
         if not attributes:
             attributes = tuple()
 
-        return attr.evolve(self, attributes=tuple(attributes))
+        return self.evolve_offering(attributes=tuple(attributes))
+
+    def evolve_offering(self, **changes: Any) -> 'CourseInstance':
+        """Returns a copy of this course, taken in an offering with the given fields changed."""
+        fields = attr.asdict(self.offering, recurse=False, filter=lambda a, _: not a.name.endswith('_'))
+        return attr.evolve(self, offering=intern_offering(**{**fields, **changes}))
 
     def course(self) -> str:
         return self.identity_
@@ -237,7 +292,7 @@ clause_application_lookup: Dict[str, Callable[[CourseInstance, 'SingleClause'],
 }
 
 
-def load_course(data: Dict[str, Any]) -> CourseInstance:  # noqa: C901
+def load_course(data: Dict[str, Any]) -> CourseInstance:
     attributes = data.get('attributes', tuple())
     clbid = data['clbid']
     course_type = data['course_type']
@@ -258,56 +313,44 @@ def load_course(data: Dict[str, Any]) -> CourseInstance:  # noqa: C901
     number = data['number']
     section = data['section']
     sub_type = data['sub_type']
-    subject = data.get('subject', data['subjects'])
+    subject = data['subject'] if 'subject' in data else data['subjects']
     term = data['term']
     transcript_code = data['transcript_code']
     year = data['year']
 
-    clbid = clbid
-    term = int(term)
-    credits = decimal.Decimal(credits)
+    credits = intern_decimal(credits)
     section = section or None
 
     subject = subject[0] if isinstance(subject, list) else subject
 
     grade_code = GradeCode(grade_code)
-    grade_points = decimal.Decimal(grade_points)
-    grade_points_gpa = decimal.Decimal(grade_points_gpa)
+    grade_points = intern_decimal(grade_points)
+    grade_points_gpa = intern_decimal(grade_points_gpa)
     grade_option = GradeOption(grade_option)
     sub_type = SubType(sub_type)
-    course_type = CourseType(course_type)
     transcript_code = TranscriptCode(transcript_code)
 
-    attributes = tuple(attributes) if attributes else tuple()
-    gereqs = tuple(gereqs) if gereqs else tuple()
-
-    if sub_type is SubType.Lab:
-        suffix = ".L"
-    elif sub_type is SubType.Flac:
-        suffix = ".F"
-    elif sub_type is SubType.Discussion:
-        suffix = ".D"
-    else:
-        suffix = ""
-
-    course_identity = f"{subject} {number}{suffix}"
-    is_chbi = None
-    if course_identity == 'CH/BI 125':
-        is_chbi = 125
-    elif course_identity == 'CH/BI 126':
-        is_chbi = 126
-    elif course_identity == 'CH/BI 127':
-        is_chbi = 127
-    elif course_identity == 'CH/BI 227':
-        is_chbi = 227
+    # the offering-level fields are shared between every student who took
+    # this offering; see data/offering.py
+    offering = intern_offering(
+        clbid=clbid,
+        attributes=tuple(attributes) if attributes else tuple(),
+        crsid=crsid,
+        course_type=CourseType(course_type),
+        gereqs=tuple(gereqs) if gereqs else tuple(),
+        level=level,
+        name=name,
+        number=number,
+        section=section,
+        sub_type=sub_type,
+        subject=subject,
+        term=int(term),
+        year=year,
+    )
 
     return CourseInstance(
-        attributes=attributes,
-        clbid=clbid,
+        offering=offering,
         credits=credits,
-        crsid=crsid,
-        course_type=course_type,
-        gereqs=gereqs,
         grade_code=grade_code,
         grade_option=grade_option,
         grade_points=grade_points,
@@ -317,22 +360,14 @@ def load_course(data: Dict[str, Any]) -> CourseInstance:  # noqa: C901
         is_incomplete=flag_incomplete,
         is_repeat=flag_repeat,
         is_stolaf=flag_stolaf,
-        is_lab=sub_type is SubType.Lab,
-        level=level,
-        name=name,
-        number=number,
-        section=section,
-        sub_type=sub_type,
-        subject=subject,
-        term=term,
         transcript_code=transcript_code,
-        year=year,
-        identity_=course_identity,
-        is_chbi_=is_chbi,
     )
 
 
 def course_from_str(s: str, **kwargs: Any) -> CourseInstance:
+    # imported here because degreepath.lib imports from this package
+    from ..lib import str_to_grade_points
+
     number = s.split(' ')[1]
 
     grade_code = kwargs.get('grade_code', 'B')
@@ -0,0 +1,155 @@
+from typing import Optional, Tuple, Dict, Any, Union
+import attr
+import decimal
+
+from .course_enums import SubType, CourseType
+
+# A batch audit loads thousands of transcripts, and most of their rows are
+# the same few thousand course offerings. Every CourseInstance points at a
+# CourseOffering from this pool, so that the fields describing the offering
+# exist once per process instead of once per student.
+#
+# Only the fields that describe the offering are pooled. Grades, flags, and
+# credits belong to the student, and stay on the CourseInstance.
+#
+# Long-lived workers see a steady stream of new offerings, so the pools are
+# emptied whenever they fill up. Courses that were already loaded keep their
+# offerings; only the sharing with courses loaded later is lost.
+
+
+@attr.s(cache_hash=True, slots=True, kw_only=True, frozen=True, auto_attribs=True)
+class CourseOffering:
+    clbid: str
+    attributes: Tuple[str, ...]
+    crsid: str
+    course_type: CourseType
+    gereqs: Tuple[str, ...]
+    level: int
+    name: str
+    number: str
+    section: Optional[str]
+    sub_type: SubType
+    subject: str
+    term: int
+    year: int
+
+    identity_: str
+    is_chbi_: Optional[int]
+
+
+MAX_POOLED_OFFERINGS = 100_000
+MAX_POOLED_DECIMALS = 10_000
+
+_offerings: Dict[Tuple[Any, ...], CourseOffering] = {}
+_decimals: Dict[str, decimal.Decimal] = {}
+
+
+def intern_offering(
+    *,
+    clbid: str,
+    attributes: Tuple[str, ...],
+    crsid: str,
+    course_type: CourseType,
+    gereqs: Tuple[str, ...],
+    level: int,
+    name: str,
+    number: str,
+    section: Optional[str],
+    sub_type: SubType,
+    subject: str,
+    term: int,
+    year: int,
+) -> CourseOffering:
+    """
+    Returns the shared CourseOffering for these fields, creating it the first
+    time they're seen.
+
+    The pool is keyed on every field, not just the clbid, so two rows that
+    disagree about an offering (say, because its attributes changed between
+    two exports) never get merged.
+    """
+    key = (clbid, attributes, crsid, course_type, gereqs, level, name, number, section, sub_type, subject, term, year)
+
+    offering = _offerings.get(key, None)
+    if offering is not None:
+        return offering
+
+    if sub_type is SubType.Lab:
+        suffix = ".L"
+    elif sub_type is SubType.Flac:
+        suffix = ".F"
+    elif sub_type is SubType.Discussion:
+        suffix = ".D"
+    else:
+        suffix = ""
+
+    course_identity = f"{subject} {number}{suffix}"
+    is_chbi = None
+    if course_identity == 'CH/BI 125':
+        is_chbi = 125
+    elif course_identity == 'CH/BI 126':
+        is_chbi = 126
+    elif course_identity == 'CH/BI 127':
+        is_chbi = 127
+    elif course_identity == 'CH/BI 227':
+        is_chbi = 227
+
+    offering = CourseOffering(
+        clbid=clbid,
+        attributes=attributes,
+        crsid=crsid,
+        course_type=course_type,
+        gereqs=gereqs,
+        level=level,
+        name=name,
+        number=number,
+        section=section,
+        sub_type=sub_type,
+        subject=subject,
+        term=term,
+        year=year,
+        identity_=course_identity,
+        is_chbi_=is_chbi,
+    )
+
+    if len(_offerings) >= MAX_POOLED_OFFERINGS:
+        _offerings.clear()
+
+    _offerings[key] = offering
+    return offering
+
+
+def intern_decimal(value: Union[str, int, float, decimal.Decimal]) -> decimal.Decimal:
+    """
+    Returns a shared Decimal for the given value.
+
+    Decimals are keyed by their string form, because Decimal('1.0') and
+    Decimal('1.00') are equal but print differently.
+
+    >>> intern_decimal('1.00') is intern_decimal(decimal.Decimal('1.00'))
+    True
+    >>> str(intern_decimal('1.0')), str(intern_decimal('1.00'))
+    ('1.0', '1.00')
+    """
+    if not isinstance(value, (str, decimal.Decimal)):
+        return decimal.Decimal(value)
+
+    key = str(value)
+
+    interned = _decimals.get(key, None)
+    if interned is None:
+        interned = decimal.Decimal(value)
+        if len(_decimals) >= MAX_POOLED_DECIMALS:
+            _decimals.clear()
+        _decimals[key] = interned
+
+    return interned
+
+
+def offering_pool_size() -> int:
+    return len(_offerings)
+
+
+def clear_offering_pool() -> None:
+    _offerings.clear()
+    _decimals.clear()
@@ -1,5 +1,5 @@
-from typing import List, Iterator, Union, Dict, Optional
-import requests
+from typing import List, Iterator, Union, Dict, Optional, Tuple, Any, Callable, Sequence, cast
+import hashlib
 import os
 import attr
 import json
@@ -10,45 +10,135 @@ from .area import AreaOfStudy
 from .base import Base, BaseRequirementRule, BaseCountRule
 from .base.query import QuerySource
 from .rule.query import QueryRule
-from .clause import ResolvedClause, AndClause, OrClause, SingleClause
+from .cache import cache_dir, read_pickle, write_pickle
+from .clause import ResolvedClause, AndClause, OrClause, SingleClause, stringify_expected
 from .operator import Operator
 
 
+# Every QueryRule that loads potentials contributes its clause, and the
+# courses that could satisfy a clause only depend on the clause and on the
+# student's matriculation year. So the answers are cached per (clause,
+# matriculation) pair: in-process, and, if DP_CACHE_DIR is set, on disk.
+#
+# The answers come from one of two places. If POTENTIALS_CATALOG names a
+# course catalog file (see catalog.py), the clauses are evaluated locally,
+# against an inverted index of the catalog. Otherwise, if POTENTIALS_URL is
+# set, they are requested from that service.
+
+_potentials: Dict[str, Tuple[str, ...]] = {}
+_sessions: Dict[str, Any] = {}
+
+
 def discover_clause_potential(
     area: AreaOfStudy,
     c: Constants,
     *,
-    url: Optional[str] = os.getenv('POTENTIALS_URL', None),
+    url: Optional[str] = None,
+    catalog_file: Optional[str] = None,
+    cache_root: Optional[str] = None,
 ) -> Dict[int, List[str]]:
-    if not url:
+    # read the environment at call time, so that a .env file loaded by the
+    # CLI after this module was imported is still honored
+    catalog_file = catalog_file or os.getenv('POTENTIALS_CATALOG', None)
+    url = url or os.getenv('POTENTIALS_URL', None)
+
+    resolver: Callable[[ResolvedClause, int], Sequence[str]]
+    if catalog_file:
+        # imported here because the catalog module imports from this one
+        from .catalog import load_catalog
+
+        catalog = load_catalog(catalog_file)
+        source = f"catalog:{catalog.digest}"
+
+        def resolver(clause: ResolvedClause, matriculation: int) -> Sequence[str]:
+            return catalog.matching_clbids(clause, since_year=matriculation)
+
+    elif url:
+        source = f"url:{url}"
+
+        def resolver(clause: ResolvedClause, matriculation: int) -> Sequence[str]:
+            return request_clause_potential(url, clause, matriculation)
+
+    else:
         return {}
 
+    directory = cache_dir('potentials', root=cache_root)
+
     result = {}
-    s = requests.Session()
     for clause in find_all_clauses(area):
-        positive_buckets = set(extract_positive_buckets(clause))
-        negative_buckets = set(extract_negative_buckets(clause))
-
-        dict_clause = clause.to_dict()
+        key = potentials_cache_key(source, clause, c.matriculation_year)
 
-        data = {
-            'positive_buckets': chr(30).join(sorted(positive_buckets)),
-            'negative_buckets': chr(30).join(sorted(negative_buckets)),
-            'clause': json.dumps(dict_clause),
-            'matriculation': str(c.matriculation_year),
-        }
+        clbids = _potentials.get(key, None)
+        if clbids is None and directory:
+            clbids = read_pickle(directory, key)
 
-        response = s.post(url, data=data, headers={'accept': 'application/json'})
-        parsed = response.json()
+        if clbids is None:
+            clbids = tuple(resolver(clause, c.matriculation_year))
+            if directory:
+                write_pickle(directory, key, clbids)
 
-        if 'hash' in parsed and parsed['error'] is False:
-            result[parsed['hash']] = parsed['clbids']
-        else:
-            raise ValueError(parsed)
+        _potentials[key] = clbids
+        result[int(clause.to_dict()['hash'])] = list(clbids)
 
     return result
 
 
+def request_clause_potential(url: str, clause: ResolvedClause, matriculation: int) -> List[str]:
+    # requests is slow to import, and most runs never need it
+    import requests
+
+    session = _sessions.get(url, None)
+    if session is None:
+        session = _sessions[url] = requests.Session()
+
+    positive_buckets = set(extract_positive_buckets(clause))
+    negative_buckets = set(extract_negative_buckets(clause))
+
+    data = {
+        'positive_buckets': chr(30).join(sorted(positive_buckets)),
+        'negative_buckets': chr(30).join(sorted(negative_buckets)),
+        'clause': json.dumps(clause.to_dict()),
+        'matriculation': str(matriculation),
+    }
+
+    response = session.post(url, data=data, headers={'accept': 'application/json'})
+    parsed = response.json()
+
+    if 'hash' in parsed and parsed['error'] is False:
+        return cast(List[str], parsed['clbids'])
+
+    raise ValueError(parsed)
+
+
+def potentials_cache_key(source: str, clause: ResolvedClause, matriculation: int) -> str:
+    """
+    The clause's own hash changes between processes (Python salts the hashes
+    of strings), so the cache is keyed on a digest of its contents instead.
+    """
+    identity = json.dumps([source, clause_identity(clause), matriculation], sort_keys=True, default=str)
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def clause_identity(clause: ResolvedClause) -> Any:
+    """
+    >>> clause_identity(SingleClause(key='attributes', expected='elective', operator=Operator.EqualTo))
+    ['single', 'attributes', 'elective', 'EqualTo']
+    """
+    if isinstance(clause, AndClause):
+        return ['and', [clause_identity(child) for child in clause.children]]
+    elif isinstance(clause, OrClause):
+        return ['or', [clause_identity(child) for child in clause.children]]
+    elif isinstance(clause, SingleClause):
+        return ['single', clause.key, stringify_expected(clause.expected), clause.operator.name]
+
+    raise TypeError(f'unsupported clause {type(clause)}')
+
+
+def clear_potentials_cache() -> None:
+    """Empties the in-process cache (but not the on-disk cache)."""
+    _potentials.clear()
+
+
 def find_all_clauses(rule: Union[Base, ResolvedClause]) -> Iterator[ResolvedClause]:
     if isinstance(rule, (AreaOfStudy, BaseRequirementRule)):
         if rule.result:
@@ -0,0 +1,32 @@
+from types import ModuleType
+import importlib.util
+import os
+import sys
+
+
+def load_common() -> ModuleType:
+    """
+    Imports dp-common.py (which can't be imported by name, because of the
+    dash) as the `dp_common` module.
+
+    The CLIs used to run it with runpy.run_path, which re-compiles the file
+    on every launch; importing it through a module spec lets Python reuse
+    the cached bytecode. It is also only loaded once per process.
+    """
+    module = sys.modules.get('dp_common', None)
+    if module is not None:
+        return module
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    spec = importlib.util.spec_from_file_location('dp_common', os.path.join(root, 'dp-common.py'))
+    assert spec is not None and spec.loader is not None
+
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['dp_common'] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules['dp_common']
+        raise
+
+    return module
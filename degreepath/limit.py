@@ -6,6 +6,7 @@ import logging
 
 from .clause import Clause, str_clause, load_clause
 from .constants import Constants
+from .ncr import mult
 
 from .data.clausable import Clausable
 
@@ -127,19 +128,25 @@ class LimitSet:
 
         return is_ok
 
-    def limited_transcripts(self, courses: Sequence[T]) -> Iterator[Tuple[T, ...]]:
+    def limited_transcripts(self, courses: Sequence[T], *, maximal: bool = True) -> Iterator[Tuple[T, ...]]:
         """
         We need to iterate over each combination of limited courses.
 
         IE, if we have {at-most: 1, where: subject == CSCI}, and three CSCI courses,
         then we need to generate three transcripts - one with each of them.
 
-        - capture the things that match each limit
+        With `maximal`, we only generate the transcripts that no other one
+        contains: a transcript with one fewer CSCI course can't do anything
+        that the full one can't, as long as the rules search the subsets of
+        the transcript (a query with `claim: false` doesn't). Without it,
+        every transcript that respects the limits is generated, smallest first.
+
         - make a list of the things that matched no limit clause
-        - for each set of things that matched…
-            - for N in range(0,at_most)…
-                - add the result of combinations(matched_things, N) to the unmatched set
-                - yield this combined set
+        - split the limits into groups that share matched things
+        - for each group, find the sets of its things that respect every
+          limit in the group
+        - yield the unmatched things plus one set from each group, for every
+          combination of sets
         """
         # skip _everything_ in here if there are no limits to apply
         if not self.limits:
@@ -149,40 +156,144 @@ class LimitSet:
 
         logger.debug("applying limits")
 
-        all_courses = set(courses)
+        unmatched_items, groups = self.limited_groups(courses, maximal=maximal)
 
-        # step 1: find the number of extra iterations we will need for each limiting clause
-        matched_items: Dict = defaultdict(set)
-        for l in self.limits:
-            for c in courses:
-                logger.debug("limit/probe: checking %s against %s", c, l)
-                if l.where.apply(c):
-                    matched_items[l].add(c)
+        logger.debug("limit: unmatched items: %s", unmatched_items)
+        logger.debug("limit: %s limited transcripts", mult(len(g) for g in groups))
 
-        all_matched_items = set(item for matchset in matched_items.values() for item in matchset)
-        unmatched_items = list(all_courses.difference(all_matched_items))
+        for results in itertools.product(*groups):
+            this_combo = tuple(unmatched_items) + tuple(item for group in results for item in group)
 
-        logger.debug("limit: unmatched items: %s", unmatched_items)
+            logger.debug("limit/combos: %s", this_combo)
+            yield this_combo
 
-        # we need to attach _a_ combo from each limit clause
-        clause_iterators = [
-            limit.iterate(matchset)
-            for limit, matchset in matched_items.items()
-        ]
+    def count_limited_transcripts(self, courses: Sequence[T], *, maximal: bool = True) -> int:
+        """Returns the number of transcripts that limited_transcripts() will generate."""
+        if not self.limits:
+            return 1
 
-        emitted_solutions: Set[Tuple[T, ...]] = set()
-        for results in itertools.product(*clause_iterators):
-            these_items = tuple(sorted(item for group in results for item in group))
+        _, groups = self.limited_groups(courses, maximal=maximal)
+        return mult(len(g) for g in groups)
 
-            if not self.check(these_items):
-                continue
+    def limited_groups(self, courses: Sequence[T], *, maximal: bool) -> Tuple[List[T], List[List[Tuple[T, ...]]]]:
+        """
+        Returns the courses that match no limit, and, for each group of limits
+        that overlap, the sets of the group's courses that respect them.
+        """
+        unmatched_items: List[T] = []
+        limits_of: Dict[T, Tuple[Limit, ...]] = {}
+        seen: Set[T] = set()
 
-            if these_items in emitted_solutions:
+        for c in courses:
+            if c in seen:
                 continue
+            seen.add(c)
+
+            matched_limits = tuple(limit for limit in self.limits if limit.where.apply(c))
+            if matched_limits:
+                limits_of[c] = matched_limits
             else:
-                emitted_solutions.add(these_items)
+                unmatched_items.append(c)
 
-            this_combo = tuple(unmatched_items) + these_items
+        # limits are grouped when a course matches more than one of them
+        group_of: Dict[Limit, Limit] = {limit: limit for limit in self.limits}
 
-            logger.debug("limit/combos: %s", this_combo)
-            yield this_combo
+        def find(limit: Limit) -> Limit:
+            while group_of[limit] is not limit:
+                limit = group_of[limit]
+            return limit
+
+        for matched_limits in limits_of.values():
+            first = find(matched_limits[0])
+            for limit in matched_limits[1:]:
+                group_of[find(limit)] = first
+
+        group_items: Dict[Limit, List[T]] = {}
+        for c, matched_limits in limits_of.items():
+            group_items.setdefault(find(matched_limits[0]), []).append(c)
+
+        groups = [
+            limited_subsets(items, limits_of=limits_of, maximal=maximal)
+            for items in group_items.values()
+        ]
+
+        return unmatched_items, groups
+
+
+def limited_subsets(items: Sequence[T], *, limits_of: Dict[T, Tuple[Limit, ...]], maximal: bool) -> List[Tuple[T, ...]]:  # noqa: C901
+    """
+    Finds the subsets of the items that match no more than `at_most` items
+    for any limit, by deciding on each item in turn. With `maximal`, only the
+    subsets that can't take any more of the items are kept.
+
+    >>> c = Constants(matriculation_year=2000)
+    >>> a = Limit(at_most=1, where=load_clause({'subject': {'$eq': 'A'}}, c=c), message=None)
+    >>> b = Limit(at_most=1, where=load_clause({'subject': {'$eq': 'B'}}, c=c), message=None)
+    >>> limits_of = {1: (a,), 2: (a, b), 3: (b,)}
+    >>> limited_subsets([1, 2, 3], limits_of=limits_of, maximal=True)
+    [(1, 3), (2,)]
+    >>> limited_subsets([1, 2, 3], limits_of=limits_of, maximal=False)
+    [(), (3,), (2,), (1,), (1, 3)]
+    """
+    counts: Dict[Limit, int] = defaultdict(int)
+
+    # the number of items after the current one that match each limit
+    remaining: Dict[Limit, int] = defaultdict(int)
+    for item in items:
+        for limit in limits_of[item]:
+            remaining[limit] += 1
+
+    results: List[Tuple[T, ...]] = []
+    chosen: List[T] = []
+    excluded: List[T] = []
+
+    def is_blocked(item: T) -> bool:
+        return any(counts[limit] >= limit.at_most for limit in limits_of[item])
+
+    def may_fill_up(item: T) -> bool:
+        return any(counts[limit] + remaining[limit] >= limit.at_most for limit in limits_of[item])
+
+    def include(i: int) -> None:
+        for limit in limits_of[items[i]]:
+            counts[limit] += 1
+        chosen.append(items[i])
+        visit(i + 1)
+        chosen.pop()
+        for limit in limits_of[items[i]]:
+            counts[limit] -= 1
+
+    def exclude(i: int) -> None:
+        excluded.append(items[i])
+        visit(i + 1)
+        excluded.pop()
+
+    def visit(i: int) -> None:
+        if i == len(items):
+            # a set is maximal if each item that it left out would overfill a limit
+            if not maximal or all(is_blocked(item) for item in excluded):
+                results.append(tuple(chosen))
+            return
+
+        item = items[i]
+        for limit in limits_of[item]:
+            remaining[limit] -= 1
+
+        choices = []
+        if not is_blocked(item):
+            choices.append(include)
+
+        # leaving the item out only leads to a maximal set if one of its
+        # limits can still fill up without it
+        if not maximal or may_fill_up(item):
+            choices.append(exclude)
+
+        # the largest sets come first when only they are wanted, and the smallest otherwise
+        for choice in (choices if maximal else reversed(choices)):
+            choice(i)
+
+        for limit in limits_of[item]:
+            remaining[limit] += 1
+
+    visit(0)
+
+    return results
@@ -96,3 +96,47 @@ def pretty_ms(
         return "~" + " ".join(ret[:unit_count])
 
     return " ".join(ret)
+
+
+PRETTY_MS_UNITS = {
+    'y': decimal.Decimal(365 * 86_400_000),
+    'd': decimal.Decimal(86_400_000),
+    'h': decimal.Decimal(3_600_000),
+    'm': decimal.Decimal(60_000),
+    's': decimal.Decimal(1_000),
+    'ms': decimal.Decimal(1),
+    'us': decimal.Decimal('0.001'),
+    'ns': decimal.Decimal('0.000001'),
+}
+
+
+def parse_pretty_ms(text: str) -> Optional[decimal.Decimal]:
+    """
+    Reverses pretty_ms (for its short output), returning milliseconds. A bare
+    number is taken to be seconds. Returns None for anything else.
+
+    >>> parse_pretty_ms('1m 5.4s')
+    Decimal('65400.0')
+    >>> parse_pretty_ms('~3ms')
+    Decimal('3')
+    >>> parse_pretty_ms('12')
+    Decimal('12000')
+    >>> parse_pretty_ms('soon') is None
+    True
+    """
+    text = text.strip().lstrip('~')
+
+    try:
+        return decimal.Decimal(text) * 1_000
+    except decimal.InvalidOperation:
+        pass
+
+    total = decimal.Decimal(0)
+    parts = text.split()
+    for part in parts:
+        match = re.fullmatch(r'([0-9.]+)([a-z]+)', part)
+        if match is None or match.group(2) not in PRETTY_MS_UNITS:
+            return None
+        total += decimal.Decimal(match.group(1)) * PRETTY_MS_UNITS[match.group(2)]
+
+    return total if parts else None
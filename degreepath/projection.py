@@ -0,0 +1,280 @@
+from typing import Dict, List, Tuple, FrozenSet, Set, Optional, Sequence, Iterator, Any, Union, cast
+import io
+import logging
+import pickle
+
+import attr
+
+from .area import AreaOfStudy
+from .audit import audit, Message, ResultMsg
+from .base import Base, BaseRequirementRule, BaseCountRule, BaseCourseRule
+from .base.query import BaseQueryRule, QuerySource
+from .clause import Clause, ResolvedClause, AndClause, OrClause, SingleClause
+from .constants import Constants
+from .data import CourseInstance, AreaPointer, CourseType
+from .discover_potentials import discover_clause_potential
+from .result_cache import audit_fingerprint, load_cached_result, store_result
+
+logger = logging.getLogger(__name__)
+
+# Most areas (and minors and concentrations especially) only ever look at a
+# handful of a student's courses: the ones that a CourseRule names, or that
+# some query's `where:` clause can match. Everything else on the transcript
+# can't change the audit. So two students whose relevant courses are the
+# same, field for field, get the same audit, up to the courses' clbids.
+#
+# A student's projection is their relevant courses, with the fields that the
+# area can't observe blanked out, and each clbid replaced by a canonical one.
+# The canonical clbids sort in the same order as the real ones, because the
+# solver orders courses by clbid. A projection is audited once, and the
+# result is remapped onto each student who shares it.
+#
+# Areas that look at the whole transcript (majors, with their common
+# requirements; degrees, with their GPA; queries without a `where:`) can't be
+# projected, and neither can students with exceptions in the area, because
+# exceptions name clbids.
+
+CANONICAL_PREFIX = '\x1f'
+
+# the most projected results that are kept in memory at once
+MAX_PROJECTED_RESULTS = 512
+
+
+@attr.s(slots=True, kw_only=True, frozen=True, auto_attribs=True)
+class AreaAnalysis:
+    projectable: bool
+    predicates: Tuple[Clause, ...] = tuple()
+    courses: FrozenSet[str] = frozenset()
+    ap_names: FrozenSet[str] = frozenset()
+
+    def is_relevant(self, course: CourseInstance) -> bool:
+        if course.identity_ in self.courses:
+            return True
+
+        if course.course_type is CourseType.AP and course.name in self.ap_names:
+            return True
+
+        return any(predicate.apply(course) for predicate in self.predicates)
+
+    def observes_names(self) -> bool:
+        return bool(self.ap_names) or any('ap' in clause_keys(p) for p in self.predicates)
+
+
+@attr.s(slots=True, kw_only=True, frozen=True, auto_attribs=True)
+class Projection:
+    # the canonical courses
+    transcript: Tuple[CourseInstance, ...]
+    transcript_with_failed: Tuple[CourseInstance, ...]
+
+    # the student's own courses, indexed by canonical position
+    courses: Tuple[CourseInstance, ...]
+
+
+def analyze_area(area: AreaOfStudy) -> AreaAnalysis:
+    if area.kind in ('major', 'degree'):
+        return AreaAnalysis(projectable=False)
+
+    predicates: List[Clause] = [limit.where for limit in area.limit.limits]
+    courses: Set[str] = set()
+    ap_names: Set[str] = set()
+
+    if not collect_observations(area.result, predicates=predicates, courses=courses, ap_names=ap_names):
+        return AreaAnalysis(projectable=False)
+
+    # a clause that names specific clbids can't be renamed
+    if any('clbid' in clause_keys(p) for p in predicates):
+        return AreaAnalysis(projectable=False)
+
+    return AreaAnalysis(
+        projectable=True,
+        predicates=tuple(predicates),
+        courses=frozenset(courses),
+        ap_names=frozenset(ap_names),
+    )
+
+
+def collect_observations(rule: Optional[Base], *, predicates: List[Clause], courses: Set[str], ap_names: Set[str]) -> bool:
+    """
+    Collects the course predicates of the rule and its children, and returns
+    False if the rule can observe courses that no predicate describes.
+    """
+    if rule is None:
+        return True
+
+    if isinstance(rule, BaseRequirementRule):
+        return collect_observations(rule.result, predicates=predicates, courses=courses, ap_names=ap_names)
+
+    elif isinstance(rule, BaseCountRule):
+        # a count's audit clauses only look at what its children matched
+        return all(
+            collect_observations(cast(Base, child), predicates=predicates, courses=courses, ap_names=ap_names)
+            for child in rule.items
+        )
+
+    elif isinstance(rule, BaseQueryRule):
+        if rule.source is not QuerySource.Courses:
+            return True
+        if rule.where is None:
+            return False
+        predicates.append(rule.where)
+        return True
+
+    elif isinstance(rule, BaseCourseRule):
+        if rule.course:
+            courses.add(rule.course)
+        if rule.ap:
+            ap_names.add(rule.ap)
+        return True
+
+    return False
+
+
+def clause_keys(clause: ResolvedClause) -> Set[str]:
+    if isinstance(clause, (AndClause, OrClause)):
+        return set(key for child in clause.children for key in clause_keys(child))
+    elif isinstance(clause, SingleClause):
+        return {clause.key}
+    return set()
+
+
+def canonical_clbid(position: int) -> str:
+    """
+    >>> canonical_clbid(2) < canonical_clbid(10)
+    True
+    """
+    return f"{CANONICAL_PREFIX}{position:06d}"
+
+
+def project_transcript(
+    analysis: AreaAnalysis,
+    *,
+    transcript: Sequence[CourseInstance],
+    transcript_with_failed: Sequence[CourseInstance],
+) -> Optional[Projection]:
+    """
+    Returns the student's projection for the analyzed area, or None if their
+    transcript can't be projected.
+    """
+    if not analysis.projectable:
+        return None
+
+    relevant = {c: None for c in (*transcript_with_failed, *transcript) if analysis.is_relevant(c)}
+    ordered = sorted(relevant, key=lambda c: c.clbid)
+
+    # the solver breaks ties between courses with the same clbid by their
+    # other fields, which the projection doesn't preserve (and the same row
+    # appearing twice would be collapsed)
+    if len(set(c.clbid for c in ordered)) != len(ordered):
+        return None
+
+    blanked: Dict[str, Any] = {} if analysis.observes_names() else {'name': ''}
+    canonical = {
+        c: c.evolve_offering(clbid=canonical_clbid(i), section=None, **blanked)
+        for i, c in enumerate(ordered)
+    }
+
+    return Projection(
+        transcript=tuple(canonical[c] for c in transcript if c in canonical),
+        transcript_with_failed=tuple(canonical[c] for c in transcript_with_failed if c in canonical),
+        courses=tuple(ordered),
+    )
+
+
+class ProjectionPickler(pickle.Pickler):
+    # swaps the canonical courses (and clbids) out for their positions
+    def persistent_id(self, obj: Any) -> Optional[Tuple[int, int]]:
+        if type(obj) is CourseInstance and obj.clbid.startswith(CANONICAL_PREFIX):
+            return (1, int(obj.clbid[len(CANONICAL_PREFIX):]))
+        if type(obj) is str and obj.startswith(CANONICAL_PREFIX):
+            return (0, int(obj[len(CANONICAL_PREFIX):]))
+        return None
+
+
+class ProjectionUnpickler(pickle.Unpickler):
+    def __init__(self, payload: bytes, *, courses: Sequence[CourseInstance]) -> None:
+        super().__init__(io.BytesIO(payload))
+        self.courses = courses
+
+    def persistent_load(self, pid: Tuple[int, int]) -> Union[CourseInstance, str]:
+        kind, position = pid
+        course = self.courses[position]
+        return course if kind == 1 else course.clbid
+
+
+def dump_projected(msg: ResultMsg) -> bytes:
+    buffer = io.BytesIO()
+    stripped = attr.evolve(msg, transcript=tuple(), potentials_for_all_clauses={})
+    ProjectionPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(stripped)
+    return buffer.getvalue()
+
+
+def load_projected(payload: bytes, projection: Projection, *, transcript: Tuple[CourseInstance, ...]) -> ResultMsg:
+    msg = cast(ResultMsg, ProjectionUnpickler(payload, courses=projection.courses).load())
+    msg.transcript = transcript
+    return msg
+
+
+_projected_results: Dict[str, bytes] = {}
+
+
+def audit_projection(
+    projection: Projection,
+    *,
+    area: AreaOfStudy,
+    area_digest: str,
+    constants: Constants,
+    area_pointers: Sequence[AreaPointer],
+    transcript: Tuple[CourseInstance, ...],
+) -> Iterator[Message]:
+    """
+    Audits the projection (unless it has already been audited), and yields
+    the result for the student that it was projected from.
+    """
+    key = audit_fingerprint(
+        area_digest=area_digest,
+        transcript=projection.transcript,
+        transcript_with_failed=projection.transcript_with_failed,
+        exceptions=[],
+        constants=constants,
+        area_pointers=area_pointers,
+    )
+
+    payload = _projected_results.get(key, None)
+
+    if payload is None:
+        cached = load_cached_result(key, transcript=projection.transcript)
+        if cached is not None:
+            payload = dump_projected(cached)
+
+    if payload is None:
+        logger.debug("auditing projection %s", key)
+        for msg in audit(
+            area=area,
+            exceptions=[],
+            transcript=projection.transcript,
+            transcript_with_failed=projection.transcript_with_failed,
+            constants=constants,
+            area_pointers=area_pointers,
+            print_all=False,
+            estimate_only=False,
+        ):
+            if isinstance(msg, ResultMsg):
+                store_result(key, msg)
+                payload = dump_projected(msg)
+            else:
+                yield msg
+
+    if payload is None:
+        return
+
+    if len(_projected_results) >= MAX_PROJECTED_RESULTS:
+        del _projected_results[next(iter(_projected_results))]
+    _projected_results[key] = payload
+
+    result = load_projected(payload, projection, transcript=transcript)
+    result.potentials_for_all_clauses = discover_clause_potential(area, c=constants)
+    yield result
+
+
+def clear_projected_results() -> None:
+    _projected_results.clear()
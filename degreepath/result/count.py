@@ -1,13 +1,18 @@
 import attr
-from typing import Tuple, Union, Sequence
+from typing import Tuple, Union, Sequence, List, Set, Dict, Any, TYPE_CHECKING
 
-from ..base import Result, BaseCountRule, Rule, Solution, BaseAssertionRule
+from ..base import Result, BaseCountRule, Rule, Solution, BaseAssertionRule, Summable, memoized
+
+if TYPE_CHECKING:
+    from ..claim import ClaimAttempt  # noqa: F401
+    from ..data import CourseInstance  # noqa: F401
 
 
 @attr.s(cache_hash=True, slots=True, kw_only=True, frozen=True, auto_attribs=True)
 class CountResult(Result, BaseCountRule):
     audit_results: Tuple[BaseAssertionRule, ...]
     overridden: bool
+    memo_: Dict[str, Any] = attr.ib(factory=dict, init=False, eq=False, repr=False)
 
     @staticmethod
     def from_solution(
@@ -33,6 +38,7 @@ class CountResult(Result, BaseCountRule):
     def was_overridden(self) -> bool:
         return self.overridden
 
+    @memoized
     def ok(self) -> bool:
         if self.was_overridden():
             return True
@@ -40,3 +46,23 @@ class CountResult(Result, BaseCountRule):
         passed_count = sum(1 if r.ok() else 0 for r in self.items)
         audit_passed = len(self.audit_results) == 0 or all(a.ok() for a in self.audit_results)
         return passed_count >= self.count and audit_passed
+
+    @memoized
+    def rank(self) -> Summable:
+        return BaseCountRule.rank(self)
+
+    @memoized
+    def max_rank(self) -> Summable:
+        return BaseCountRule.max_rank(self)
+
+    @memoized
+    def in_progress(self) -> bool:
+        return BaseCountRule.in_progress(self)
+
+    @memoized
+    def claims(self) -> List['ClaimAttempt']:
+        return BaseCountRule.claims(self)
+
+    @memoized
+    def matched(self) -> Set['CourseInstance']:
+        return set().union(*(item.matched() for item in self.items))
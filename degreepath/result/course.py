@@ -6,6 +6,7 @@ from ..base import Result, BaseCourseRule
 if TYPE_CHECKING:
     from ..claim import ClaimAttempt  # noqa: F401
     from ..data import CourseInstance  # noqa: F401
+    from ..solution.course import CourseSolution
 
 
 @attr.s(cache_hash=True, slots=True, kw_only=True, frozen=True, auto_attribs=True)
@@ -17,23 +18,23 @@ class CourseResult(Result, BaseCourseRule):
     @staticmethod
     def from_solution(
         *,
-        solution: BaseCourseRule,
+        solution: 'CourseSolution',
         claim_attempt: Optional['ClaimAttempt'] = None,
         min_grade_not_met: Optional['CourseInstance'] = None,
         overridden: bool = False,
     ) -> 'CourseResult':
         return CourseResult(
-            course=solution.course,
-            hidden=solution.hidden,
-            grade=solution.grade,
-            grade_option=solution.grade_option,
-            allow_claimed=solution.allow_claimed,
+            course=solution.rule.course,
+            hidden=solution.rule.hidden,
+            grade=solution.rule.grade,
+            grade_option=solution.rule.grade_option,
+            allow_claimed=solution.rule.allow_claimed,
             claim_attempt=claim_attempt,
             min_grade_not_met=min_grade_not_met,
             path=solution.path,
             overridden=overridden,
-            ap=solution.ap,
-            inserted=solution.inserted,
+            ap=solution.rule.ap,
+            inserted=solution.rule.inserted,
         )
 
     def to_dict(self) -> Dict[str, Any]:
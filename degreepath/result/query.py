@@ -1,10 +1,13 @@
 import attr
-from typing import Tuple, Sequence, List
+from typing import Tuple, Sequence, List, TYPE_CHECKING
 
 from .assertion import AssertionResult
 from ..base import Result, BaseQueryRule, Summable, BaseAssertionRule
 from ..claim import ClaimAttempt
 
+if TYPE_CHECKING:
+    from ..solution.query import QuerySolution
+
 
 @attr.s(cache_hash=True, slots=True, kw_only=True, frozen=True, auto_attribs=True)
 class QueryResult(Result, BaseQueryRule):
@@ -17,7 +20,7 @@ class QueryResult(Result, BaseQueryRule):
     @staticmethod
     def from_solution(
         *,
-        solution: BaseQueryRule,
+        solution: 'QuerySolution',
         resolved_assertions: Tuple[AssertionResult, ...],
         successful_claims: Tuple[ClaimAttempt, ...],
         failed_claims: Tuple[ClaimAttempt, ...],
@@ -26,12 +29,12 @@ class QueryResult(Result, BaseQueryRule):
         inserted: Tuple[str, ...] = tuple(),
     ) -> 'QueryResult':
         return QueryResult(
-            source=solution.source,
-            assertions=solution.assertions,
-            limit=solution.limit,
-            where=solution.where,
-            allow_claimed=solution.allow_claimed,
-            attempt_claims=solution.attempt_claims,
+            source=solution.rule.source,
+            assertions=solution.rule.assertions,
+            limit=solution.rule.limit,
+            where=solution.rule.where,
+            allow_claimed=solution.rule.allow_claimed,
+            attempt_claims=solution.rule.attempt_claims,
             resolved_assertions=resolved_assertions,
             successful_claims=successful_claims,
             failed_claims=failed_claims,
@@ -39,7 +42,7 @@ class QueryResult(Result, BaseQueryRule):
             path=solution.path,
             overridden=overridden,
             inserted=inserted,
-            load_potentials=solution.load_potentials,
+            load_potentials=solution.rule.load_potentials,
         )
 
     def only_failed_claims(self) -> Sequence[ClaimAttempt]:
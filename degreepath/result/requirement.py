@@ -1,8 +1,12 @@
 import attr
-from typing import Optional
+from typing import Optional, List, Set, Dict, Any, TYPE_CHECKING
 import logging
 
-from ..base import Base, Result, BaseRequirementRule, RuleState
+from ..base import Base, Result, BaseRequirementRule, RuleState, Summable, memoized
+
+if TYPE_CHECKING:
+    from ..claim import ClaimAttempt  # noqa: F401
+    from ..data import CourseInstance  # noqa: F401
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +14,7 @@ logger = logging.getLogger(__name__)
 @attr.s(cache_hash=True, slots=True, kw_only=True, frozen=True, auto_attribs=True)
 class RequirementResult(Result, BaseRequirementRule):
     overridden: bool
+    memo_: Dict[str, Any] = attr.ib(factory=dict, init=False, eq=False, repr=False)
 
     @staticmethod
     def from_solution(
@@ -38,6 +43,7 @@ class RequirementResult(Result, BaseRequirementRule):
     def was_overridden(self) -> bool:
         return self.overridden
 
+    @memoized
     def ok(self) -> bool:
         if self.was_overridden():
             return self.overridden
@@ -46,3 +52,27 @@ class RequirementResult(Result, BaseRequirementRule):
             return False
 
         return self.result.ok()
+
+    @memoized
+    def rank(self) -> Summable:
+        return BaseRequirementRule.rank(self)
+
+    @memoized
+    def max_rank(self) -> Summable:
+        return BaseRequirementRule.max_rank(self)
+
+    @memoized
+    def in_progress(self) -> bool:
+        return BaseRequirementRule.in_progress(self)
+
+    @memoized
+    def claims(self) -> List['ClaimAttempt']:
+        return BaseRequirementRule.claims(self)
+
+    @memoized
+    def matched(self) -> Set['CourseInstance']:
+        if self.audited_by or self.result is None:
+            return set()
+
+        # shared with the child, rather than rebuilt from its claims
+        return self.result.matched()
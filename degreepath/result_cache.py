@@ -0,0 +1,100 @@
+from typing import Any, Optional, Sequence, Tuple
+import hashlib
+import logging
+
+import attr
+
+from .audit import ResultMsg
+from .cache import cache_dir, engine_version, read_pickle, write_pickle
+from .constants import Constants
+from .data import CourseInstance, AreaPointer
+from .exception import RuleException
+from .warm_start import SearchHints
+
+logger = logging.getLogger(__name__)
+
+# Most students' audits don't change from one run to the next. An audit's
+# result is determined by the area specification, the student's transcript,
+# exceptions, and declared areas, the constants, and the engine itself, so
+# the final ResultMsg is cached under a fingerprint of all of those. The
+# cache lives on disk, under DP_CACHE_DIR, and is only used when that is set.
+#
+# The potentials are not cached with the result: they're keyed on clause
+# hashes, which change between processes. They are cached separately; see
+# discover_potentials.py.
+#
+# A warm start's hints are part of the fingerprint too. They don't change
+# the best rank that an audit finds, but they do change the order of the
+# search, and so which of several equally-ranked results it settles on, as
+# well as the iteration counts that are cached alongside it.
+
+
+def audit_fingerprint(
+    *,
+    area_digest: str,
+    transcript: Sequence[CourseInstance],
+    transcript_with_failed: Sequence[CourseInstance],
+    exceptions: Sequence[RuleException],
+    constants: Constants,
+    area_pointers: Sequence[AreaPointer],
+    hints: Optional[SearchHints] = None,
+) -> str:
+    """
+    A digest of everything that an audit's result depends on.
+
+    CourseInstance has a short, custom repr, so courses (and area pointers)
+    are fingerprinted by their fields instead.
+    """
+    identity = repr((
+        area_digest,
+        [attr.astuple(c) for c in transcript],
+        [attr.astuple(c) for c in transcript_with_failed],
+        [e.to_dict() for e in exceptions],
+        constants,
+        [attr.astuple(p) for p in area_pointers],
+        hints_identity(hints),
+        engine_version(),
+    ))
+
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def hints_identity(hints: Optional[SearchHints]) -> Any:
+    """
+    The hints in a stable order. (The iteration order of a frozenset of
+    strings varies between processes.)
+    """
+    if hints is None:
+        return None
+
+    return (
+        sorted((path, sorted(clbids)) for path, clbids in hints.claimed.items()),
+        sorted((path, sorted(selected)) for path, selected in hints.selected.items()),
+    )
+
+
+def load_cached_result(key: str, *, transcript: Tuple[CourseInstance, ...], cache_root: Optional[str] = None) -> Optional[ResultMsg]:
+    """
+    Returns the cached result for the fingerprint, without its potentials,
+    or None. The count, elapsed time, and iterations are those of the run
+    that produced the result.
+    """
+    directory = cache_dir('results', root=cache_root)
+    if not directory:
+        return None
+
+    cached = read_pickle(directory, key)
+    if not isinstance(cached, ResultMsg):
+        return None
+
+    logger.debug("using the cached result %s", key)
+    return attr.evolve(cached, transcript=transcript)
+
+
+def store_result(key: str, msg: ResultMsg, *, cache_root: Optional[str] = None) -> None:
+    directory = cache_dir('results', root=cache_root)
+    if not directory:
+        return
+
+    # the transcript is part of the key, so it doesn't need to be stored
+    write_pickle(directory, key, attr.evolve(msg, transcript=tuple(), potentials_for_all_clauses={}))
@@ -1,17 +1,18 @@
 import attr
-from typing import Dict, List, Sequence, Tuple, Iterator, Collection, Set, FrozenSet, Optional, Union, TYPE_CHECKING
+from typing import Dict, List, Sequence, Tuple, Iterator, Collection, Set, FrozenSet, Optional, Union, Hashable, TYPE_CHECKING
 import itertools
 import logging
 import sys
 import os
 
-from ..base import Rule, BaseCountRule, Result, Solution, sort_by_path
+from ..base import Base, Rule, BaseCountRule, BaseRequirementRule, Result, Solution, Summable, sort_by_path
 from ..constants import Constants
 from ..solution.count import CountSolution
 from ..ncr import mult
-from ..solve import find_best_solution
+from ..solve import find_best_solution, find_best_solutions
 from .course import CourseRule
 from .assertion import AssertionRule
+from ..warm_start import preferred_first
 
 if TYPE_CHECKING:
     from ..context import RequirementContext
@@ -52,16 +53,18 @@ class CountRule(Rule, BaseCountRule):
 
         path = [*path, f".count"]
 
+        # copy the list of items, because we append emphases to it below,
+        # and the specification may be shared between several loads
         if "all" in data:
-            items = data["all"]
+            items = list(data["all"])
         elif "any" in data:
-            items = data["any"]
+            items = list(data["any"])
         elif "both" in data:
-            items = data["both"]
+            items = list(data["both"])
         elif "either" in data:
-            items = data["either"]
+            items = list(data["either"])
         else:
-            items = data["of"]
+            items = list(data["of"])
 
         children_with_emphases = {**children}
         if emphases:
@@ -176,15 +179,39 @@ class CountRule(Rule, BaseCountRule):
         logger.debug('%s discovering children with potential', self.path)
         all_potential_rules = set(rule for rule in items if rule.has_potential(ctx=ctx))
 
-        if depth == 1 and all_potential_rules and not self.audit_clauses:
-            logger.debug('%s searching for disjoint children', self.path)
-            separated_children = self.find_independent_children(items=all_potential_rules, ctx=ctx)
-
-            independent_children = separated_children['disjoint']
-            codependent_children = separated_children['non_disjoint']
-
+        # Below the top level, the children are only split up when this rule
+        # would try all of them together anyway, so that the result has the
+        # same children as before, and when no rule above this one audits the
+        # courses that they match (which could need a different choice than
+        # the first passing one).
+        if all_potential_rules and not self.audit_clauses and (depth == 1 or (count >= len(all_potential_rules) and not has_audited_ancestor(self, ctx=ctx))):
+            logger.debug('%s searching for independent components', self.path)
+            components = self.find_components(items=all_potential_rules, ctx=ctx)
+
+            # Below the top level, a component is also only independent if no
+            # rule outside of this one can claim its courses.
+            if depth != 1:
+                components = [c for c in components if self.is_self_contained(c, ctx=ctx)]
+
+            independent_children = set(rule for c in components if len(c) == 1 for rule in c)
             independent_rule__results = self.solve_independent_children(ctx=ctx, independent_children=independent_children)
 
+            codependent_children = set(all_potential_rules).difference(independent_children)
+
+            # A component of several overlapping children can only be solved on
+            # its own when this rule would otherwise try every one of the
+            # codependent children together. (With fewer, the combinations of
+            # smaller sizes are tried first, and the first passing one wins.)
+            if count >= len(codependent_children):
+                for component in components:
+                    if len(component) == 1:
+                        continue
+                    component_results = self.solve_codependent_children(ctx=ctx, children=component)
+                    if component_results is None:
+                        continue
+                    independent_rule__results.update(component_results)
+                    codependent_children.difference_update(component)
+
             potential_rules = tuple(sorted(codependent_children, key=sort_by_path))
             solved_results: Tuple[Result, ...] = tuple(sorted((result for result in independent_rule__results.values() if result is not None), key=sort_by_path))
             solved_results__rules: Set[Rule] = set(r for r, result in independent_rule__results.items() if result is not None)
@@ -244,7 +271,11 @@ class CountRule(Rule, BaseCountRule):
     ) -> Iterator[CountSolution]:
         debug = __debug__ and logger.isEnabledFor(logging.DEBUG)
 
-        for combo_i, selected_children in enumerate(itertools.combinations(items, r)):
+        preferred = ctx.hints.preferred_children(self.path, items) if ctx.hints else None
+        if preferred is not None and len(preferred) != r:
+            preferred = None
+
+        for combo_i, selected_children in enumerate(preferred_first(itertools.combinations(items, r), preferred)):
             if debug: logger.debug("%s, r=%s, combo=%s: generating product(*solutions)", self.path, r, combo_i)
 
             deselected_children_set = set(all_children - children_with_results).difference(set(selected_children))
@@ -252,7 +283,7 @@ class CountRule(Rule, BaseCountRule):
 
             # itertools.product does this internally, so we'll pre-compute the results here
             # to make it obvious that it's not lazy
-            solutions_dict = {r: tuple(r.solutions(ctx=ctx)) for r in selected_children}
+            solutions_dict = {r: child_solutions(r, ctx=ctx) for r in selected_children}
             solutions = tuple(solutions_dict.values())
 
             if SHOW_ESTIMATES:
@@ -262,21 +293,52 @@ class CountRule(Rule, BaseCountRule):
                 body = '\n\t'.join(lines)
                 print(f"\nemitting {mult(lengths.values()):,} solutions at {ppath}\n\t{body}", file=sys.stderr)
 
+            # Each solution has the path of its rule, so every solution set in
+            # this combination sorts into the same order. We sort the rules
+            # once, and then only fill in the selected children's slots.
+            in_order: List[Union[Rule, Solution, Result]] = sorted(selected_children + deselected_children + results, key=sort_by_path)
+            slot_of = {id(item): i for i, item in enumerate(in_order)}
+            slots = [slot_of[id(child)] for child in selected_children]
+
             solutionset: Tuple[Union[Rule, Solution, Result], ...]
             for solset_i, solutionset in enumerate(itertools.product(*solutions)):
                 if debug and solset_i > 0 and solset_i % 10_000 == 0:
                     logger.debug("%s, r=%s, combo=%s solset=%s: generating product(*solutions)", self.path, r, combo_i, solset_i)
 
-                to_yield = tuple(sorted(solutionset + deselected_children + results, key=sort_by_path))
-                yield CountSolution.from_rule(rule=self, count=count, items=to_yield)
+                for slot, solution in zip(slots, solutionset):
+                    in_order[slot] = solution
+
+                yield CountSolution.from_rule(rule=self, count=count, items=tuple(in_order))
 
     def find_independent_children(self, *, items: Collection[Rule], ctx: 'RequirementContext') -> Dict[str, Collection[Rule]]:
         """
         We want to find each child rule that has no claimable overlap with any other child rule.
 
-        1. We only run this on a top-level CountRule
-        2. We collect all of the "matches" of each child rule as sets of courses
-        3. We look for the sets that are disjoint with every other set
+        These are the components of find_components() that have only one child.
+        """
+
+        components = self.find_components(items=items, ctx=ctx)
+
+        disjoint_rules = set(rule for c in components if len(c) == 1 for rule in c)
+        non_disjoint_rules = set(rule for c in components if len(c) > 1 for rule in c)
+
+        logger.debug("found disjoint rules: %s", [r.path for r in disjoint_rules])
+        logger.debug("found non-disjoint rules: %s", [r.path for r in non_disjoint_rules])
+
+        return {'disjoint': disjoint_rules, 'non_disjoint': non_disjoint_rules}
+
+    def find_components(self, *, items: Collection[Rule], ctx: 'RequirementContext') -> List[Tuple[Rule, ...]]:
+        """
+        We want to split the child rules into groups that have no claimable
+        overlap with each other.
+
+        1. We collect all of the "matches" of each child rule as sets of courses
+        2. Two children overlap if their matches intersect (unless neither one
+           will ever claim its matches)
+        3. The groups are the connected components of that overlap graph,
+           which we find with a union-find over the courses
+
+        Each component is returned as a tuple of its rules, sorted by path.
 
         I benchmarked five implementations of this logic; see benchmarks/bench_disjoints.py
 
@@ -288,36 +350,74 @@ class CountRule(Rule, BaseCountRule):
 
         all_rule_matches: Dict[Rule, FrozenSet['Clausable']] = {
             r: frozenset(r.all_matches(ctx=ctx))
-            for r in items
+            for r in sorted(items, key=sort_by_path)
         }
 
         if len(all_rule_matches) == 1:
             logger.debug("%s early-exit because there's only one potential child", self.path)
-            return {'disjoint': set(all_rule_matches.keys()), 'non_disjoint': set()}
+            return [tuple(all_rule_matches.keys())]
+
+        # Rather than comparing every pair of children, we index the children
+        # by course and merge the groups of the children that share a course,
+        # which is close to linear in the total number of matches.
+        parents: Dict[Rule, Rule] = {r: r for r in all_rule_matches}
+
+        def find(rule: Rule) -> Rule:
+            while parents[rule] is not rule:
+                parents[rule] = parents[parents[rule]]
+                rule = parents[rule]
+            return rule
+
+        def union(a: Rule, b: Rule) -> None:
+            root_a, root_b = find(a), find(b)
+            if root_a is not root_b:
+                parents[root_b] = root_a
+
+        rules_by_course: Dict['Clausable', List[Rule]] = {}
+        for rule, matches in all_rule_matches.items():
+            for course in matches:
+                rules_by_course.setdefault(course, []).append(rule)
+
+        for rules in rules_by_course.values():
+            # children that never claim their matches only overlap with children that do
+            claiming = [r for r in rules if not r.is_always_disjoint()]
+            if not claiming:
+                continue
 
-        non_disjoint_rules: Set[Rule] = set()
-        disjoint_rules: Set[Rule] = set()
+            for rule in rules:
+                union(claiming[0], rule)
 
-        for (rule_a, a_matches), (rule_b, b_matches) in itertools.combinations(all_rule_matches.items(), 2):
-            if rule_a.is_always_disjoint() and rule_b.is_always_disjoint():
-                disjoint_rules.add(rule_a)
-                disjoint_rules.add(rule_b)
-                continue
+        groups: Dict[Rule, List[Rule]] = {}
+        for rule in all_rule_matches:
+            groups.setdefault(find(rule), []).append(rule)
 
-            if a_matches.isdisjoint(b_matches):
-                disjoint_rules.add(rule_a)
-                disjoint_rules.add(rule_b)
-            else:
-                non_disjoint_rules.add(rule_a)
-                non_disjoint_rules.add(rule_b)
+        # the children were visited in path order, so each group is sorted already
+        components = [tuple(group) for group in groups.values()]
 
-        for s in non_disjoint_rules:
-            disjoint_rules.discard(s)
+        logger.debug("%s found components: %s", self.path, [[r.path for r in c] for c in components])
 
-        logger.debug("found disjoint rules: %s", [r.path for r in disjoint_rules])
-        logger.debug("found non-disjoint rules: %s", [r.path for r in non_disjoint_rules])
+        return components
 
-        return {'disjoint': disjoint_rules, 'non_disjoint': non_disjoint_rules}
+    def is_self_contained(self, component: Collection[Rule], *, ctx: 'RequirementContext') -> bool:
+        """
+        Checks that every rule that could claim one of the component's courses
+        is inside of the component, so that the component's claims can't
+        conflict with a rule elsewhere in the area.
+        """
+
+        claimants = area_claimants(ctx=ctx)
+        if claimants is None:
+            return False
+
+        paths = [r.path for r in component]
+
+        for rule in component:
+            for course in rule.all_matches(ctx=ctx):
+                for claimant in claimants.get(course, set()):
+                    if not any(claimant[:len(p)] == p for p in paths):
+                        return False
+
+        return True
 
     def solve_independent_children(self, *, ctx: 'RequirementContext', independent_children: Collection[Rule]) -> Dict[Rule, Optional[Result]]:
         """
@@ -327,19 +427,78 @@ class CountRule(Rule, BaseCountRule):
 
         Also, because these rules are each independent of any other rule, we
         can reset the context between each run, because we've already
-        guaranteed that there is no claimable overlap.
+        guaranteed that there is no claimable overlap. For the same reason,
+        when the context has an executor, they are solved concurrently.
         """
 
         logger.debug('%s: %s independent children', self.path, len(independent_children))
 
+        # children whose subtrees saw the same courses under another of the
+        # area's limited transcripts already have their results
         independent_rule__results: Dict[Rule, Optional[Result]] = {}
-        for child in independent_children:
-            best_result = find_best_solution(rule=child, ctx=ctx, reset_claims=True)
-            logger.debug("found solution for %s: %s", child.path, best_result)
+        unsolved: List[Rule] = []
+        for child in sorted(independent_children, key=sort_by_path):
+            key = subtree_key(child, ctx=ctx)
+            if ctx.subtree_cache is not None and key is not None and key in ctx.subtree_cache.results:
+                independent_rule__results[child] = ctx.subtree_cache.results[key]
+            else:
+                unsolved.append(child)
+
+        if ctx.executor is not None and len(unsolved) > 1:
+            solved = find_best_solutions(rules=unsolved, ctx=ctx, executor=ctx.executor)
+        else:
+            solved = {}
+            for child in unsolved:
+                best_result = find_best_solution(rule=child, ctx=ctx, reset_claims=True)
+                logger.debug("found solution for %s: %s", child.path, best_result)
+                solved[child] = best_result
+
+        for child, best_result in solved.items():
+            key = subtree_key(child, ctx=ctx)
+            if ctx.subtree_cache is not None and key is not None:
+                ctx.subtree_cache.results[key] = best_result
             independent_rule__results[child] = best_result
 
         return independent_rule__results
 
+    def solve_codependent_children(self, *, ctx: 'RequirementContext', children: Sequence[Rule]) -> Optional[Dict[Rule, Result]]:
+        """
+        Finds the best results for a component of children that overlap with
+        each other, but with nothing else, by trying their solutions together.
+
+        As with the independent children, this stops at the first set of
+        solutions where every child passes, and otherwise keeps the set with
+        the highest rank. Because the component is independent of the rest of
+        the area, a passing set is the same one that the full search would
+        have found first.
+        """
+
+        logger.debug('%s: solving %s codependent children together', self.path, len(children))
+
+        best_results: Optional[Tuple[Result, ...]] = None
+        best_rank: Optional[Summable] = None
+
+        with ctx.fresh_claims():
+            solutions = [tuple(child.solutions(ctx=ctx)) for child in children]
+
+            for solutionset in itertools.product(*solutions):
+                ctx.reset_claims()
+                results = tuple(s.audit(ctx=ctx) for s in solutionset)
+
+                if all(r.ok() for r in results):
+                    best_results = results
+                    break
+
+                rank = sum(r.rank() for r in results)
+                if best_rank is None or best_rank < rank:
+                    best_results = results
+                    best_rank = rank
+
+        if best_results is None:
+            return None
+
+        return dict(zip(children, best_results))
+
     def estimate(self, *, ctx: 'RequirementContext') -> int:
         logger.debug('CountRule.estimate')
 
@@ -385,3 +544,139 @@ class CountRule(Rule, BaseCountRule):
             matches.append(ctx.forced_course_by_clbid(insert.clbid, path=self.path))
 
         return matches
+
+
+def find_claimants(rule: Rule, *, ctx: 'RequirementContext') -> Dict['Clausable', Set[Tuple[str, ...]]]:
+    """Maps each course to the paths of the rules in the tree that could claim it."""
+
+    claimants: Dict['Clausable', Set[Tuple[str, ...]]] = {}
+
+    stack: List[Base] = [rule]
+    while stack:
+        r = stack.pop()
+
+        if isinstance(r, CountRule):
+            stack.extend(r.items)
+            for insert in ctx.get_insert_exceptions(r.path):
+                claimants.setdefault(ctx.forced_course_by_clbid(insert.clbid, path=r.path), set()).add(r.path)
+        elif isinstance(r, BaseRequirementRule):
+            if r.result is not None:
+                stack.append(r.result)
+        elif isinstance(r, Rule) and not isinstance(r, AssertionRule) and not r.is_always_disjoint():
+            for course in r.all_matches(ctx=ctx):
+                claimants.setdefault(course, set()).add(r.path)
+
+    return claimants
+
+
+def has_audited_ancestor(rule: Rule, *, ctx: 'RequirementContext') -> bool:
+    """
+    Checks whether any count rule above this one has audit clauses. Without
+    the area's rule to look through, we assume that one does.
+    """
+
+    if ctx.area_rule is None:
+        return True
+
+    stack: List[Base] = [ctx.area_rule]
+    while stack:
+        r = stack.pop()
+
+        if len(r.path) >= len(rule.path) or rule.path[:len(r.path)] != r.path:
+            continue
+
+        if isinstance(r, CountRule):
+            if r.audit_clauses:
+                return True
+            stack.extend(r.items)
+        elif isinstance(r, BaseRequirementRule):
+            if r.result is not None:
+                stack.append(r.result)
+
+    return False
+
+
+def area_claimants(*, ctx: 'RequirementContext') -> Optional[Dict['Clausable', Set[Tuple[str, ...]]]]:
+    """Returns the claimants of each course in the area, computing them once per transcript."""
+    if ctx.claimants_ is None and ctx.area_rule is not None:
+        ctx.claimants_ = find_claimants(ctx.area_rule, ctx=ctx)
+
+    return ctx.claimants_
+
+
+def observed_courses(rule: Rule, *, ctx: 'RequirementContext') -> FrozenSet['Clausable']:
+    """
+    Returns the courses that the rules in the tree can see. A rule's solutions
+    depend on the transcript only through these.
+    """
+
+    observed: Set['Clausable'] = set()
+
+    stack: List[Base] = [rule]
+    while stack:
+        r = stack.pop()
+
+        if isinstance(r, CountRule):
+            stack.extend(r.items)
+            for insert in ctx.get_insert_exceptions(r.path):
+                observed.add(ctx.forced_course_by_clbid(insert.clbid, path=r.path))
+        elif isinstance(r, BaseRequirementRule):
+            if r.result is not None:
+                stack.append(r.result)
+        elif isinstance(r, CourseRule):
+            observed.update(r.all_matches(ctx=ctx))
+            # has_potential also looks for the course by name, and for AP credit
+            observed.update(c for c in ctx.transcript() if c.course() == r.course)
+            ap_credit = ctx.find_ap_ib_credit_course(name=r.ap) if r.ap else None
+            if ap_credit is not None:
+                observed.add(ap_credit)
+        elif isinstance(r, Rule) and not isinstance(r, AssertionRule):
+            observed.update(r.all_matches(ctx=ctx))
+
+    return frozenset(observed)
+
+
+def subtree_key(rule: Rule, *, ctx: 'RequirementContext') -> Optional[Hashable]:
+    """
+    Returns the key of the rule's entries in the context's subtree cache, or
+    None if there's no cache.
+
+    Besides the courses that the tree can see, the key has the ones that some
+    rule outside of the tree could claim, because those decide which of the
+    tree's children can be solved on their own.
+    """
+
+    cache = ctx.subtree_cache
+    if cache is None:
+        return None
+
+    key = cache.keys.get(rule, None)
+    if key is not None:
+        return key
+
+    claimants = area_claimants(ctx=ctx)
+    if claimants is None:
+        return None
+
+    observed = observed_courses(rule, ctx=ctx)
+    claimed_outside = frozenset(
+        course for course in observed
+        if any(claimant[:len(rule.path)] != rule.path for claimant in claimants.get(course, set()))
+    )
+
+    key = cache.keys[rule] = (rule, observed, claimed_outside)
+    return key
+
+
+def child_solutions(rule: Rule, *, ctx: 'RequirementContext') -> Tuple[Solution, ...]:
+    """Returns all of the rule's solutions, through the subtree cache when there is one."""
+
+    key = subtree_key(rule, ctx=ctx)
+    if ctx.subtree_cache is None or key is None:
+        return tuple(rule.solutions(ctx=ctx))
+
+    solutions = ctx.subtree_cache.solutions.get(key, None)
+    if solutions is None:
+        solutions = ctx.subtree_cache.solutions[key] = tuple(rule.solutions(ctx=ctx))
+
+    return solutions
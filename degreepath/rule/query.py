@@ -15,6 +15,7 @@ from ..ncr import ncr
 from ..operator import Operator
 from ..data import CourseInstance
 from .assertion import AssertionRule
+from ..warm_start import preferred_first
 
 if TYPE_CHECKING:
     from ..context import RequirementContext
@@ -102,12 +103,15 @@ class QueryRule(Rule, BaseQueryRule):
             logger.debug("%s clause: %s", self.path, self.where)
             logger.debug("%s before filter: %s item(s)", self.path, len(data))
 
-            data = [item for item in data if self.where.apply(item)]
+            data = ctx.matching(self.where, data)
 
             logger.debug("%s after filter: %s item(s)", self.path, len(data))
 
+        # A rule that claims its courses searches the subsets of each item
+        # set, so it only needs the largest ones; a rule that doesn't uses
+        # each whole set, so it needs every one.
         did_iter = False
-        for item_set in self.limit.limited_transcripts(data):
+        for item_set in self.limit.limited_transcripts(data, maximal=self.attempt_claims):
             item_set = tuple(sorted(item_set))
 
             if self.attempt_claims is False:
@@ -121,7 +125,12 @@ class QueryRule(Rule, BaseQueryRule):
                 yield QuerySolution.from_rule(rule=self, output=item_set)
                 continue
 
-            for combo in iterate_item_set(item_set, rule=self):
+            # on a warm start, try the courses that this rule claimed last time first
+            preferred = ctx.hints.preferred_items(self.path, item_set) if ctx.hints else None
+            if preferred is not None and not is_candidate_item_set(preferred, item_set=item_set, rule=self):
+                preferred = None
+
+            for combo in preferred_first(iterate_item_set(item_set, rule=self), preferred):
                 did_iter = True
                 yield QuerySolution.from_rule(output=combo, rule=self)
 
@@ -134,11 +143,11 @@ class QueryRule(Rule, BaseQueryRule):
         data = self.get_data(ctx=ctx)
 
         if self.where is not None:
-            data = [item for item in data if self.where.apply(item)]
+            data = ctx.matching(self.where, data)
 
         did_iter = False
         iterations = 0
-        for item_set in self.limit.limited_transcripts(data):
+        for item_set in self.limit.limited_transcripts(data, maximal=self.attempt_claims):
             if self.attempt_claims is False:
                 iterations += 1
                 continue
@@ -187,7 +196,7 @@ class QueryRule(Rule, BaseQueryRule):
         matches = list(self.get_data(ctx=ctx))
 
         if self.where is not None:
-            matches = [item for item in matches if self.where.apply(item)]
+            matches = ctx.matching(self.where, matches)
 
         for insert in ctx.get_insert_exceptions(self.path):
             matches.append(ctx.forced_course_by_clbid(insert.clbid, path=self.path))
@@ -303,3 +312,16 @@ def iterate_item_set(item_set: Collection[Clausable], *, rule: QueryRule) -> Ite
     logger.debug("%s not running single assertion mode", rule.path)
     for n in range(1, len(item_set) + 1):
         yield from itertools.combinations(item_set, n)
+
+
+def is_candidate_item_set(combo: Tuple[Clausable, ...], *, item_set: Collection[Clausable], rule: QueryRule) -> bool:
+    """Answers whether iterate_item_set(item_set) would yield this combination (which must be drawn from item_set, in order)."""
+    simple_count_assertion = get_largest_simple_count_assertion(rule.assertions)
+    if simple_count_assertion is not None:
+        return len(combo) in simple_count_assertion.input_size_range(maximum=len(item_set))
+
+    simple_sum_assertion = get_largest_simple_sum_assertion(rule.assertions)
+    if simple_sum_assertion is not None:
+        return len(combo) > 0 and sum(cast(CourseInstance, c).credits for c in combo) >= simple_sum_assertion.expected
+
+    return 0 < len(combo) <= len(item_set)
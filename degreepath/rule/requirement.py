@@ -1,7 +1,6 @@
 from typing import Any, Mapping, Optional, List, Iterator, Collection, TYPE_CHECKING
 import logging
 import attr
-import markdown  # type: ignore
 
 from ..base import Rule, BaseRequirementRule
 from ..base.requirement import AuditedBy
@@ -85,9 +84,9 @@ class RequirementRule(Rule, BaseRequirementRule):
         if not audited_by and not result:
             raise TypeError(f'requirements need either audited_by or result (at {path})')
 
+        # the message is kept as markdown source; it's rendered to HTML when
+        # the result is serialized (see `render_message`)
         message = data.get("message", None)
-        if message:
-            message = markdown.markdown(message, extensions=['markdown.extensions.sane_lists', 'markdown.extensions.smarty'])
 
         return RequirementRule(
             name=name,
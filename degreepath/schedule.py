@@ -0,0 +1,163 @@
+from typing import Dict, List, Tuple, Optional, Callable, Sequence, Iterator
+import contextlib
+import heapq
+import logging
+import sqlite3
+import statistics
+
+import attr
+
+from .ms import parse_pretty_ms
+
+logger = logging.getLogger(__name__)
+
+# A batch's makespan is set by its slowest audits, and a handful of
+# students (with long transcripts in combinatorially-expensive majors) take
+# far longer than everyone else. If those start last, every other worker
+# sits idle while they finish.
+#
+# So each job's duration is predicted, and the jobs are dispatched longest
+# first (the LPT rule, which is within 4/3 of the optimal makespan). The
+# predictions come from, in order:
+#
+#     history     the job's own duration, from a previous run's results
+#     area        the median duration of the area's jobs in the history
+#     estimate    the solver's iteration estimate, times the median time per
+#                 iteration (only if an estimator is provided)
+#     default     everything else
+#
+# Only the order of dispatch changes; output is still printed in job order.
+
+# (stnum, catalog, area_code)
+Job = Tuple[str, str, str]
+
+DEFAULT_SECONDS = 1.0
+DEFAULT_SECONDS_PER_ITERATION = 0.001
+
+
+@attr.s(slots=True, kw_only=True, frozen=True, auto_attribs=True)
+class Prediction:
+    seconds: float
+    source: str
+
+
+@attr.s(slots=True, kw_only=True, frozen=True, auto_attribs=True)
+class CostModel:
+    durations: Dict[Job, float] = attr.ib(factory=dict)
+    area_priors: Dict[Tuple[str, str], float] = attr.ib(factory=dict)
+    seconds_per_iteration: float = DEFAULT_SECONDS_PER_ITERATION
+
+    @staticmethod
+    def from_history(durations: Dict[Job, float], *, per_iteration: Sequence[float] = tuple()) -> 'CostModel':
+        by_area: Dict[Tuple[str, str], List[float]] = {}
+        for (_, catalog, area_code), seconds in durations.items():
+            by_area.setdefault((catalog, area_code), []).append(seconds)
+
+        return CostModel(
+            durations=durations,
+            area_priors={area: statistics.median(seconds) for area, seconds in by_area.items()},
+            seconds_per_iteration=statistics.median(per_iteration) if per_iteration else DEFAULT_SECONDS_PER_ITERATION,
+        )
+
+    def predict(self, job: Job, *, estimate: Optional[Callable[[Job], Optional[int]]] = None) -> Prediction:
+        seconds = self.durations.get(job, None)
+        if seconds is not None:
+            return Prediction(seconds=seconds, source='history')
+
+        _, catalog, area_code = job
+        seconds = self.area_priors.get((catalog, area_code), None)
+        if seconds is not None:
+            return Prediction(seconds=seconds, source='area')
+
+        iterations = estimate(job) if estimate is not None else None
+        if iterations is not None:
+            return Prediction(seconds=iterations * self.seconds_per_iteration, source='estimate')
+
+        return Prediction(seconds=DEFAULT_SECONDS, source='default')
+
+
+def load_history(path: str) -> CostModel:
+    """
+    Reads the durations of finished audits from a results database (in the
+    schema that dp-sqlite.py writes), keeping the most recent for each job.
+    """
+    durations: Dict[Job, float] = {}
+    per_iteration: List[float] = []
+
+    with contextlib.closing(sqlite3.connect(path)) as conn:
+        rows = conn.execute('''
+            SELECT student_id, catalog, area_code, duration, per_iteration
+            FROM result
+            WHERE NOT in_progress AND error IS NULL AND duration IS NOT NULL
+            ORDER BY ts
+        ''')
+
+        for stnum, catalog, area_code, duration, per_iter in rows:
+            ms = parse_pretty_ms(str(duration))
+            if ms is None:
+                continue
+            durations[(str(stnum), str(catalog), str(area_code))] = float(ms) / 1_000
+
+            ms = parse_pretty_ms(str(per_iter)) if per_iter is not None else None
+            if ms:
+                per_iteration.append(float(ms) / 1_000)
+
+    logger.info("loaded %s historical durations from %s", len(durations), path)
+    return CostModel.from_history(durations, per_iteration=per_iteration)
+
+
+def longest_first(jobs: Sequence[Job], predictions: Dict[Job, Prediction]) -> List[int]:
+    """
+    Returns the positions of the jobs, ordered by their predicted duration,
+    longest first; ties keep their original order.
+
+    >>> p = lambda s: Prediction(seconds=s, source='history')
+    >>> longest_first([('1', 'c', 'a'), ('2', 'c', 'a'), ('3', 'c', 'a')], {('1', 'c', 'a'): p(1), ('2', 'c', 'a'): p(5), ('3', 'c', 'a'): p(1)})
+    [1, 0, 2]
+    """
+    return sorted(range(len(jobs)), key=lambda i: -predictions[jobs[i]].seconds)
+
+
+def simulate_makespan(durations: Sequence[float], *, workers: int) -> float:
+    """
+    Returns how long the jobs (in dispatch order) take when each one goes to
+    the next worker to come free.
+
+    >>> simulate_makespan([5, 3, 3, 2, 2, 1], workers=2)
+    8.0
+    >>> simulate_makespan([1, 2, 2, 3, 3, 5], workers=2)
+    10.0
+    """
+    finish_times = [0.0] * max(workers, 1)
+    for duration in durations:
+        heapq.heapreplace(finish_times, finish_times[0] + duration)
+    return max(finish_times)
+
+
+def schedule_report(
+    order: Sequence[Job],
+    *,
+    predictions: Dict[Job, Prediction],
+    actuals: Dict[Job, float],
+    workers: int,
+    elapsed: float,
+) -> Iterator[str]:
+    """Yields a summary of how the predictions compared to the actual durations."""
+    finished = [job for job in order if job in actuals]
+    if not finished:
+        return
+
+    sources: Dict[str, int] = {}
+    for job in finished:
+        sources[predictions[job].source] = sources.get(predictions[job].source, 0) + 1
+
+    predicted_makespan = simulate_makespan([predictions[job].seconds for job in finished], workers=workers)
+    errors = [abs(predictions[job].seconds - actuals[job]) for job in finished]
+
+    yield f"predictions: {', '.join(f'{n:,} from {source}' for source, n in sorted(sources.items()))}"
+    yield f"makespan: predicted {predicted_makespan:.2f}s, actual {elapsed:.2f}s (over {workers} workers)"
+    yield f"median absolute error: {statistics.median(errors):.2f}s"
+
+    worst = sorted(finished, key=lambda job: -abs(predictions[job].seconds - actuals[job]))[:5]
+    for job in worst:
+        yield f"  {' '.join(job)}: predicted {predictions[job].seconds:.2f}s ({predictions[job].source}), actual {actuals[job]:.2f}s"
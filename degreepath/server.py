@@ -0,0 +1,400 @@
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple, BinaryIO
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import pathlib
+import pickle
+import queue
+import re
+import signal
+import socket
+import socketserver
+import struct
+import threading
+import time
+import traceback
+
+from .audit import Message, ExceptionMsg, ProgressMsg
+from .area_cache import load_specification, specification_digest
+from .data import load_course
+from .entrypoint import load_common
+
+logger = logging.getLogger(__name__)
+
+# The audit server keeps a pool of worker processes alive, each with the
+# area specifications preloaded, and audits students that clients send it
+# over a Unix socket. If a worker dies in the middle of an audit, the audit
+# fails with an ExceptionMsg, and a new worker takes the old one's place.
+#
+# Workers take jobs from a shared queue, and announce each one that they
+# start. One that dies between taking a job and announcing it leaves no
+# record of which job it had; the server then fails the oldest job that
+# hasn't been announced, which (the queue being first-in, first-out) is
+# the one that was taken.
+#
+# A client sends a single line of JSON:
+#
+#     {"student": {...}, "area_code": "140", "catalog": "2019-20",
+#      "exceptions": [...], "progress": true}
+#
+# where "student" is a student document (the same shape as the files that
+# dp.py reads), and "exceptions" (optional) replaces the student's own
+# exceptions. The server replies with the audit's Message objects, each one
+# pickled and prefixed by its length, and closes the connection when the
+# audit is finished.
+#
+# Requests are plain JSON, so a client can't make the server run anything;
+# the replies are pickles, so clients must trust the server. Keep the socket
+# somewhere that only the registrar app's user can reach.
+
+FRAME_LENGTH = struct.Struct('<I')
+
+SAFE_NAME = re.compile(r'^[\w.-]+$')
+
+
+def write_frame(outfile: BinaryIO, payload: bytes) -> None:
+    outfile.write(FRAME_LENGTH.pack(len(payload)))
+    outfile.write(payload)
+
+
+def read_frame(infile: BinaryIO) -> Optional[bytes]:
+    header = infile.read(FRAME_LENGTH.size)
+    if not header:
+        return None
+    if len(header) < FRAME_LENGTH.size:
+        raise EOFError('connection closed in the middle of a message')
+
+    length, = FRAME_LENGTH.unpack(header)
+    payload = infile.read(length)
+    if len(payload) < length:
+        raise EOFError('connection closed in the middle of a message')
+
+    return payload
+
+
+def dump_message(msg: Message) -> bytes:
+    try:
+        return pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        if not isinstance(msg, ExceptionMsg):
+            raise
+        # not every exception can be pickled; the client still needs to know
+        # what went wrong
+        safe_msg = ExceptionMsg(ex=RuntimeError(repr(msg.ex)), tb=msg.tb, stnum=msg.stnum, area_code=msg.area_code)
+        return pickle.dumps(safe_msg, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def request_audit(
+    socket_path: str,
+    *,
+    student: Dict[str, Any],
+    area_code: str,
+    catalog: str,
+    exceptions: Optional[List[Dict[str, Any]]] = None,
+    progress: bool = True,
+) -> Iterator[Message]:
+    """Sends an audit to the server at socket_path, and yields its messages as they arrive."""
+    request: Dict[str, Any] = {"student": student, "area_code": area_code, "catalog": catalog, "progress": progress}
+    if exceptions is not None:
+        request["exceptions"] = exceptions
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+
+        with sock.makefile('rwb') as stream:
+            stream.write(json.dumps(request).encode('utf-8') + b'\n')
+            stream.flush()
+
+            while True:
+                payload = read_frame(stream)  # type: ignore
+                if payload is None:
+                    return
+                yield pickle.loads(payload)
+
+
+# how often a client's handler, while it waits for messages, checks that
+# the workers are still alive
+WORKER_CHECK_SECONDS = 1.0
+
+
+class AuditServer:
+    def __init__(self, *, socket_path: str, areas_dir: str, workers: int = 1) -> None:
+        self.socket_path = socket_path
+        self.areas_dir = areas_dir
+
+        # workers that die are replaced from the handlers' threads, which
+        # isn't safe to do by forking
+        self._context = multiprocessing.get_context('spawn')
+        self._jobs: Any = self._context.Queue()
+        self._results: Any = self._context.Queue()
+        self._pending: Dict[int, 'queue.Queue[Optional[bytes]]'] = {}
+        self._pending_lock = threading.Lock()
+        self._job_ids = itertools.count()
+
+        # the job that each worker (by pid) is working on, the jobs that have
+        # been queued but not yet announced by a worker (oldest first), and
+        # the workers that have died, with when they died if they hadn't
+        # announced a job
+        self._running: Dict[int, int] = {}
+        self._unannounced: Dict[int, None] = {}
+        self._dead: Set[int] = set()
+        self._silent: Dict[int, Tuple[float, Optional[int]]] = {}
+        self._stopping = False
+
+        self._workers_lock = threading.Lock()
+        self._workers = [self._start_worker() for _ in range(max(workers, 1))]
+
+        self._router = threading.Thread(target=self._route_results, daemon=True)
+        self._router.start()
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        # the socket is created with the umask's permissions, so that it's
+        # never reachable by other users, even briefly
+        umask = os.umask(0o177)
+        try:
+            self._server = ThreadingUnixStreamServer(socket_path, RequestHandler)
+        finally:
+            os.umask(umask)
+        self._server.audit_server = self  # type: ignore
+
+    def serve_forever(self) -> None:
+        logger.info("listening on %s with %s workers", self.socket_path, len(self._workers))
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stops accepting audits, then stops the workers. Must not be called from the serving thread."""
+        self._server.shutdown()
+        self._server.server_close()
+
+        with self._workers_lock:
+            self._stopping = True
+
+        for _ in self._workers:
+            self._jobs.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+        self._results.put(None)
+        self._router.join()
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def submit(self, request: Dict[str, Any]) -> Iterator[bytes]:
+        """Queues an audit and yields its pickled messages, as the worker produces them."""
+        area_code = str(request.get('area_code', ''))
+        catalog = str(request.get('catalog', ''))
+        student = request.get('student', None)
+
+        if not isinstance(student, dict) or not SAFE_NAME.match(area_code) or not SAFE_NAME.match(catalog) or '..' in catalog:
+            error = ValueError('an audit needs a student document, an area_code, and a catalog')
+            yield dump_message(ExceptionMsg(ex=error, tb='', stnum=None, area_code=area_code or None))
+            return
+
+        area_file = os.path.join(self.areas_dir, catalog, f"{area_code}.yaml")
+
+        job_id = next(self._job_ids)
+        messages: 'queue.Queue[Optional[bytes]]' = queue.Queue()
+        with self._pending_lock:
+            self._pending[job_id] = messages
+            self._unannounced[job_id] = None
+
+        try:
+            self._jobs.put((job_id, request, area_file))
+
+            while True:
+                try:
+                    payload = messages.get(timeout=WORKER_CHECK_SECONDS)
+                except queue.Empty:
+                    self._check_workers()
+                    continue
+
+                if payload is None:
+                    return
+                yield payload
+        finally:
+            with self._pending_lock:
+                del self._pending[job_id]
+                self._unannounced.pop(job_id, None)
+
+    def _start_worker(self) -> Any:
+        worker = self._context.Process(target=worker_main, args=(self.areas_dir, self._jobs, self._results), daemon=True)
+        worker.start()
+        return worker
+
+    def _check_workers(self) -> None:
+        """Fails the job of each worker that has died, and starts a new worker in its place."""
+        with self._workers_lock:
+            if self._stopping:
+                return
+
+            for i, worker in enumerate(self._workers):
+                if worker.is_alive():
+                    continue
+
+                logger.warning("worker %s exited with code %s; starting a new one", worker.pid, worker.exitcode)
+
+                with self._pending_lock:
+                    self._dead.add(worker.pid)
+                    job_id = self._running.pop(worker.pid, None)
+                    if job_id is None:
+                        self._silent[worker.pid] = (time.monotonic(), worker.exitcode)
+                if job_id is not None:
+                    self._fail_job(job_id, exitcode=worker.exitcode)
+
+                self._workers[i] = self._start_worker()
+
+            self._fail_lost_jobs()
+
+    def _fail_lost_jobs(self) -> None:
+        """
+        Fails a job for each worker that died without announcing one. Its
+        announcement may still be on its way, so each worker is given a
+        moment first.
+        """
+        lost = []
+        with self._pending_lock:
+            for pid, (died_at, exitcode) in list(self._silent.items()):
+                if time.monotonic() - died_at < WORKER_CHECK_SECONDS:
+                    continue
+                del self._silent[pid]
+                if self._unannounced:
+                    job_id = next(iter(self._unannounced))
+                    del self._unannounced[job_id]
+                    lost.append((job_id, exitcode))
+
+        for job_id, exitcode in lost:
+            logger.warning("failing job %s, which a worker took but never started", job_id)
+            self._fail_job(job_id, exitcode=exitcode)
+
+    def _fail_job(self, job_id: int, *, exitcode: Optional[int]) -> None:
+        with self._pending_lock:
+            messages = self._pending.get(job_id, None)
+        if messages is None:
+            return
+
+        error = RuntimeError(f'the worker exited with code {exitcode} during the audit')
+        messages.put(dump_message(ExceptionMsg(ex=error, tb='', stnum=None, area_code=None)))
+        messages.put(None)
+
+    def _route_results(self) -> None:
+        while True:
+            item = self._results.get()
+            if item is None:
+                return
+
+            job_id, payload = item
+
+            # a worker announces each job that it starts with its pid
+            if isinstance(payload, int):
+                with self._pending_lock:
+                    self._unannounced.pop(job_id, None)
+                    died = payload in self._dead
+                    if not died:
+                        self._running[payload] = job_id
+                    else:
+                        self._silent.pop(payload, None)
+                if died:
+                    self._fail_job(job_id, exitcode=None)
+                continue
+
+            with self._pending_lock:
+                if payload is None:
+                    for pid, running_job_id in list(self._running.items()):
+                        if running_job_id == job_id:
+                            del self._running[pid]
+                messages = self._pending.get(job_id, None)
+            if messages is not None:
+                messages.put(payload)
+
+
+class ThreadingUnixStreamServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        audit_server: AuditServer = self.server.audit_server  # type: ignore
+
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        try:
+            request = json.loads(line)
+        except ValueError as ex:
+            request = {}
+            logger.warning("could not parse request: %s", ex)
+
+        connected = True
+        for payload in audit_server.submit(request if isinstance(request, dict) else {}):
+            # keep draining the audit even if the client has gone away, so
+            # that its worker's messages don't pile up
+            if not connected:
+                continue
+            try:
+                write_frame(self.wfile, payload)  # type: ignore
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                connected = False
+
+
+def worker_main(areas_dir: str, jobs: Any, results: Any) -> None:
+    # the server process handles Ctrl-C, and shuts the workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    common = load_common()
+    preload_specifications(areas_dir)
+
+    while True:
+        item = jobs.get()
+        if item is None:
+            return
+
+        job_id, request, area_file = item
+        student = request['student']
+
+        results.put((job_id, os.getpid()))
+
+        try:
+            if 'exceptions' in request:
+                student = dict(student, exceptions=request['exceptions'])
+
+            courses = tuple(load_course(row) for row in student['courses'])
+
+            for msg in common.audit_student(student, courses, area_files=[area_file]):
+                if isinstance(msg, ProgressMsg) and not request.get('progress', True):
+                    continue
+                results.put((job_id, dump_message(msg)))
+
+        except Exception as ex:
+            msg = ExceptionMsg(ex=ex, tb=traceback.format_exc(), stnum=student.get('stnum', None), area_code=request['area_code'])
+            results.put((job_id, dump_message(msg)))
+
+        finally:
+            results.put((job_id, None))
+
+
+def preload_specifications(areas_dir: str) -> int:
+    """Parses every area specification under areas_dir into the in-process cache."""
+    count = 0
+
+    for path in sorted(pathlib.Path(areas_dir).glob('*/*.yaml')):
+        if not path.is_file():
+            continue
+
+        raw = path.read_bytes()
+        try:
+            load_specification(raw, digest=specification_digest(raw))
+            count += 1
+        except Exception as ex:
+            logger.warning("could not preload %s: %s", path, ex)
+
+    logger.debug("preloaded %s area specifications", count)
+    return count
@@ -0,0 +1,83 @@
+from typing import Dict, List, Tuple, Iterable, Any
+
+import attr
+
+from .constants import Constants
+from .context import TranscriptIndexes
+from .data import CourseInstance, AreaPointer, GradeCode, GradeOption, TranscriptCode
+from .exception import RuleException, load_exception
+
+# A student is usually audited against three to five areas (their majors,
+# minors, concentrations, and degree) in a row. A session holds what those
+# audits have in common: the filtered transcripts, the exceptions, and the
+# indexes over the student's courses, so that each is built once per student
+# instead of once per area.
+
+# [N]o-Pass, [U]nsuccessful, [AU]dit, [UA]nsuccessfulAudit, [WF]ithdrawnFail, [WP]ithdrawnPass, and [W]ithdrawn
+EXCLUDED_GRADES = frozenset([GradeCode._N, GradeCode._U, GradeCode._AU, GradeCode._UA, GradeCode._WF, GradeCode._WP, GradeCode._W])
+EXCLUDED_TRANSCRIPT_CODES = frozenset([TranscriptCode.RepeatedLater, TranscriptCode.RepeatInProgress])
+
+
+def is_excluded(c: CourseInstance) -> bool:
+    """
+    Answers whether the course is left out of the transcript entirely. (Failed
+    courses are only left out of the transcript that doesn't include them.)
+
+    We need to leave repeated courses in the transcript, because some majors
+    (THEAT) require repeated courses for completion.
+    """
+    if c.grade_option is GradeOption.Audit:
+        return True
+
+    if c.transcript_code in EXCLUDED_TRANSCRIPT_CODES:
+        return True
+
+    return c.grade_code in EXCLUDED_GRADES
+
+
+def partition_transcript(courses: Iterable[CourseInstance]) -> Tuple[Tuple[CourseInstance, ...], Tuple[CourseInstance, ...]]:
+    """Returns the transcript, and the transcript including failed courses, in a single pass."""
+    transcript: List[CourseInstance] = []
+    transcript_with_failed: List[CourseInstance] = []
+
+    for c in courses:
+        if is_excluded(c):
+            continue
+
+        transcript_with_failed.append(c)
+        if c.grade_code is not GradeCode.F:
+            transcript.append(c)
+
+    return tuple(transcript), tuple(transcript_with_failed)
+
+
+@attr.s(slots=True, kw_only=True, auto_attribs=True)
+class StudentSession:
+    stnum: str
+    constants: Constants
+    area_pointers: Tuple[AreaPointer, ...]
+    transcript: Tuple[CourseInstance, ...]
+    transcript_with_failed: Tuple[CourseInstance, ...]
+    exceptions: Dict[str, List[RuleException]]
+    indexes: TranscriptIndexes = attr.ib(factory=TranscriptIndexes)
+
+    @staticmethod
+    def load(student: Dict[str, Any], courses: Iterable[CourseInstance]) -> 'StudentSession':
+        transcript, transcript_with_failed = partition_transcript(courses)
+
+        exceptions: Dict[str, List[RuleException]] = {}
+        for e in student.get("exceptions", []):
+            exceptions.setdefault(e['area_code'], []).append(load_exception(e))
+
+        return StudentSession(
+            stnum=student['stnum'],
+            constants=Constants(matriculation_year=0 if student['matriculation'] == '' else int(student['matriculation'])),
+            area_pointers=tuple(AreaPointer.from_dict(a) for a in student['areas']),
+            transcript=transcript,
+            transcript_with_failed=transcript_with_failed,
+            exceptions=exceptions,
+        )
+
+    def exceptions_for(self, area_code: str) -> List[RuleException]:
+        # each audit gets its own list, as the old per-area loading did
+        return list(self.exceptions.get(area_code, []))
@@ -1,10 +1,14 @@
 import attr
-from typing import Optional, TYPE_CHECKING
+from typing import Optional, Dict, Any, TYPE_CHECKING
+from decimal import Decimal
 import logging
 
 from ..base import Solution, BaseCourseRule
+from ..data.course_enums import GradeOption
 from ..result.course import CourseResult
 from ..claim import ClaimAttempt
+from ..clause import SingleClause
+from ..operator import Operator
 
 if TYPE_CHECKING:
     from ..context import RequirementContext
@@ -14,22 +18,56 @@ logger = logging.getLogger(__name__)
 
 
 @attr.s(cache_hash=True, slots=True, kw_only=True, frozen=True, auto_attribs=True)
-class CourseSolution(Solution, BaseCourseRule):
+class CourseSolution(Solution):
+    rule: BaseCourseRule
     overridden: bool
 
     @staticmethod
     def from_rule(*, rule: BaseCourseRule, overridden: bool = False) -> 'CourseSolution':
-        return CourseSolution(
-            course=rule.course,
-            hidden=rule.hidden,
-            grade=rule.grade,
-            allow_claimed=rule.allow_claimed,
-            path=rule.path,
-            overridden=overridden,
-            ap=rule.ap,
-            inserted=rule.inserted,
-            grade_option=rule.grade_option,
-        )
+        return CourseSolution(rule=rule, path=rule.path, overridden=overridden)
+
+    @property
+    def course(self) -> str:
+        return self.rule.course
+
+    @property
+    def ap(self) -> Optional[str]:
+        return self.rule.ap
+
+    @property
+    def hidden(self) -> bool:
+        return self.rule.hidden
+
+    @property
+    def grade(self) -> Optional[Decimal]:
+        return self.rule.grade
+
+    @property
+    def grade_option(self) -> Optional[GradeOption]:
+        return self.rule.grade_option
+
+    @property
+    def allow_claimed(self) -> bool:
+        return self.rule.allow_claimed
+
+    @property
+    def inserted(self) -> bool:
+        return self.rule.inserted
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.rule.to_dict(), **super().to_dict()}
+
+    def type(self) -> str:
+        return "course"
+
+    def rank(self) -> Decimal:
+        return self.rule.rank()
+
+    def in_progress(self) -> bool:
+        return self.rule.in_progress()
+
+    def max_rank(self) -> int:
+        return self.rule.max_rank()
 
     def audit(self, *, ctx: 'RequirementContext') -> CourseResult:
         if self.overridden:
@@ -37,11 +75,15 @@ class CourseSolution(Solution, BaseCourseRule):
 
         claim: Optional[ClaimAttempt] = None
 
+        # claims are made with the same course clause that make_claim would
+        # have built from a course solution
+        clause = SingleClause(key='course', expected=self.course, expected_verbatim=self.course, operator=Operator.EqualTo)
+
         for insert in ctx.get_insert_exceptions(self.path):
             logger.debug('inserting %s into %s due to override', insert.clbid, self)
             matched_course = ctx.forced_course_by_clbid(insert.clbid, path=self.path)
 
-            claim = ctx.make_claim(course=matched_course, path=self.path, clause=self, allow_claimed=insert.forced)
+            claim = ctx.make_claim(course=matched_course, path=self.path, clause=clause, allow_claimed=insert.forced)
 
             if not claim.failed:
                 logger.debug('%s course "%s" exists, and has not been claimed', self.path, matched_course.course())
@@ -51,7 +93,7 @@ class CourseSolution(Solution, BaseCourseRule):
             ap_ib_credit_course = ctx.find_ap_ib_credit_course(name=self.ap)
             if ap_ib_credit_course:
                 matched_course = ap_ib_credit_course
-                claim = ctx.make_claim(course=matched_course, path=self.path, clause=self)
+                claim = ctx.make_claim(course=matched_course, path=self.path, clause=clause)
 
                 if not claim.failed:
                     logger.debug('%s course "%s" exists, and has not been claimed', self.path, matched_course.course())
@@ -70,7 +112,7 @@ class CourseSolution(Solution, BaseCourseRule):
                 logger.debug('%s course "%s" exists, but the course was taken %s, and the area requires that it be taken %s', self.path, self.course, matched_course.grade_option, self.grade_option)
                 continue
 
-            claim = ctx.make_claim(course=matched_course, path=self.path, clause=self)
+            claim = ctx.make_claim(course=matched_course, path=self.path, clause=clause)
 
             if not claim.failed:
                 logger.debug('%s course "%s" exists, and has not been claimed', self.path, matched_course.course())
@@ -1,13 +1,15 @@
 import attr
-from typing import List, Sequence, Any, Tuple, Dict, TYPE_CHECKING
+from typing import List, Sequence, Any, Tuple, Dict, Optional, TYPE_CHECKING
 import logging
 
-from ..base import Solution, BaseQueryRule
+from ..base import Solution, BaseQueryRule, Summable
+from ..base.query import QuerySource
 from ..result.query import QueryResult
 from ..rule.assertion import AssertionRule
 from ..result.assertion import AssertionResult
 from ..data import CourseInstance, AreaPointer, Clausable
-from ..clause import SingleClause, Operator
+from ..clause import Clause, SingleClause, Operator
+from ..limit import LimitSet
 
 if TYPE_CHECKING:
     from ..claim import ClaimAttempt  # noqa: F401
@@ -16,33 +18,70 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
+# A query yields one solution per combination of its matched courses, so a
+# search can build millions of them. Rather than copying each of the rule's
+# fields onto every solution, a solution keeps a reference to its rule and
+# stores only the output that differs between them.
+
+
 @attr.s(cache_hash=True, slots=True, kw_only=True, frozen=True, auto_attribs=True)
-class QuerySolution(Solution, BaseQueryRule):
+class QuerySolution(Solution):
+    rule: BaseQueryRule
     output: Tuple[Clausable, ...]
     overridden: bool
 
     @staticmethod
     def from_rule(*, rule: BaseQueryRule, output: Tuple[Clausable, ...], overridden: bool = False) -> 'QuerySolution':
-        return QuerySolution(
-            source=rule.source,
-            assertions=rule.assertions,
-            limit=rule.limit,
-            where=rule.where,
-            allow_claimed=rule.allow_claimed,
-            attempt_claims=rule.attempt_claims,
-            output=output,
-            path=rule.path,
-            overridden=overridden,
-            inserted=rule.inserted,
-            load_potentials=rule.load_potentials,
-        )
+        return QuerySolution(rule=rule, output=output, path=rule.path, overridden=overridden)
+
+    @property
+    def source(self) -> QuerySource:
+        return self.rule.source
+
+    @property
+    def assertions(self) -> Tuple[AssertionRule, ...]:
+        return self.rule.assertions
+
+    @property
+    def limit(self) -> LimitSet:
+        return self.rule.limit
+
+    @property
+    def where(self) -> Optional[Clause]:
+        return self.rule.where
+
+    @property
+    def allow_claimed(self) -> bool:
+        return self.rule.allow_claimed
+
+    @property
+    def attempt_claims(self) -> bool:
+        return self.rule.attempt_claims
+
+    @property
+    def inserted(self) -> Tuple[str, ...]:
+        return self.rule.inserted
+
+    @property
+    def load_potentials(self) -> bool:
+        return self.rule.load_potentials
 
     def to_dict(self) -> Dict[str, Any]:
         return {
+            **self.rule.to_dict(),
             **super().to_dict(),
             "output": [x.to_dict() for x in self.output],
         }
 
+    def type(self) -> str:
+        return "query"
+
+    def max_rank(self) -> Summable:
+        return self.rule.max_rank()
+
+    def in_progress(self) -> bool:
+        return self.rule.in_progress()
+
     def audit(self, *, ctx: 'RequirementContext') -> QueryResult:  # noqa: C901
         debug = __debug__ and logger.isEnabledFor(logging.DEBUG)
 
@@ -1,5 +1,10 @@
-from typing import Optional, TYPE_CHECKING
+from typing import Optional, Dict, Sequence, Iterator, TYPE_CHECKING
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from collections import defaultdict
+from contextlib import contextmanager
+import sys
 
+import attr
 
 if TYPE_CHECKING:
     from .base import Result, Rule  # noqa: F401
@@ -33,3 +38,62 @@ def find_best_solution(*, rule: 'Rule', ctx: 'RequirementContext', reset_claims:
         ctx.set_claims(claims)
 
     return result
+
+
+def find_best_solutions(*, rules: Sequence['Rule'], ctx: 'RequirementContext', executor: Executor) -> Dict['Rule', Optional['Result']]:
+    """
+    Finds the best solution for each of the rules at once, with the executor.
+    The rules must not be able to claim any of the same courses, because each
+    one is solved against its own copy of the context, without the others'
+    claims.
+
+    The results are returned in the order of the rules, regardless of which
+    finished first.
+    """
+    # the worker's copies can't hand out further work, and the match cache is
+    # only worth sharing within one process
+    shared_indexes = ctx.indexes if isinstance(executor, ThreadPoolExecutor) else None
+
+    futures = [
+        executor.submit(
+            find_best_solution_in_worker,
+            rule,
+            attr.evolve(ctx, executor=None, indexes=shared_indexes, claims=defaultdict(set)),
+        )
+        for rule in rules
+    ]
+
+    return {rule: future.result() for rule, future in zip(rules, futures)}
+
+
+def find_best_solution_in_worker(rule: 'Rule', ctx: 'RequirementContext') -> Optional['Result']:
+    return find_best_solution(rule=rule, ctx=ctx, reset_claims=True)
+
+
+def gil_disabled() -> bool:
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+@contextmanager
+def solver_pool(workers: int) -> Iterator[Optional[Executor]]:
+    """
+    Provides an executor for solving independent rules concurrently, or None
+    to solve them in order.
+
+    On free-threaded builds, the workers are threads. Elsewhere, the GIL
+    would keep threads from running the solver at the same time, so they are
+    processes, and the rules, contexts, and results are pickled between them.
+    """
+    if workers <= 1:
+        yield None
+        return
+
+    executor: Executor
+    if gil_disabled():
+        executor = ThreadPoolExecutor(max_workers=workers)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+
+    with executor:
+        yield executor
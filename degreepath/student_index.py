@@ -0,0 +1,148 @@
+from typing import Dict, List, Tuple, Optional, Iterable, Iterator, Callable
+import json
+import multiprocessing
+import os
+import sqlite3
+
+# The student index is a SQLite database, kept next to a directory of
+# student files, with a row per (student, declared area). dp-index.py uses
+# it to pick cohorts (every student in a given major, say) for dp-batch.py.
+#
+# Each file's mtime and size are recorded alongside its rows, so an update
+# only has to stat the directory, and then re-read the files that are new or
+# have changed since the last one. Files are parsed in a process pool, and
+# all of the changes are written in a single transaction.
+
+SCHEMA = '''
+    create table if not exists area (
+          stnum varchar
+        , name varchar
+        , type varchar
+        , catalog varchar
+        , code varchar
+        , dept varchar
+        , status varchar
+        , degree varchar
+    );
+
+    create table if not exists file (
+          name varchar primary key
+        , stnum varchar
+        , mtime_ns integer
+        , size integer
+    );
+
+    create index if not exists area_stnum_idx on area (stnum);
+    create index if not exists area_code_idx on area (code);
+    create index if not exists area_catalog_idx on area (catalog);
+    create index if not exists area_type_idx on area (type);
+'''
+
+# below this many changed files, a process pool costs more than it saves
+POOL_THRESHOLD = 200
+
+AreaRow = Tuple[str, str, str, str, str, str, str, str]
+FileStat = Tuple[int, int]
+
+
+def open_index(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def scan_directory(directory: str) -> Dict[str, FileStat]:
+    """Returns the (mtime_ns, size) of each student file in the directory."""
+    files: Dict[str, FileStat] = {}
+
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.json') or not entry.is_file():
+                continue
+            stat = entry.stat()
+            files[entry.name] = (stat.st_mtime_ns, stat.st_size)
+
+    return files
+
+
+def read_student_areas(path: str) -> Tuple[str, List[AreaRow]]:
+    """Reads a student file, and returns the student's stnum and area rows."""
+    with open(path, 'r', encoding='utf-8') as infile:
+        data = json.load(infile)
+
+    stnum = str(data['stnum'])
+
+    rows: List[AreaRow] = [
+        (stnum, area['name'], area['kind'], area.get('catalog', data['catalog']), area['code'], area.get('dept', ''), area['status'], area['degree'])
+        for area in data['areas']
+    ]
+
+    return stnum, rows
+
+
+def update_index(
+    conn: sqlite3.Connection,
+    directory: str,
+    *,
+    workers: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[int, int]:
+    """
+    Brings the index up to date with the student files in the directory.
+    Returns the number of files that were (re-)indexed, and the number that
+    were removed.
+    """
+    files = scan_directory(directory)
+    known: Dict[str, FileStat] = {name: (mtime_ns, size) for name, mtime_ns, size in conn.execute('select name, mtime_ns, size from file')}
+
+    changed = sorted(name for name, stat in files.items() if known.get(name, None) != stat)
+    removed = sorted(name for name in known if name not in files)
+
+    if not changed and not removed:
+        return 0, 0
+
+    paths = [os.path.join(directory, name) for name in changed]
+
+    with conn:
+        for name in (*removed, *changed):
+            forget_file(conn, name)
+
+        for i, (name, (stnum, rows)) in enumerate(zip(changed, read_all(paths, workers=workers))):
+            # indexes from before files were tracked have rows without a file
+            conn.execute('delete from area where stnum = ?', (stnum,))
+            conn.executemany('''
+                insert into area (stnum, name, type, catalog, code, dept, status, degree)
+                values (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+
+            mtime_ns, size = files[name]
+            conn.execute('insert into file (name, stnum, mtime_ns, size) values (?, ?, ?, ?)', (name, stnum, mtime_ns, size))
+
+            if progress is not None:
+                progress(i + 1, len(changed))
+
+    return len(changed), len(removed)
+
+
+def forget_file(conn: sqlite3.Connection, name: str) -> None:
+    conn.execute('delete from area where stnum in (select stnum from file where name = ?)', (name,))
+    conn.execute('delete from file where name = ?', (name,))
+
+
+def read_all(paths: List[str], *, workers: Optional[int] = None) -> Iterator[Tuple[str, List[AreaRow]]]:
+    """Reads the student files, in order; in a process pool, if there are enough of them."""
+    if workers == 1 or len(paths) < POOL_THRESHOLD:
+        yield from map(read_student_areas, paths)
+        return
+
+    with multiprocessing.Pool(processes=workers) as pool:
+        yield from pool.imap(read_student_areas, paths, chunksize=64)
+
+
+def query_index(conn: sqlite3.Connection, where: str) -> Iterable[Tuple[str, str, str, str, str]]:
+    return conn.execute(f'''
+        select stnum, catalog || '-' || substr(catalog + 1, 3, 2), code, name, type
+        from area
+        where {where}
+        order by stnum
+    ''')
@@ -0,0 +1,148 @@
+from typing import Dict, Tuple, FrozenSet, Optional, Sequence, Iterable, Iterator, Mapping, Any, TypeVar, Union
+import json
+
+import attr
+
+from .data import CourseInstance
+
+T = TypeVar('T')
+
+# When a student's transcript changes by a course or two, the assignment
+# that their previous audit found is usually still nearly right. A warm
+# start turns a previous result into hints for the solver: which courses
+# each query and course rule claimed, and which children each count rule
+# used. The rules try the hinted choice (minus any courses that are gone)
+# before anything else, so when it still passes, the audit finishes on its
+# first iteration. Otherwise, the search carries on in its usual order, and
+# finds a result as good as the one it would have found without the hints
+# (though where several are tied, maybe a different one; see
+# result_cache.py).
+#
+# The hints are keyed by paths within the area, so they're only meaningful
+# for the student and area that they came from, and are only used there.
+
+
+@attr.s(frozen=True, slots=True, kw_only=True, auto_attribs=True)
+class SearchHints:
+    # rule path -> the clbids that the rule claimed
+    claimed: Mapping[Tuple[str, ...], FrozenSet[str]] = attr.ib(factory=dict)
+
+    # count rule path -> the paths of the children that it used
+    selected: Mapping[Tuple[str, ...], FrozenSet[Tuple[str, ...]]] = attr.ib(factory=dict)
+
+    # the audit that the hints came from, where the previous result says
+    stnum: Optional[str] = None
+    area_code: Optional[str] = None
+
+    def applies_to(self, *, stnum: str, area_code: str) -> bool:
+        """Whether the hints may be used for this student's audit of this area."""
+        return (self.stnum is None or self.stnum == stnum) and (self.area_code is None or self.area_code == area_code)
+
+    def preferred_items(self, path: Sequence[str], items: Sequence[T]) -> Optional[Tuple[T, ...]]:
+        """Returns the items that the rule at path claimed last time (in the order of items), if there's a hint for it."""
+        clbids = self.claimed.get(tuple(path), None)
+        if not clbids:
+            return None
+
+        return tuple(item for item in items if isinstance(item, CourseInstance) and item.clbid in clbids)
+
+    def preferred_children(self, path: Sequence[str], children: Sequence[T]) -> Optional[Tuple[T, ...]]:
+        """Returns the children that the count rule at path used last time (in the order of children), if there's a hint for it."""
+        selected = self.selected.get(tuple(path), None)
+        if not selected:
+            return None
+
+        return tuple(child for child in children if tuple(getattr(child, 'path')) in selected)
+
+
+def hints_from_result(data: Mapping[str, Any], *, stnum: Optional[str] = None) -> SearchHints:
+    """
+    Builds search hints from a result's to_dict() form. An area's result
+    names its area code; the student has to be given.
+
+    >>> hints = hints_from_result({"type": "count", "path": ["$"], "ok": True, "items": [
+    ...     {"type": "query", "path": ["$", "[0]"], "ok": True, "claims": [
+    ...         {"claim": {"clbid": "1"}, "failed": False},
+    ...         {"claim": {"clbid": "2"}, "failed": True},
+    ...     ]},
+    ...     {"type": "course", "path": ["$", "[1]"], "ok": False, "claims": []},
+    ... ]})
+    >>> hints.claimed[("$", "[0]")]
+    frozenset({'1'})
+    >>> hints.selected[("$",)]
+    frozenset({('$', '[0]')})
+    """
+    claimed: Dict[Tuple[str, ...], FrozenSet[str]] = {}
+    selected: Dict[Tuple[str, ...], FrozenSet[Tuple[str, ...]]] = {}
+
+    collect_hints(data, claimed=claimed, selected=selected)
+
+    area_code = data.get('code', None)
+    return SearchHints(claimed=claimed, selected=selected, stnum=stnum, area_code=str(area_code) if area_code is not None else None)
+
+
+def hints_from_row(row: Mapping[str, Any]) -> SearchHints:
+    """Builds search hints from a stored result row, whose `result` column holds the to_dict() form (as JSON, or already decoded)."""
+    encoded: Union[str, bytes, Mapping[str, Any]] = row['result']
+    result: Mapping[str, Any] = json.loads(encoded) if isinstance(encoded, (str, bytes)) else encoded
+
+    stnum = row.get('student_id', None)
+    hints = hints_from_result(result, stnum=str(stnum) if stnum is not None else None)
+
+    if row.get('area_code', None) is not None:
+        hints = attr.evolve(hints, area_code=str(row['area_code']))
+
+    return hints
+
+
+def collect_hints(
+    node: Mapping[str, Any],
+    *,
+    claimed: Dict[Tuple[str, ...], FrozenSet[str]],
+    selected: Dict[Tuple[str, ...], FrozenSet[Tuple[str, ...]]],
+) -> bool:
+    """Records the hints for node and its children, and returns whether the node was used."""
+    path = tuple(node.get('path', ()))
+    kind = node.get('type', None)
+
+    used = bool(node.get('ok', False))
+
+    if kind in ('query', 'course'):
+        clbids = frozenset(c['claim']['clbid'] for c in node.get('claims', []) if not c.get('failed', False))
+        if clbids:
+            claimed[path] = clbids
+            used = True
+
+    child_result = node.get('result', None)
+    if isinstance(child_result, Mapping):
+        used = collect_hints(child_result, claimed=claimed, selected=selected) or used
+
+    if kind == 'count':
+        used_children = frozenset(
+            tuple(child.get('path', ()))
+            for child in node.get('items', [])
+            if isinstance(child, Mapping) and collect_hints(child, claimed=claimed, selected=selected)
+        )
+        if used_children:
+            selected[path] = used_children
+            used = True
+
+    return used
+
+
+def preferred_first(candidates: Iterable[T], preferred: Optional[T]) -> Iterator[T]:
+    """
+    Yields the preferred candidate, then the rest of them, without repeating it.
+
+    >>> list(preferred_first([(1,), (2,), (3,)], (2,)))
+    [(2,), (1,), (3,)]
+    """
+    if preferred is None:
+        yield from candidates
+        return
+
+    yield preferred
+
+    for candidate in candidates:
+        if candidate != preferred:
+            yield candidate
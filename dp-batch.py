@@ -1,25 +1,39 @@
 #!/usr/bin/env python3
 
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import argparse
-import runpy
+import contextlib
 import glob
+import io
 import json
+import signal
 import sys
 import os
+import time
 
 from degreepath.ms import pretty_ms
 from degreepath.stringify import summarize
 from degreepath.audit import NoStudentsMsg, ResultMsg, AuditStartMsg, ExceptionMsg, NoAuditsCompletedMsg, ProgressMsg, Arguments, EstimateMsg, AreaFileNotFoundMsg
+from degreepath.entrypoint import load_common
+from degreepath.data import load_course
+from degreepath.schedule import Job, Prediction, CostModel, load_history, longest_first, schedule_report
 
-dirpath = os.path.dirname(os.path.abspath(__file__))
-dp = runpy.run_path(dirpath + '/dp-common.py')
+# (stdout, stderr, exit code, seconds)
+JobOutput = Tuple[str, str, int, float]
 
 
-def main() -> int:  # noqa: C901
-    DEFAULT_DIR = os.getenv('DP_STUDENT_DIR', default=max(glob.iglob(os.path.expanduser('~/2019-*'))))
+def main() -> int:
+    DEFAULT_DIR = os.getenv('DP_STUDENT_DIR', default=max(glob.iglob(os.path.expanduser('~/2019-*')), default=None))
 
     parser = argparse.ArgumentParser()
-    parser.add_argument('-w', '--workers', help="the number of worker processes to spawn", default=os.cpu_count())
+    parser.add_argument('-w', '--workers', help="the number of worker processes to spawn; 1 audits in this process", type=int, default=os.cpu_count())
+    parser.add_argument('--dedupe', action='store_true', help="audit students with the same area-relevant courses once, and share the result")
+    parser.add_argument('--timeout', help="the number of seconds after which a single audit is abandoned", type=float, default=None)
+    parser.add_argument('--schedule', choices=('longest-first', 'input'), default='longest-first', help="the order in which jobs are handed to the workers")
+    parser.add_argument('--history-db', help="a results database (from dp-sqlite.py) whose durations predict each job's cost")
+    parser.add_argument('--estimate-costs', action='store_true', help="predict jobs without any history from the solver's iteration estimate")
     parser.add_argument('--dir', default=DEFAULT_DIR)
     parser.add_argument('--areas-dir', default=os.path.expanduser('~/Projects/degreepath-areas'))
     parser.add_argument("--estimate", action='store_true')
@@ -36,96 +50,307 @@ def main() -> int:  # noqa: C901
     cli_args = parser.parse_args()
 
     # deduplicate, then duplicate if requested
-    data = sorted(set(tuple(stnum_code.strip().split()) for stnum_code in sys.stdin)) * cli_args.n
+    data: List[Job] = sorted(set(tuple(stnum_code.strip().split()) for stnum_code in sys.stdin)) * cli_args.n
 
     if not data:
         print('expects a list of "stnum catalog-year areacode" to stdin', file=sys.stderr)
         return 1
 
+    if cli_args.invocation:
+        stnum, catalog, area_code = data[0]
+        student_file, area_file = job_files(cli_args, stnum, catalog, area_code)
+        print(f"python3 dp.py --student '{student_file}' --area '{area_file}'")
+        return 0
+
     if cli_args.table:
         print('stnum,catalog,area_code,gpa,rank,max', flush=True)
 
-    for stnum, catalog, area_code in data:
-        student_file = os.path.join(cli_args.dir, f"{stnum}.json")
-        area_file = os.path.join(cli_args.areas_dir, catalog, f"{area_code}.yaml")
-
-        args = Arguments(
-            area_files=[area_file],
-            student_files=[student_file],
-            print_all=False,
-            estimate_only=cli_args.estimate,
-            archive_file=None,
-        )
-
-        if cli_args.invocation:
-            print(f"python3 dp.py --student '{student_file}' --area '{area_file}'")
-            return 0
-
-        for msg in dp['run'](args, transcript_only=cli_args.transcript):
-            if isinstance(msg, NoStudentsMsg):
-                print('no student files provided', file=sys.stderr)
-                return 3
-
-            elif isinstance(msg, NoAuditsCompletedMsg):
-                print('no audits completed', file=sys.stderr)
-                return 2
-
-            elif isinstance(msg, AuditStartMsg):
-                if not cli_args.quiet and not cli_args.table:
-                    print(f"auditing #{msg.stnum} against {msg.area_catalog} {msg.area_code}", file=sys.stderr)
-
-            elif isinstance(msg, ExceptionMsg):
-                print("%s %s\n%s %s", msg.stnum, msg.area_code, msg.ex, msg.tb, file=sys.stderr)
-                return 1
-
-            elif isinstance(msg, AreaFileNotFoundMsg):
-                pass
-
-            elif isinstance(msg, ProgressMsg):
-                if not cli_args.quiet:
-                    avg_iter_s = sum(msg.recent_iters) / max(len(msg.recent_iters), 1)
-                    avg_iter_time = pretty_ms(avg_iter_s * 1_000, format_sub_ms=True)
-                    print(f"{msg.count:,} at {avg_iter_time} per audit (best: {msg.best_rank})", file=sys.stderr)
-
-            elif isinstance(msg, ResultMsg):
-                result = json.loads(json.dumps(msg.result.to_dict()))
-                if cli_args.table:
-                    avg_iter_s = sum(msg.iterations) / max(len(msg.iterations), 1)
-                    avg_iter_time = pretty_ms(avg_iter_s * 1_000, format_sub_ms=True)
-                    print(','.join([
-                        stnum,
-                        catalog,
-                        area_code,
-                        str(round(float(result['gpa']), 2)),
-                        str(round(float(result['rank']), 2)),
-                        str(round(float(result['max_rank']))),
-                        # str(msg.count),
-                        # msg.elapsed,
-                        # avg_iter_time,
-                    ]), flush=True)
-                else:
-                    print("\n" + "".join(summarize(
-                        result=result,
-                        transcript=msg.transcript,
-                        count=msg.count,
-                        elapsed=msg.elapsed,
-                        iterations=msg.iterations,
-                        show_paths=cli_args.show_paths,
-                        show_ranks=cli_args.show_ranks,
-                        claims=msg.result.keyed_claims(),
-                    )))
-
-            elif isinstance(msg, EstimateMsg):
-                if not cli_args.quiet and not cli_args.table:
-                    print(f"estimated iterations: {msg.estimate:,}", file=sys.stderr)
+    # a failed audit is reported, but doesn't stop the rest of the batch; the
+    # exit code is the worst of the individual audits' codes
+    exit_code = 0
+
+    if cli_args.workers is None or cli_args.workers <= 1:
+        for job in data:
+            exit_code = max(exit_code, audit_job(job, cli_args))
+        return exit_code
+
+    order = None
+    predictions: Dict[Job, Prediction] = {}
+    if cli_args.schedule == 'longest-first':
+        predictions = predict_jobs(data, cli_args)
+        order = longest_first(data, predictions)
+
+    actuals: Dict[Job, float] = {}
+    start = time.perf_counter()
+
+    for job, (stdout, stderr, code, seconds) in zip(data, run_parallel(data, cli_args, order=order)):
+        sys.stderr.write(stderr)
+        sys.stderr.flush()
+        sys.stdout.write(stdout)
+        sys.stdout.flush()
+        exit_code = max(exit_code, code)
+        actuals[job] = seconds
+
+    if predictions and not cli_args.quiet:
+        for line in schedule_report(
+            [data[i] for i in order or ()],
+            predictions=predictions,
+            actuals=actuals,
+            workers=cli_args.workers,
+            elapsed=time.perf_counter() - start,
+        ):
+            print(line, file=sys.stderr)
+
+    return exit_code
+
+
+def predict_jobs(data: Sequence[Job], cli_args: Any) -> Dict[Job, Prediction]:
+    """Predicts how long each job will take; see degreepath/schedule.py."""
+    model = load_history(cli_args.history_db) if cli_args.history_db else CostModel()
+
+    def estimate(job: Job) -> Optional[int]:
+        if not cli_args.estimate_costs:
+            return None
+
+        student_file, area_file = job_files(cli_args, *job)
+        try:
+            with open(student_file, 'r', encoding='utf-8') as infile:
+                student = json.load(infile)
+            courses = tuple(load_course(row) for row in student['courses'])
+            return int(load_common().estimate_student(student, courses, area_file=area_file))
+        except Exception as ex:
+            print(f"{' '.join(job)}\ncould not estimate: {ex!r}", file=sys.stderr)
+            return None
+
+    return {job: model.predict(job, estimate=estimate) for job in dict.fromkeys(data)}
+
+
+def run_parallel(data: List[Job], cli_args: Any, *, order: Optional[Sequence[int]] = None) -> Iterator[JobOutput]:
+    """
+    Audits the jobs in a pool of worker processes, and yields their output in
+    the order of the jobs (not the order in which they finish), so that the
+    output is identical to a serial run. The jobs are handed to the workers
+    in the given order of their positions, if there is one.
+
+    Each worker lives for the whole batch, so the areas (and course
+    offerings) that it has loaded stay cached between its audits.
+
+    If a worker dies, the pool is broken, and every job that hadn't finished
+    fails with it. Those jobs are handed to a new pool instead. We can't
+    tell which job killed the worker, but it was one of the first few that
+    hadn't finished, since the pool only hands out one job per worker (plus
+    one) at a time; a job that is among those when the pool breaks a second
+    time is run in a pool of its own, so that it can only fail by itself.
+    """
+    positions = list(order) if order is not None else list(range(len(data)))
+    outputs: Dict[int, JobOutput] = {}
+    strikes: Dict[int, int] = {}
+
+    executor = make_pool(cli_args.workers)
+    futures = {i: executor.submit(audit_job_captured, data[i], cli_args) for i in positions}
+
+    try:
+        for i, job in enumerate(data):
+            while i not in outputs:
+                try:
+                    outputs[i] = futures[i].result()
+                except BrokenProcessPool:
+                    executor.shutdown(wait=True)
+
+                    for p, future in futures.items():
+                        if p >= i and p not in outputs and future.exception() is None:
+                            outputs[p] = future.result()
+
+                    unfinished = [p for p in positions if p >= i and p not in outputs]
+                    for p in unfinished[:cli_args.workers + 1]:
+                        strikes[p] = strikes.get(p, 0) + 1
+                        if strikes[p] >= 2:
+                            outputs[p] = run_isolated(data[p], cli_args)
+
+                    executor = make_pool(cli_args.workers)
+                    futures = {p: executor.submit(audit_job_captured, data[p], cli_args) for p in unfinished if p not in outputs}
+                except Exception as ex:
+                    outputs[i] = worker_failed(job, ex)
+
+            yield outputs.pop(i)
+    finally:
+        executor.shutdown(wait=True)
+
+
+def run_isolated(job: Job, cli_args: Any) -> JobOutput:
+    """Audits the job in a worker of its own, so that if it kills the worker, no other job fails with it."""
+    with make_pool(1) as executor:
+        try:
+            return executor.submit(audit_job_captured, job, cli_args).result()
+        except Exception as ex:
+            return worker_failed(job, ex)
+
+
+def worker_failed(job: Job, ex: Exception) -> JobOutput:
+    # the worker itself died (rather than the audit raising an exception,
+    # which audit_job reports)
+    stnum, catalog, area_code = job
+    return '', f"{stnum} {area_code}\nworker failed: {ex!r}\n", 1, 0.0
+
+
+def make_pool(workers: int) -> ProcessPoolExecutor:
+    # the pool's initializer is new in Python 3.7; before that, each worker
+    # initializes itself before its first job
+    if sys.version_info >= (3, 7):
+        return ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+worker_initialized = False
+
 
+def init_worker() -> None:
+    global worker_initialized
+    worker_initialized = True
+
+    # leave Ctrl-C to the parent, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    load_common()
+
+
+def audit_job_captured(job: Job, cli_args: Any) -> JobOutput:
+    if not worker_initialized:
+        init_worker()
+
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    start = time.perf_counter()
+
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        code = audit_job(job, cli_args)
+
+    return stdout.getvalue(), stderr.getvalue(), code, time.perf_counter() - start
+
+
+def job_files(cli_args: Any, stnum: str, catalog: str, area_code: str) -> Tuple[str, str]:
+    student_file = os.path.join(cli_args.dir, f"{stnum}.json")
+    area_file = os.path.join(cli_args.areas_dir, catalog, f"{area_code}.yaml")
+    return student_file, area_file
+
+
+def audit_job(job: Job, cli_args: Any) -> int:
+    stnum, catalog, area_code = job
+
+    try:
+        with time_limit(cli_args.timeout):
+            return print_audit(job, cli_args)
+    except JobTimeout:
+        # the audit itself reports a timeout as an ExceptionMsg; this only
+        # catches one that fires while its output is being printed
+        print(f"{stnum} {area_code}\ntimed out after {cli_args.timeout}s", file=sys.stderr)
+        return 1
+
+
+def print_audit(job: Job, cli_args: Any) -> int:  # noqa: C901
+    stnum, catalog, area_code = job
+    student_file, area_file = job_files(cli_args, stnum, catalog, area_code)
+
+    args = Arguments(
+        area_files=[area_file],
+        student_files=[student_file],
+        print_all=False,
+        estimate_only=cli_args.estimate,
+        archive_file=None,
+        dedupe=cli_args.dedupe,
+    )
+
+    for msg in load_common().run(args, transcript_only=cli_args.transcript):
+        if isinstance(msg, NoStudentsMsg):
+            print('no student files provided', file=sys.stderr)
+            return 3
+
+        elif isinstance(msg, NoAuditsCompletedMsg):
+            print('no audits completed', file=sys.stderr)
+            return 2
+
+        elif isinstance(msg, AuditStartMsg):
+            if not cli_args.quiet and not cli_args.table:
+                print(f"auditing #{msg.stnum} against {msg.area_catalog} {msg.area_code}", file=sys.stderr)
+
+        elif isinstance(msg, ExceptionMsg):
+            print(f"{msg.stnum} {msg.area_code}\n{msg.ex} {msg.tb}", file=sys.stderr)
+            return 1
+
+        elif isinstance(msg, AreaFileNotFoundMsg):
+            pass
+
+        elif isinstance(msg, ProgressMsg):
+            if not cli_args.quiet:
+                avg_iter_s = sum(msg.recent_iters) / max(len(msg.recent_iters), 1)
+                avg_iter_time = pretty_ms(avg_iter_s * 1_000, format_sub_ms=True)
+                print(f"{msg.count:,} at {avg_iter_time} per audit (best: {msg.best_rank})", file=sys.stderr)
+
+        elif isinstance(msg, ResultMsg):
+            result = json.loads(json.dumps(msg.result.to_dict()))
+            if cli_args.table:
+                avg_iter_s = sum(msg.iterations) / max(len(msg.iterations), 1)
+                avg_iter_time = pretty_ms(avg_iter_s * 1_000, format_sub_ms=True)
+                print(','.join([
+                    stnum,
+                    catalog,
+                    area_code,
+                    str(round(float(result['gpa']), 2)),
+                    str(round(float(result['rank']), 2)),
+                    str(round(float(result['max_rank']))),
+                    # str(msg.count),
+                    # msg.elapsed,
+                    # avg_iter_time,
+                ]), flush=True)
             else:
-                if not cli_args.quiet:
-                    print('unknown message %s' % msg, file=sys.stderr)
-                return 1
+                print("\n" + "".join(summarize(
+                    result=result,
+                    transcript=msg.transcript,
+                    count=msg.count,
+                    elapsed=msg.elapsed,
+                    iterations=msg.iterations,
+                    show_paths=cli_args.show_paths,
+                    show_ranks=cli_args.show_ranks,
+                    claims=msg.result.keyed_claims(),
+                )))
+
+        elif isinstance(msg, EstimateMsg):
+            if not cli_args.quiet and not cli_args.table:
+                print(f"estimated iterations: {msg.estimate:,}", file=sys.stderr)
+
+        else:
+            if not cli_args.quiet:
+                print('unknown message %s' % msg, file=sys.stderr)
+            return 1
 
     return 0
 
 
+class JobTimeout(Exception):
+    pass
+
+
+def raise_timeout(signum: int, frame: Any) -> None:
+    raise JobTimeout('audit timed out')
+
+
+@contextlib.contextmanager
+def time_limit(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Interrupts the block with a JobTimeout after the given number of seconds.
+    Audits are pure Python, so the signal is handled promptly.
+    """
+    if not seconds:
+        yield
+        return
+
+    previous = signal.signal(signal.SIGALRM, raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
 if __name__ == "__main__":
     sys.exit(main())
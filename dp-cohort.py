@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import json
+import os
+import sys
+import tarfile
+from typing import Iterator, Dict, Any
+
+from degreepath.cohort import write_cohort, CohortFile
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="pack student files into a cohort file, or unpack one")
+    subparsers = parser.add_subparsers(dest='command')
+
+    pack = subparsers.add_parser('pack', help="pack a directory (or a tar archive) of student JSON files")
+    pack.add_argument('source', help="a directory of student JSON files, or a tar archive of them")
+    pack.add_argument('-o', '--output', required=True)
+
+    unpack = subparsers.add_parser('unpack', help="write each student in a cohort file back out as JSON")
+    unpack.add_argument('cohort')
+    unpack.add_argument('--dir', required=True)
+
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        count = write_cohort(args.output, read_students(args.source))
+        print(f"packed {count:,} students into {args.output}", file=sys.stderr)
+        return 0
+
+    if args.command == 'unpack':
+        os.makedirs(args.dir, exist_ok=True)
+        with CohortFile.open(args.cohort) as cohort:
+            for stnum in cohort.stnums():
+                with open(os.path.join(args.dir, f"{stnum}.json"), 'w', encoding='utf-8') as outfile:
+                    json.dump(cohort.student(stnum), outfile)
+        return 0
+
+    parser.print_help()
+    return 1
+
+
+def read_students(source: str) -> Iterator[Dict[str, Any]]:
+    if os.path.isdir(source):
+        for student_file in sorted(glob.iglob(os.path.join(source, '*.json'))):
+            with open(student_file, 'r', encoding='utf-8') as infile:
+                yield json.load(infile)
+        return
+
+    with tarfile.open(source, 'r') as tarball:
+        for member in tarball:
+            if not member.isfile() or not member.name.endswith('.json'):
+                continue
+            data = tarball.extractfile(member)
+            assert data is not None
+            yield json.load(data)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,18 +1,26 @@
 import json
 import traceback
 import pathlib
-import tarfile
-from typing import Iterator, List, Dict, Any
+from typing import Iterator, Iterable, Generator, List, Dict, Tuple, Optional, Any
+from concurrent.futures import Executor
 
-import yaml
 import csv
 import sys
 import os
 
-from degreepath import load_course, Constants, AreaPointer, load_exception, AreaOfStudy
+from degreepath import load_course
+from degreepath.archive import IndexedArchive
+from degreepath.area_cache import load_area_source, load_specification, specification_digest, is_conditional
+from degreepath.cohort import CohortFile
 from degreepath.lib import grade_point_average_items, grade_point_average
-from degreepath.data import GradeOption, GradeCode, CourseInstance, TranscriptCode
-from degreepath.audit import audit, NoStudentsMsg, AuditStartMsg, ExceptionMsg, AreaFileNotFoundMsg, Message, Arguments
+from degreepath.data import GradeCode, CourseInstance
+from degreepath.audit import audit, NoStudentsMsg, AuditStartMsg, ExceptionMsg, AreaFileNotFoundMsg, ResultMsg, Message, Arguments
+from degreepath.discover_potentials import discover_clause_potential
+from degreepath.result_cache import audit_fingerprint, load_cached_result, store_result
+from degreepath.projection import analyze_area, project_transcript, audit_projection
+from degreepath.session import StudentSession, is_excluded
+from degreepath.solve import solver_pool
+from degreepath.warm_start import SearchHints, hints_from_result, hints_from_row
 
 
 def run(args: Arguments, *, transcript_only: bool = False, gpa_only: bool = False) -> Iterator[Message]:  # noqa: C901
@@ -20,112 +28,212 @@ def run(args: Arguments, *, transcript_only: bool = False, gpa_only: bool = Fals
         yield NoStudentsMsg()
         return
 
-    file_data = []
+    file_data: List[Tuple[Dict[str, Any], Tuple[CourseInstance, ...]]] = []
+    warm_start: Optional[SearchHints] = None
 
     try:
-        if args.archive_file:
-            with tarfile.open(args.archive_file, 'r') as tarball:
+        if args.warm_start_file:
+            with open(args.warm_start_file, "r", encoding="utf-8") as infile:
+                previous = json.load(infile)
+            # either a result's to_dict(), or a stored row whose `result` column is still encoded
+            warm_start = hints_from_row(previous) if isinstance(previous.get('result', None), str) else hints_from_result(previous)
+
+            # hints that don't say whose audit they came from could be
+            # applied to anyone's, so they're only accepted for one
+            if (warm_start.stnum is None and len(args.student_files) > 1) or (warm_start.area_code is None and len(args.area_files) > 1):
+                raise ValueError(f"{args.warm_start_file} doesn't name its student and area, so it can only warm-start a single audit")
+
+        if args.cohort_file:
+            with CohortFile.open(args.cohort_file) as cohort:
                 for student_file in args.student_files:
-                    data = tarball.extractfile(student_file)
-                    assert data is not None
-                    file_data.append(json.load(data))
+                    stnum = pathlib.Path(student_file).stem
+                    file_data.append(cohort.load(stnum))
+        elif args.archive_file:
+            with IndexedArchive.open(args.archive_file) as archive:
+                for student_file in args.student_files:
+                    student = json.loads(archive.read(student_file))
+                    file_data.append((student, tuple(load_course(row) for row in student['courses'])))
         else:
             for student_file in args.student_files:
                 with open(student_file, "r", encoding="utf-8") as infile:
-                    file_data.append(json.load(infile))
-    except FileNotFoundError as ex:
+                    student = json.load(infile)
+                file_data.append((student, tuple(load_course(row) for row in student['courses'])))
+    except (FileNotFoundError, KeyError, ValueError) as ex:
         yield ExceptionMsg(ex=ex, tb=traceback.format_exc(), stnum=None, area_code=None)
         return
 
-    for student in file_data:
-        area_pointers = tuple(AreaPointer.from_dict(a) for a in student['areas'])
-        constants = Constants(matriculation_year=0 if student['matriculation'] == '' else int(student['matriculation']))
-        transcript = tuple(load_transcript(student['courses']))
-        transcript_with_failed = tuple(load_transcript(student['courses'], include_failed=True))
-
-        if transcript_only:
-            writer = csv.writer(sys.stdout)
-            writer.writerow(['course', 'clbid', 'course_type', 'credits', 'name', 'year', 'term', 'type', 'grade', 'gereqs', 'is_repeat', 'in_gpa', 'attributes'])
-            for c in transcript:
-                writer.writerow([
-                    c.course(), c.clbid, c.course_type.value, str(c.credits), c.name, str(c.year), str(c.term),
-                    c.sub_type.name, c.grade_code.value, ','.join(c.gereqs), str(c.is_repeat), str(c.is_in_gpa),
-                    ','.join(c.attributes),
-                ])
-            return
-
-        if gpa_only:
-            for c in grade_point_average_items(transcript_with_failed):
-                print(c.course(), c.grade_code.value, c.grade_points)
-            print(grade_point_average(transcript_with_failed))
-            return
-
-        for area_file in args.area_files:
-            try:
-                with open(area_file, "r", encoding="utf-8") as infile:
-                    area_spec = yaml.load(stream=infile, Loader=yaml.SafeLoader)
-            except FileNotFoundError:
-                yield AreaFileNotFoundMsg(area_file=f"{os.path.dirname(area_file)}/{os.path.basename(area_file)}", stnum=student['stnum'])
+    with solver_pool(args.solver_workers) as executor:
+        for student, courses in file_data:
+            if transcript_only:
+                writer = csv.writer(sys.stdout)
+                writer.writerow(['course', 'clbid', 'course_type', 'credits', 'name', 'year', 'term', 'type', 'grade', 'gereqs', 'is_repeat', 'in_gpa', 'attributes'])
+                for c in filter_transcript(courses):
+                    writer.writerow([
+                        c.course(), c.clbid, c.course_type.value, str(c.credits), c.name, str(c.year), str(c.term),
+                        c.sub_type.name, c.grade_code.value, ','.join(c.gereqs), str(c.is_repeat), str(c.is_in_gpa),
+                        ','.join(c.attributes),
+                    ])
                 return
 
-            area_code = area_spec['code']
-            area_catalog = pathlib.Path(area_file).parent.stem
-
-            exceptions = [
-                load_exception(e)
-                for e in student.get("exceptions", [])
-                if e['area_code'] == area_code
-            ]
+            if gpa_only:
+                transcript_with_failed = tuple(filter_transcript(courses, include_failed=True))
+                for c in grade_point_average_items(transcript_with_failed):
+                    print(c.course(), c.grade_code.value, c.grade_points)
+                print(grade_point_average(transcript_with_failed))
+                return
 
-            area = AreaOfStudy.load(
-                specification=area_spec,
-                c=constants,
-                areas=area_pointers,
-                transcript=transcript,
+            stop = yield from audit_student(
+                student,
+                courses,
+                area_files=args.area_files,
+                print_all=args.print_all,
+                estimate_only=args.estimate_only,
+                dedupe=args.dedupe,
+                warm_start=warm_start,
+                executor=executor,
             )
-            area.validate()
+            if stop:
+                return
 
-            yield AuditStartMsg(stnum=student['stnum'], area_code=area_code, area_catalog=area_catalog, student=student)
 
-            try:
-                yield from audit(
-                    area=area,
-                    exceptions=exceptions,
+def audit_student(
+    student: Dict[str, Any],
+    courses: Tuple[CourseInstance, ...],
+    *,
+    area_files: Iterable[str],
+    print_all: bool = False,
+    estimate_only: bool = False,
+    dedupe: bool = False,
+    warm_start: Optional[SearchHints] = None,
+    executor: Optional[Executor] = None,
+) -> Generator[Message, None, bool]:
+    """
+    Audits one student (a student document and their loaded courses) against
+    each of the area files. Returns True if the caller should stop auditing
+    any further students.
+
+    With dedupe, students whose area-relevant courses match a student that
+    was already audited (in this process, or in the result cache) reuse that
+    audit; see degreepath/projection.py.
+
+    With warm_start, the solver tries the choices of a previous audit first,
+    in the audits of the student and area that it came from; see
+    degreepath/warm_start.py.
+
+    With an executor, independent requirements are solved concurrently; see
+    degreepath/solve.py.
+    """
+    session = StudentSession.load(student, courses)
+    area_pointers = session.area_pointers
+    constants = session.constants
+    transcript = session.transcript
+    transcript_with_failed = session.transcript_with_failed
+
+    for area_file in area_files:
+        try:
+            with open(area_file, 'rb') as infile:
+                raw_area = infile.read()
+        except FileNotFoundError:
+            yield AreaFileNotFoundMsg(area_file=f"{os.path.dirname(area_file)}/{os.path.basename(area_file)}", stnum=student['stnum'])
+            return True
+
+        area_digest = specification_digest(raw_area)
+        area = load_area_source(raw_area, digest=area_digest, c=constants, areas=area_pointers, transcript=transcript)
+
+        area_code = area.code
+        area_catalog = pathlib.Path(area_file).parent.stem
+
+        exceptions = session.exceptions_for(area_code)
+
+        hints = warm_start if warm_start is not None and warm_start.applies_to(stnum=student['stnum'], area_code=area_code) else None
+
+        yield AuditStartMsg(stnum=student['stnum'], area_code=area_code, area_catalog=area_catalog, student=student)
+
+        try:
+            if dedupe and not exceptions and not print_all and not estimate_only:
+                # areas with `if:` requirements are loaded against the transcript
+                specification = load_specification(raw_area, digest=area_digest)
+                projection = None
+                if not is_conditional(specification):
+                    projection = project_transcript(analyze_area(area), transcript=transcript, transcript_with_failed=transcript_with_failed)
+
+                if projection is not None:
+                    yield from audit_projection(
+                        projection,
+                        area=area,
+                        area_digest=area_digest,
+                        constants=constants,
+                        area_pointers=area_pointers,
+                        transcript=transcript,
+                    )
+                    continue
+
+            # only the best result is cached, so runs that want every
+            # result (or none of them) always audit
+            cache_key = None
+            if not print_all and not estimate_only:
+                cache_key = audit_fingerprint(
+                    area_digest=area_digest,
                     transcript=transcript,
                     transcript_with_failed=transcript_with_failed,
+                    exceptions=exceptions,
                     constants=constants,
                     area_pointers=area_pointers,
-                    print_all=args.print_all,
-                    estimate_only=args.estimate_only,
+                    hints=hints,
                 )
 
-            except Exception as ex:
-                yield ExceptionMsg(ex=ex, tb=traceback.format_exc(), stnum=student['stnum'], area_code=area_code)
+                cached = load_cached_result(cache_key, transcript=transcript)
+                if cached is not None:
+                    cached.potentials_for_all_clauses = discover_clause_potential(area, c=constants)
+                    yield cached
+                    continue
 
+            for msg in audit(
+                area=area,
+                exceptions=exceptions,
+                transcript=transcript,
+                transcript_with_failed=transcript_with_failed,
+                constants=constants,
+                area_pointers=area_pointers,
+                print_all=print_all,
+                estimate_only=estimate_only,
+                warm_start=hints,
+                indexes=session.indexes,
+                executor=executor,
+            ):
+                if cache_key is not None and isinstance(msg, ResultMsg):
+                    store_result(cache_key, msg)
+                yield msg
 
-def load_transcript(courses: List[Dict[str, Any]], *, include_failed: bool = False) -> Iterator[CourseInstance]:
-    # We need to leave repeated courses in the transcript, because some majors
-    # (THEAT) require repeated courses for completion (and others )
-    for row in courses:
-        c = load_course(row)
+        except Exception as ex:
+            yield ExceptionMsg(ex=ex, tb=traceback.format_exc(), stnum=student['stnum'], area_code=area_code)
 
-        # excluded Audited courses
-        if c.grade_option is GradeOption.Audit:
-            continue
+    return False
+
+
+def estimate_student(student: Dict[str, Any], courses: Tuple[CourseInstance, ...], *, area_file: str) -> int:
+    """Returns the solver's estimate of how many iterations it would take to audit the student against the area."""
+    session = StudentSession.load(student, courses)
+
+    with open(area_file, 'rb') as infile:
+        raw_area = infile.read()
+
+    area = load_area_source(raw_area, digest=specification_digest(raw_area), c=session.constants, areas=session.area_pointers, transcript=session.transcript)
+    return area.estimate(transcript=session.transcript, areas=session.area_pointers)
 
-        # excluded repeated courses
-        if c.transcript_code in (TranscriptCode.RepeatedLater, TranscriptCode.RepeatInProgress):
-            continue
 
-        # exclude [N]o-Pass, [U]nsuccessful, [AU]dit, [UA]nsuccessfulAudit, [WF]ithdrawnFail, [WP]ithdrawnPass, and [Withdrawn]
-        if c.grade_code in (GradeCode._N, GradeCode._U, GradeCode._AU, GradeCode._UA, GradeCode._WF, GradeCode._WP, GradeCode._W):
+def load_transcript(courses: List[Dict[str, Any]], *, include_failed: bool = False) -> Iterator[CourseInstance]:
+    return filter_transcript((load_course(row) for row in courses), include_failed=include_failed)
+
+
+def filter_transcript(courses: Iterable[CourseInstance], *, include_failed: bool = False) -> Iterator[CourseInstance]:
+    # see degreepath/session.py for the rules; audits use partition_transcript
+    for c in courses:
+        if is_excluded(c):
             continue
 
         # exclude courses at grade F
-        if c.grade_code is GradeCode.F:
-            if include_failed is True:
-                pass
-            else:
-                continue
+        if c.grade_code is GradeCode.F and include_failed is not True:
+            continue
 
         yield c
@@ -1,58 +1,91 @@
 import argparse
+import io
 import json
 import logging
+import multiprocessing
+import multiprocessing.util
 import os
-import runpy
+import sys
+import time
 from datetime import datetime
-from typing import Optional, Any, Dict, cast
+from typing import Optional, Any, Dict, List, Iterable, Iterator, Tuple, cast
 
-import dotenv
 import psycopg2  # type: ignore
+import psycopg2.extras  # type: ignore
 import sentry_sdk
 
 from degreepath.ms import pretty_ms
 from degreepath.audit import NoStudentsMsg, ResultMsg, AuditStartMsg, ExceptionMsg, NoAuditsCompletedMsg, ProgressMsg, Arguments, EstimateMsg, AreaFileNotFoundMsg
+from degreepath.entrypoint import load_common
+from degreepath.archive import load_index
 
 logger = logging.getLogger(__name__)
-dirpath = os.path.dirname(os.path.abspath(__file__))
-dp = runpy.run_path(dirpath + '/dp-common.py')
 
-dotenv.load_dotenv(verbose=True)
-if os.environ.get('SENTRY_DSN', None):
-    sentry_sdk.init(dsn=os.environ.get('SENTRY_DSN'))
-else:
-    logger.warning('SENTRY_DSN not set; skipping')
+# progress is written at most this often per audit
+PROGRESS_INTERVAL = 5.0
 
 
 def cli() -> None:
     parser = argparse.ArgumentParser()
-    parser.add_argument("--area", dest="area_file", required=True)
-    parser.add_argument("--student", dest="student_file", required=True)
+    parser.add_argument("--area", dest="area_files", nargs="+", required=True)
+    parser.add_argument("--student", dest="student_files", nargs="+", required=True)
     parser.add_argument("--archive", dest="archive_file")
     parser.add_argument("--run", dest="run", type=int, required=True)
+    parser.add_argument("--bulk", action='store_true', help="write finished results in batches through COPY, instead of tracking each audit as it runs")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="with --bulk, the number of worker processes (each with its own connection)")
+    parser.add_argument("--batch-size", type=int, default=200, help="with --bulk, the number of results to COPY at once")
     parser.add_argument("--loglevel", dest="loglevel", choices=("warn", "debug", "info", "critical"), default="warn")
     args = parser.parse_args()
 
     loglevel = getattr(logging, args.loglevel.upper())
     logging.basicConfig(level=loglevel)
 
-    main(student_file=args.student_file, archive_file=args.archive_file, area_file=args.area_file, run_id=args.run)
+    init_environment()
 
+    if args.archive_file:
+        # build the archive's index once, up front, instead of racing to
+        # build it in each audit
+        load_index(args.archive_file)
 
-def main(*, area_file: str, archive_file: Optional[str] = None, student_file: str, run_id: Optional[int] = None) -> None:
-    conn = psycopg2.connect(
+    if args.bulk:
+        jobs = [(student_file, area_file) for student_file in args.student_files for area_file in args.area_files]
+        if bulk_main(jobs=jobs, archive_file=args.archive_file, run_id=args.run, workers=args.workers, batch_size=args.batch_size):
+            sys.exit(1)
+    else:
+        for student_file in args.student_files:
+            for area_file in args.area_files:
+                main(student_file=student_file, archive_file=args.archive_file, area_file=area_file, run_id=args.run)
+
+
+def init_environment() -> None:
+    import dotenv
+
+    dotenv.load_dotenv(verbose=True)
+    if os.environ.get('SENTRY_DSN', None):
+        sentry_sdk.init(dsn=os.environ.get('SENTRY_DSN'))
+    else:
+        logger.warning('SENTRY_DSN not set; skipping')
+
+
+def connect() -> Any:
+    return psycopg2.connect(
         host=os.environ.get("PG_HOST"),
         database=os.environ.get("PG_DATABASE"),
         user=os.environ.get("PG_USER"),
         password=os.environ.get("PG_PASSWORD"),
     )
 
+
+def main(*, area_file: str, archive_file: Optional[str] = None, student_file: str, run_id: Optional[int] = None) -> None:
+    conn = connect()
+
     try:
         result_id = None
+        last_progress = 0.0
 
         args = Arguments(area_files=[area_file], student_files=[student_file], archive_file=archive_file)
 
-        for msg in dp['run'](args):
+        for msg in load_common().run(args):
             if isinstance(msg, NoStudentsMsg):
                 logger.critical('no student files provided')
 
@@ -72,6 +105,7 @@ def main(*, area_file: str, archive_file: Optional[str] = None, student_file: st
                     run=run_id,
                     student=msg.student,
                 )
+                last_progress = time.monotonic()
                 logger.info("result id = %s", result_id)
 
                 with sentry_sdk.configure_scope() as scope:
@@ -100,9 +134,15 @@ def main(*, area_file: str, archive_file: Optional[str] = None, student_file: st
             elif isinstance(msg, ProgressMsg):
                 avg_iter_s = sum(msg.recent_iters) / max(len(msg.recent_iters), 1)
                 avg_iter_time = pretty_ms(avg_iter_s * 1_000, format_sub_ms=True, unit_count=1)
-                update_progress(conn=conn, start_time=msg.start_time, count=msg.count, result_id=result_id)
                 logger.info(f"{msg.count:,} at {avg_iter_time} per audit")
 
+                # coalesce the progress updates: the audit reports them far
+                # more often than anyone watching needs them
+                now = time.monotonic()
+                if now - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = now
+                    update_progress(conn=conn, start_time=msg.start_time, count=msg.count, result_id=result_id)
+
             elif isinstance(msg, ResultMsg):
                 record(conn=conn, result_id=result_id, message=msg)
 
@@ -116,12 +156,29 @@ def main(*, area_file: str, archive_file: Optional[str] = None, student_file: st
         conn.close()
 
 
-def record(*, message: ResultMsg, conn: Any, result_id: Optional[int]) -> None:
+def result_columns(message: ResultMsg) -> Dict[str, Any]:
+    """Serializes a result once, into the values for its row."""
     result = message.result.to_dict()
 
     avg_iter_s = sum(message.iterations) / max(len(message.iterations), 1)
     avg_iter_time = pretty_ms(avg_iter_s * 1_000, format_sub_ms=True, unit_count=1)
 
+    return {
+        "total_count": message.count,
+        "elapsed": message.elapsed,
+        "avg_iter_time": avg_iter_time.strip("~"),
+        "result": json.dumps(result),
+        "claimed_courses": json.dumps(message.result.keyed_claims()),
+        "rank": result["rank"],
+        "max_rank": result["max_rank"],
+        "gpa": result["gpa"],
+        "ok": result["ok"],
+    }
+
+
+def record(*, message: ResultMsg, conn: Any, result_id: Optional[int]) -> None:
+    columns = result_columns(message)
+
     with conn.cursor() as curs:
         curs.execute("""
             UPDATE result
@@ -137,30 +194,14 @@ def record(*, message: ResultMsg, conn: Any, result_id: Optional[int]) -> None:
               , in_progress = false
               , claimed_courses = %(claimed_courses)s::jsonb
             WHERE id = %(result_id)s
-        """, {
-            "result_id": result_id,
-            "total_count": message.count,
-            "elapsed": message.elapsed,
-            "avg_iter_time": avg_iter_time.strip("~"),
-            "result": json.dumps(result),
-            "claimed_courses": json.dumps(message.result.keyed_claims()),
-            "rank": result["rank"],
-            "max_rank": result["max_rank"],
-            "gpa": result["gpa"],
-            "ok": result["ok"],
-        })
+        """, {**columns, "result_id": result_id})
 
-        for clause_hash, clbids in message.potentials_for_all_clauses.items():
-            curs.execute("""
-                INSERT INTO potential_clbids (result_id, clause_hash, clbids)
-                VALUES (%(result_id)s, %(clause_hash)s, %(clbids)s)
-            """, {
-                "result_id": result_id,
-                "clause_hash": clause_hash,
-                "clbids": clbids,
-            })
+        psycopg2.extras.execute_values(curs, """
+            INSERT INTO potential_clbids (result_id, clause_hash, clbids)
+            VALUES %s
+        """, [(result_id, clause_hash, clbids) for clause_hash, clbids in message.potentials_for_all_clauses.items()])
 
-        conn.commit()
+    conn.commit()
 
 
 def update_progress(*, conn: Any, start_time: datetime, count: int, result_id: Optional[int]) -> None:
@@ -203,5 +244,303 @@ def record_error(*, conn: Any, result_id: int, error: Dict[str, Any]) -> None:
         conn.commit()
 
 
+# Bulk mode
+#
+# Audits are run to completion without touching the database. Their rows are
+# buffered, and every batch_size of them are streamed into temporary staging
+# tables with COPY, then moved into the real tables by a single statement.
+# There is no in-progress row while an audit runs.
+
+STAGING_RESULT_COLUMNS = (
+    'seq', 'student_id', 'area_code', 'catalog', 'run', 'input_data', 'iterations', 'duration',
+    'per_iteration', 'rank', 'max_rank', 'result', 'ok', 'gpa', 'claimed_courses', 'error',
+)
+
+STAGING_POTENTIAL_COLUMNS = ('seq', 'clause_hash', 'clbids')
+
+CREATE_STAGING_TABLES = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS result_staging (
+        seq integer,
+        student_id text,
+        area_code text,
+        catalog text,
+        run integer,
+        input_data jsonb,
+        iterations integer,
+        duration interval,
+        per_iteration interval,
+        rank numeric,
+        max_rank numeric,
+        result jsonb,
+        ok boolean,
+        gpa numeric,
+        claimed_courses jsonb,
+        error jsonb
+    ) ON COMMIT DELETE ROWS;
+
+    CREATE TEMPORARY TABLE IF NOT EXISTS potential_staging (
+        seq integer,
+        clause_hash bigint,
+        clbids text[]
+    ) ON COMMIT DELETE ROWS;
+"""
+
+# the staged rows are given their ids once, so that the potentials can be
+# attached to the results they belong to
+MERGE_STAGED_ROWS = """
+    WITH staged AS (
+        SELECT nextval(pg_get_serial_sequence('result', 'id')) AS id, s.*
+        FROM result_staging s
+    ), results AS (
+        INSERT INTO result (
+            id, student_id, area_code, catalog, run, input_data, iterations, duration, per_iteration,
+            rank, max_rank, result, ok, gpa, claimed_courses, error, in_progress, ts
+        )
+        SELECT
+            id, student_id, area_code, catalog, run, input_data, iterations, duration, per_iteration,
+            rank, max_rank, result, ok, gpa, claimed_courses, error, false, now()
+        FROM staged
+    ), potentials AS (
+        INSERT INTO potential_clbids (result_id, clause_hash, clbids)
+        SELECT staged.id, p.clause_hash, p.clbids
+        FROM potential_staging p
+            JOIN staged USING (seq)
+    )
+    SELECT count(*) FROM staged
+"""
+
+
+class BulkWriter:
+    """Buffers finished audits, and writes them in batches through COPY."""
+
+    def __init__(self, conn: Any, *, batch_size: int = 200) -> None:
+        self.conn = conn
+        self.batch_size = batch_size
+        self._results: List[Tuple[Any, ...]] = []
+        self._potentials: List[Tuple[Any, ...]] = []
+
+        with conn.cursor() as curs:
+            curs.execute(CREATE_STAGING_TABLES)
+        conn.commit()
+
+    def add(self, *, start: AuditStartMsg, run_id: Optional[int], result: Optional[ResultMsg] = None, error: Optional[Dict[str, Any]] = None) -> int:
+        """Buffers an audit's row, and returns the number of rows written if that filled the batch."""
+        seq = len(self._results)
+
+        if result is not None:
+            columns = result_columns(result)
+            self._results.append((
+                seq, start.stnum, start.area_code, start.area_catalog, run_id, json.dumps(start.student),
+                columns['total_count'], columns['elapsed'], columns['avg_iter_time'], columns['rank'],
+                columns['max_rank'], columns['result'], columns['ok'], columns['gpa'], columns['claimed_courses'], None,
+            ))
+            for clause_hash, clbids in result.potentials_for_all_clauses.items():
+                self._potentials.append((seq, clause_hash, clbids))
+        else:
+            self._results.append((
+                seq, start.stnum, start.area_code, start.area_catalog, run_id, json.dumps(start.student),
+                None, None, None, None, None, None, None, None, None, json.dumps(error),
+            ))
+
+        if len(self._results) >= self.batch_size:
+            return self.flush()
+        return 0
+
+    def flush(self) -> int:
+        """
+        Writes the buffered rows, and returns how many there were.
+
+        If the batch can't be written, each of its audits is recorded as a
+        failure instead, so that none of them go missing; if even that can't
+        be written, the exception is raised.
+        """
+        if not self._results:
+            return 0
+
+        try:
+            return self._write(self._results, self._potentials)
+        except Exception as ex:
+            logger.exception("could not record a batch of %s results", len(self._results))
+            sentry_sdk.capture_exception(ex)
+
+            error = json.dumps({"error": f"could not record the result: {ex}"})
+            failures = [row[:6] + (None,) * 9 + (row[-1] if row[-1] is not None else error,) for row in self._results]
+            return self._write(failures, [])
+        finally:
+            # a batch is never retried (and failed) with every batch after it
+            self._results.clear()
+            self._potentials.clear()
+
+    def _write(self, results: List[Tuple[Any, ...]], potentials: List[Tuple[Any, ...]]) -> int:
+        try:
+            with self.conn.cursor() as curs:
+                curs.copy_expert(
+                    f"COPY result_staging ({', '.join(STAGING_RESULT_COLUMNS)}) FROM STDIN",
+                    io.StringIO(copy_text(results)),
+                )
+                curs.copy_expert(
+                    f"COPY potential_staging ({', '.join(STAGING_POTENTIAL_COLUMNS)}) FROM STDIN",
+                    io.StringIO(copy_text(potentials)),
+                )
+                curs.execute(MERGE_STAGED_ROWS)
+                count = cast(int, curs.fetchone()[0])
+
+            # the staging tables empty themselves on commit
+            self.conn.commit()
+        except Exception:
+            # leave the connection usable for the next batch
+            self.conn.rollback()
+            raise
+
+        return count
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def copy_text(rows: Iterable[Tuple[Any, ...]]) -> str:
+    r"""
+    Encodes rows in COPY's text format.
+
+    >>> copy_text([(1, None, True, 'a\tb', '{"x": "\\n"}', ['1', 'b"c'])]).rstrip('\n').split('\t')
+    ['1', '\\N', 't', 'a\\tb', '{"x": "\\\\n"}', '{"1","b\\\\"c"}']
+    """
+    return ''.join('\t'.join(copy_field(value) for value in row) + '\n' for row in rows)
+
+
+def copy_field(value: Any) -> str:
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    if isinstance(value, (list, tuple)):
+        value = '{' + ','.join('"' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"' for v in value) + '}'
+
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def bulk_main(*, jobs: List[Tuple[str, str]], archive_file: Optional[str], run_id: Optional[int], workers: int = 1, batch_size: int = 200) -> int:
+    """Audits the jobs, and returns the number of batches that could not be recorded."""
+    # each task is a batch of jobs, so that every COPY carries a full batch
+    chunks = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+    tasks = [(chunk, archive_file, run_id, batch_size) for chunk in chunks]
+
+    if workers <= 1:
+        init_bulk_worker()
+        try:
+            outcomes = [bulk_audit_star(task) for task in tasks]
+        finally:
+            close_bulk_worker()
+    else:
+        with multiprocessing.Pool(processes=workers, initializer=init_bulk_worker) as pool:
+            outcomes = list(pool.imap_unordered(bulk_audit_star, tasks))
+
+            # let the workers exit on their own, so that they close their
+            # connections (leaving the block would terminate them)
+            pool.close()
+            pool.join()
+
+    lost = sum(1 for written in outcomes if written is None)
+    logger.info("recorded %s results", sum(written for written in outcomes if written is not None))
+    if lost:
+        logger.error("could not record %s batches", lost)
+
+    return lost
+
+
+# each worker process keeps one connection (and one writer) for its lifetime
+bulk_writer: Optional[BulkWriter] = None
+
+
+def init_bulk_worker() -> None:
+    global bulk_writer
+    bulk_writer = BulkWriter(connect())
+
+    # pool workers don't run atexit hooks, but do run these when they exit
+    multiprocessing.util.Finalize(None, close_bulk_worker, exitpriority=10)
+
+
+def close_bulk_worker() -> None:
+    global bulk_writer
+    if bulk_writer is not None:
+        bulk_writer.close()
+        bulk_writer = None
+
+
+def bulk_audit_star(args: Tuple[List[Tuple[str, str]], Optional[str], Optional[int], int]) -> Optional[int]:
+    # a batch that can't be written is logged and skipped, so that it
+    # doesn't take the rest of the run down with it
+    try:
+        return bulk_audit(*args)
+    except Exception as ex:
+        logger.exception("could not record a batch of %s jobs", len(args[0]))
+        sentry_sdk.capture_exception(ex)
+        return None
+
+
+def bulk_audit(chunk: List[Tuple[str, str]], archive_file: Optional[str], run_id: Optional[int], batch_size: int) -> int:
+    """Audits a batch of jobs, and returns the number of rows written."""
+    assert bulk_writer is not None
+    bulk_writer.batch_size = batch_size
+
+    written = 0
+    try:
+        for student_file, area_file in chunk:
+            try:
+                outcomes = list(audit_outcomes(student_file=student_file, area_file=area_file, archive_file=archive_file))
+            except Exception as ex:
+                # the audit failed before it started, so there's no row to
+                # record the error in
+                logger.exception("could not audit %s against %s", student_file, area_file)
+                sentry_sdk.capture_exception(ex)
+                continue
+
+            for start, result, error in outcomes:
+                written += bulk_writer.add(start=start, run_id=run_id, result=result, error=error)
+    finally:
+        written += bulk_writer.flush()
+
+    return written
+
+
+def audit_outcomes(*, student_file: str, area_file: str, archive_file: Optional[str]) -> Iterator[Tuple[AuditStartMsg, Optional[ResultMsg], Optional[Dict[str, Any]]]]:
+    """Runs a job's audits, and yields each one's start message with either its result or its error."""
+    args = Arguments(area_files=[area_file], student_files=[student_file], archive_file=archive_file)
+
+    start: Optional[AuditStartMsg] = None
+
+    try:
+        for msg in load_common().run(args):
+            if isinstance(msg, AuditStartMsg):
+                logger.info("auditing #%s against %s %s", msg.stnum, msg.area_catalog, msg.area_code)
+                start = msg
+
+            elif isinstance(msg, ResultMsg):
+                if start is not None:
+                    yield start, msg, None
+                    start = None
+
+            elif isinstance(msg, ExceptionMsg):
+                sentry_sdk.capture_exception(msg.ex)
+                if start is not None:
+                    yield start, None, {"error": str(msg.ex)}
+                    start = None
+
+            elif isinstance(msg, AreaFileNotFoundMsg):
+                logger.error("could not load area file %s for %s", msg.area_file, msg.stnum)
+
+            elif isinstance(msg, NoAuditsCompletedMsg):
+                logger.critical('no audits completed')
+
+    except Exception as ex:
+        # an audit that blew up partway through is recorded as a failure
+        if start is None:
+            raise
+        sentry_sdk.capture_exception(ex)
+        yield start, None, {"error": str(ex)}
+
+
 if __name__ == "__main__":
     cli()
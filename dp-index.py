@@ -1,81 +1,49 @@
 #!/usr/bin/env python3
 
 import argparse
-import json
 import glob
 import os
-import sqlite3
+
+from degreepath.student_index import open_index, update_index, query_index
 
 
 def main() -> int:
-    DEFAULT_DIR = os.getenv('DP_STUDENT_DIR', default=max(glob.iglob(os.path.expanduser('~/2019-*'))))
+    DEFAULT_DIR = os.getenv('DP_STUDENT_DIR', default=max(glob.iglob(os.path.expanduser('~/2019-*')), default=None))
 
     parser = argparse.ArgumentParser()
     parser.add_argument('--dir', default=DEFAULT_DIR)
     parser.add_argument('--clean', action='store_true')
     parser.add_argument('--more', action='store_true')
     parser.add_argument('--print', action='store_true')
+    parser.add_argument('-w', '--workers', type=int, default=None, help="parse student files in this many processes (default: one per CPU)")
+    parser.add_argument('--no-update', dest='update', action='store_false', help="query the index as it is, without checking for changed files")
     parser.add_argument('query')
 
     args = parser.parse_args()
 
     index_path = os.path.join(args.dir, 'index.sqlite3')
-    if args.clean:
+    if args.clean and os.path.exists(index_path):
         os.unlink(index_path)
 
-    with sqlite3.connect(index_path) as conn:
-        db = conn.cursor()
-
-        db.execute('''
-            create table if not exists area (
-                  stnum varchar
-                , name varchar
-                , type varchar
-                , catalog varchar
-                , code varchar
-                , dept varchar
-                , status varchar
-                , degree varchar
-            )
-        ''')
-
-        files = {os.path.basename(f[:-5]) for f in glob.iglob(os.path.join(args.dir, '*.json'))}
-
-        db.execute('select distinct stnum from area')
-
-        known_stnums = {r[0] for r in db.fetchall()}
-        to_index = files.difference(known_stnums)
-
-        for i, stnum in enumerate(to_index):
-            if i % 100 == 0:
-                print(f'\rindexing {i}/{len(to_index)} items', end='')
-            elif (i + 1 == len(to_index)):
-                print(f'\rindexing {i + 1}/{len(to_index)} items', end='')
-
-            with open(os.path.join(args.dir, f"{stnum}.json"), 'r', encoding='utf-8') as infile:
-                data = json.load(infile)
-
-            for area in data['areas']:
-                db.execute('''
-                    insert into area (stnum, name, type, code, dept, status, degree, catalog)
-                    values (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (str(data['stnum']), area['name'], area['kind'], area['code'], area.get('dept', ''), area['status'], area['degree'], area.get('catalog', data['catalog'])))
+    conn = open_index(index_path)
 
-        if to_index:
-            print()
+    try:
+        if args.update:
+            def progress(i: int, total: int) -> None:
+                if i % 100 == 0 or i == total:
+                    print(f'\rindexing {i}/{total} items', end='')
 
-        db.execute(f'''
-            select stnum, catalog || '-' || substr(catalog + 1, 3, 2), code, name, type
-            from area
-            where {args.query}
-            order by stnum
-        ''')
+            indexed, _ = update_index(conn, args.dir, workers=args.workers, progress=progress)
+            if indexed:
+                print()
 
-        for r in db.fetchall():
+        for r in query_index(conn, args.query):
             if args.more:
                 print(' '.join(r))
             else:
                 print(r[0], r[1], r[2])
+    finally:
+        conn.close()
 
     return 0
 
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="a resident audit server, and a client for it")
+    parser.add_argument("--socket", default=os.getenv('DP_SERVER_SOCKET', 'degreepath.sock'))
+    parser.add_argument("--loglevel", dest="loglevel", choices=("warn", "debug", "info", "critical"), default="info")
+    subparsers = parser.add_subparsers(dest="command")
+
+    serve = subparsers.add_parser("serve", help="start the server")
+    serve.add_argument("--areas-dir", default=os.path.expanduser('~/Projects/degreepath-areas'))
+    serve.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+
+    audit = subparsers.add_parser("audit", help="audit a student file against an area, using a running server")
+    audit.add_argument("--student", dest="student_file", required=True)
+    audit.add_argument("--area-code", required=True)
+    audit.add_argument("--catalog", required=True)
+    audit.add_argument("--json", action='store_true')
+
+    cli_args = parser.parse_args()
+
+    import dotenv
+    dotenv.load_dotenv(verbose=False)
+
+    logging.basicConfig(level=getattr(logging, cli_args.loglevel.upper()))
+
+    if cli_args.command == "serve":
+        return serve_forever(socket_path=cli_args.socket, areas_dir=cli_args.areas_dir, workers=cli_args.workers)
+    elif cli_args.command == "audit":
+        return request(socket_path=cli_args.socket, student_file=cli_args.student_file, area_code=cli_args.area_code, catalog=cli_args.catalog, as_json=cli_args.json)
+
+    parser.print_help()
+    return 1
+
+
+def serve_forever(*, socket_path: str, areas_dir: str, workers: int) -> int:
+    from degreepath.server import AuditServer
+
+    server = AuditServer(socket_path=socket_path, areas_dir=areas_dir, workers=workers)
+
+    def stop(signum: int, frame: object) -> None:
+        # shutdown() waits for serve_forever() to return, so it can't be
+        # called from the thread that's running it
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    server.serve_forever()
+    return 0
+
+
+def request(*, socket_path: str, student_file: str, area_code: str, catalog: str, as_json: bool) -> int:
+    from degreepath.server import request_audit
+    from degreepath.audit import ResultMsg, ExceptionMsg, AreaFileNotFoundMsg
+    from degreepath.stringify import summarize
+
+    with open(student_file, "r", encoding="utf-8") as infile:
+        student = json.load(infile)
+
+    for msg in request_audit(socket_path, student=student, area_code=area_code, catalog=catalog, progress=False):
+        if isinstance(msg, ExceptionMsg):
+            logger.critical("%s %s\n%s %s", msg.stnum, msg.area_code, msg.ex, msg.tb)
+            return 1
+
+        elif isinstance(msg, AreaFileNotFoundMsg):
+            logger.critical("could not find the area file %s", msg.area_file)
+            return 1
+
+        elif isinstance(msg, ResultMsg):
+            dict_result = msg.result.to_dict()
+
+            if as_json:
+                print(json.dumps(dict_result))
+            else:
+                print("\n" + "".join(summarize(
+                    result=json.loads(json.dumps(dict_result)),
+                    transcript=msg.transcript,
+                    count=msg.count,
+                    elapsed=msg.elapsed,
+                    iterations=msg.iterations,
+                    show_paths=True,
+                    show_ranks=True,
+                    claims=msg.result.keyed_claims(),
+                )))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,11 @@
 import argparse
+import collections
+import itertools
 import json
 import logging
-import os
-import runpy
-from datetime import datetime
-from typing import Optional, Any, Dict, cast, Iterator
+import multiprocessing
+import queue
+from typing import Optional, Any, Dict, List, Set, Tuple, Iterator, Hashable
 import contextlib
 import sqlite3
 import time
@@ -12,70 +13,461 @@ import random
 
 from degreepath.ms import pretty_ms
 from degreepath.audit import NoStudentsMsg, ResultMsg, AuditStartMsg, ExceptionMsg, NoAuditsCompletedMsg, ProgressMsg, Arguments, EstimateMsg, AreaFileNotFoundMsg
+from degreepath.entrypoint import load_common
 
 logger = logging.getLogger(__name__)
-dirpath = os.path.dirname(os.path.abspath(__file__))
-dp = runpy.run_path(dirpath + '/dp-common.py')
+
+# progress is written at most this often per audit, regardless of how
+# quickly the audit is iterating
+PROGRESS_INTERVAL = 5.0
+
+# how often the writer checks that the audit workers are still alive
+WORKER_CHECK_INTERVAL = 1.0
+
+# Writes are described by small tuples, so that audit workers can hand them
+# to the single writer process through a queue:
+#
+#     ('start', key, {student_id, area_code, catalog, run})
+#     ('progress', key, count)
+#     ('record', key, {result columns}, [(clause_hash, clbids), …])
+#     ('error', key, {error})
+#
+# The key identifies one audit, and is chosen by whoever produced the audit.
+Op = Tuple[Any, ...]
 
 
 def cli() -> None:
     parser = argparse.ArgumentParser()
-    parser.add_argument("--area", dest="area_file", required=True)
-    parser.add_argument("--student", dest="student_file", required=True)
+    parser.add_argument("--area", dest="area_files", nargs="+", required=True)
+    parser.add_argument("--student", dest="student_files", nargs="+", required=True)
     parser.add_argument("--run", dest="run", type=int, required=True)
+    parser.add_argument("--db", dest="db", default="degreepath.db")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="audit in this many processes, all writing through this one")
+    parser.add_argument("--batch-size", type=int, default=500, help="the number of writes to group into each transaction")
+    parser.add_argument("--flush-interval", type=float, default=2.0, help="the longest that a write waits before it's committed")
     parser.add_argument("--loglevel", dest="loglevel", choices=("warn", "debug", "info", "critical"), default="warn")
     args = parser.parse_args()
 
     loglevel = getattr(logging, args.loglevel.upper())
     logging.basicConfig(level=loglevel)
 
-    main(student_file=args.student_file, area_file=args.area_file, run_id=args.run)
-
-
-def main(area_file: str, student_file: str, run_id: int) -> None:
-    with connect('degreepath.db') as conn:
+    jobs = [(student_file, area_file) for student_file in args.student_files for area_file in args.area_files]
+
+    main(
+        jobs=jobs,
+        run_id=args.run,
+        db=args.db,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        flush_interval=args.flush_interval,
+    )
+
+
+def main(
+    *,
+    jobs: List[Tuple[str, str]],
+    run_id: int,
+    db: str = 'degreepath.db',
+    workers: int = 1,
+    batch_size: int = 500,
+    flush_interval: float = 2.0,
+) -> None:
+    with connect(db) as conn:
         init_tables(conn=conn)
 
-        result_id = None
-
-        args = Arguments(area_files=[area_file], student_files=[student_file])
-
-        for msg in dp['run'](args):
-            if isinstance(msg, NoStudentsMsg):
-                logger.critical('no student files provided')
-
-            elif isinstance(msg, NoAuditsCompletedMsg):
-                logger.critical('no audits completed')
-
-            elif isinstance(msg, AuditStartMsg):
-                logger.info("auditing #%s against %s %s", msg.stnum, msg.area_catalog, msg.area_code)
-
-                result_id = make_result_id(conn=conn, stnum=msg.stnum, area_code=msg.area_code, catalog=msg.area_catalog, run=run_id)
-
-            elif isinstance(msg, ExceptionMsg):
-                if result_id is not None:
-                    record_error(result_id=result_id, conn=conn, error={"error": str(msg.ex)})
+        with ResultWriter(conn, batch_size=batch_size, flush_interval=flush_interval) as writer:
+            if workers <= 1:
+                for job_id, (student_file, area_file) in enumerate(jobs):
+                    for op in audit_ops(job_id=job_id, student_file=student_file, area_file=area_file, run_id=run_id):
+                        writer.apply(op)
+            else:
+                run_workers(writer, jobs=jobs, run_id=run_id, workers=workers)
+
+
+def run_workers(writer: 'ResultWriter', *, jobs: List[Tuple[str, str]], run_id: int, workers: int) -> None:
+    """
+    Audits the jobs in a pool of processes. The workers don't touch the
+    database; they send their writes back here, and this process is the only
+    writer.
+    """
+    pool = WorkerPool(writer, jobs=jobs, run_id=run_id)
+    for _ in range(min(workers, len(jobs))):
+        pool.start()
+
+    last_check = time.monotonic()
+    while pool.busy():
+        try:
+            op = pool.ops.get(timeout=min(writer.flush_interval, WORKER_CHECK_INTERVAL))
+        except queue.Empty:
+            writer.maybe_flush()
+        else:
+            pool.handle(op)
+
+        # a busy queue never times out, so the workers are checked on the clock
+        if time.monotonic() - last_check >= WORKER_CHECK_INTERVAL:
+            last_check = time.monotonic()
+            pool.check_workers()
+
+    pool.join()
+
+
+class WorkerPool:
+    """
+    The audit processes for run_workers.
+
+    Each worker is handed one job at a time, so that if a worker dies, we
+    know which job it was working on: that job's unfinished audits are
+    recorded as errors, and a new worker takes its place. (A
+    multiprocessing.Pool replaces dead workers too, but silently drops their
+    tasks.)
+    """
+
+    def __init__(self, writer: 'ResultWriter', *, jobs: List[Tuple[str, str]], run_id: int) -> None:
+        self.writer = writer
+        self.run_id = run_id
+        self.ops: Any = multiprocessing.Queue()
+
+        self._jobs = jobs
+        self._pending = collections.deque(enumerate(jobs))
+        self._procs: List[Any] = []
+        self._tasks: List[Any] = []
+        self._assigned: List[Optional[int]] = []
+
+        # the audits that each job has started, but not yet finished
+        self._open_keys: Dict[int, Set[Hashable]] = collections.defaultdict(set)
+
+        # the jobs whose workers died, and the error that their audits get
+        self._abandoned: Dict[int, Dict[str, Any]] = {}
+
+    def busy(self) -> bool:
+        return any(job_id is not None for job_id in self._assigned)
+
+    def start(self, index: Optional[int] = None) -> None:
+        tasks: Any = multiprocessing.Queue()
+        if index is None:
+            index = len(self._procs)
+            self._procs.append(None)
+            self._tasks.append(None)
+            self._assigned.append(None)
+
+        proc = multiprocessing.Process(target=worker_main, args=(index, tasks, self.ops), daemon=True)
+        proc.start()
+
+        self._procs[index] = proc
+        self._tasks[index] = tasks
+        self._assign(index)
+
+    def _assign(self, index: int) -> None:
+        if self._pending:
+            job_id, (student_file, area_file) = self._pending.popleft()
+            self._tasks[index].put((job_id, student_file, area_file, self.run_id))
+            self._assigned[index] = job_id
+        else:
+            self._tasks[index].put(None)
+            self._assigned[index] = None
+
+    def handle(self, op: Op) -> None:
+        kind = op[0]
+        if kind == 'done':
+            _, job_id, index = op
+            # a job that was already given up on stays given up on
+            if self._assigned[index] == job_id:
+                self._open_keys.pop(job_id, None)
+                self._assign(index)
+            return
+
+        key = op[1]
+        job_id = key[0]
+
+        # the writes that a dead worker sent before it died can still be
+        # arriving after its job was given up on: an audit that starts now
+        # is failed straight away, and anything else is too late
+        if job_id in self._abandoned:
+            if kind == 'start':
+                self.writer.apply(op)
+                self.writer.apply(('error', key, self._abandoned[job_id]))
+            else:
+                logger.warning("dropping a late %r for the abandoned audit %s", kind, key)
+            return
 
-            elif isinstance(msg, AreaFileNotFoundMsg):
-                message = "Could not load area file"
+        if kind == 'start':
+            self._open_keys[job_id].add(key)
+        elif kind in ('record', 'error'):
+            self._open_keys[job_id].discard(key)
 
-                if result_id is not None:
-                    record_error(result_id=result_id, conn=conn, error={"error": message, "stnum": msg.stnum, "area_file": msg.area_file})
+        self.writer.apply(op)
 
-            elif isinstance(msg, ProgressMsg):
-                avg_iter_s = sum(msg.recent_iters) / max(len(msg.recent_iters), 1)
-                avg_iter_time = pretty_ms(avg_iter_s * 1_000, format_sub_ms=True, unit_count=1)
-                update_progress(conn=conn, start_time=msg.start_time, count=msg.count, result_id=result_id)
-                logger.info(f"{msg.count:,} at {avg_iter_time} per audit")
+    def drain(self) -> None:
+        """Handles every write that has already arrived."""
+        while True:
+            try:
+                op = self.ops.get_nowait()
+            except queue.Empty:
+                return
+            self.handle(op)
+
+    def check_workers(self) -> None:
+        for index, proc in enumerate(self._procs):
+            job_id = self._assigned[index]
+            if job_id is None or proc.is_alive():
+                continue
+
+            # let whatever the worker managed to send land first, so that
+            # its finished audits are kept; this may also finish the job
+            self.drain()
+            if self._assigned[index] != job_id:
+                # it finished the job, and died before taking the next
+                # one, which goes back in line
+                next_job = self._assigned[index]
+                if next_job is not None:
+                    self._pending.appendleft((next_job, self._jobs[next_job]))
+                    self.start(index)
+                continue
+
+            logger.error("worker %s exited with code %s during job %s", proc.pid, proc.exitcode, job_id)
+            error = {"error": f"the worker exited with code {proc.exitcode}"}
+            self._abandoned[job_id] = error
+            for key in self._open_keys.pop(job_id, set()):
+                self.writer.apply(('error', key, error))
+            self.start(index)
+
+    def join(self) -> None:
+        for proc in self._procs:
+            proc.join()
+
+
+def worker_main(index: int, tasks: Any, ops: Any) -> None:
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+
+        job_id, student_file, area_file, run_id = task
+        try:
+            for op in audit_ops(job_id=job_id, student_file=student_file, area_file=area_file, run_id=run_id):
+                ops.put(op)
+        except Exception:
+            logger.exception("job %s (%s, %s) failed", job_id, student_file, area_file)
+        finally:
+            ops.put(('done', job_id, index))
+
+
+def audit_ops(*, job_id: int, student_file: str, area_file: str, run_id: int) -> Iterator[Op]:
+    """Runs one job's audits, and yields the writes that record them."""
+    args = Arguments(area_files=[area_file], student_files=[student_file], archive_file=None)
+
+    audit_ids = itertools.count()
+    key: Optional[Hashable] = None
+    last_progress = 0.0
+
+    for msg in load_common().run(args):
+        if isinstance(msg, NoStudentsMsg):
+            logger.critical('no student files provided')
+
+        elif isinstance(msg, NoAuditsCompletedMsg):
+            logger.critical('no audits completed')
+
+        elif isinstance(msg, AuditStartMsg):
+            logger.info("auditing #%s against %s %s", msg.stnum, msg.area_catalog, msg.area_code)
+
+            key = (job_id, next(audit_ids))
+            last_progress = time.monotonic()
+            yield ('start', key, {"student_id": msg.stnum, "area_code": msg.area_code, "catalog": msg.area_catalog, "run": run_id})
+
+        elif isinstance(msg, ExceptionMsg):
+            if key is not None:
+                yield ('error', key, {"error": str(msg.ex)})
+
+        elif isinstance(msg, AreaFileNotFoundMsg):
+            message = "Could not load area file"
+
+            if key is not None:
+                yield ('error', key, {"error": message, "stnum": msg.stnum, "area_file": msg.area_file})
+
+        elif isinstance(msg, ProgressMsg):
+            avg_iter_s = sum(msg.recent_iters) / max(len(msg.recent_iters), 1)
+            avg_iter_time = pretty_ms(avg_iter_s * 1_000, format_sub_ms=True, unit_count=1)
+            logger.info(f"{msg.count:,} at {avg_iter_time} per audit")
+
+            now = time.monotonic()
+            if key is not None and now - last_progress >= PROGRESS_INTERVAL:
+                last_progress = now
+                yield ('progress', key, msg.count)
+
+        elif isinstance(msg, ResultMsg):
+            if key is not None:
+                yield ('record', key, result_columns(msg), [(h, json.dumps(clbids)) for h, clbids in msg.potentials_for_all_clauses.items()])
+
+        elif isinstance(msg, EstimateMsg):
+            pass
+
+        else:
+            logger.critical('unknown message %s', msg)
+
+
+def result_columns(message: ResultMsg) -> Dict[str, Any]:
+    result = message.result.to_dict()
 
-            elif isinstance(msg, ResultMsg):
-                record(conn=conn, result_id=result_id, message=msg)
+    avg_iter_s = sum(message.iterations) / max(len(message.iterations), 1)
+    avg_iter_time = pretty_ms(avg_iter_s * 1_000, format_sub_ms=True, unit_count=1)
 
-            elif isinstance(msg, EstimateMsg):
-                pass
+    return {
+        "total_count": message.count,
+        "elapsed": message.elapsed,
+        "avg_iter_time": avg_iter_time.strip("~"),
+        "result": json.dumps(result),
+        "rank": result["rank"],
+        "max_rank": result["max_rank"],
+        "gpa": result["gpa"],
+        "ok": result["ok"],
+    }
+
+
+class ResultWriter:
+    """
+    A write-behind buffer for the result tables.
+
+    Writes are queued, and committed together (with executemany) once
+    batch_size of them are waiting or flush_interval seconds have passed.
+    Only the latest progress update for each audit is kept, and only the
+    first record or error: writes for an audit that is unknown or already
+    finished are logged and dropped.
+
+    Result ids are handed out inside the write transaction (BEGIN IMMEDIATE
+    holds SQLite's write lock), so several writers can share a database.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, *, batch_size: int = 500, flush_interval: float = 2.0) -> None:
+        self.conn = conn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._ids: Dict[Hashable, int] = {}
+        self._starts: List[Tuple[Hashable, Dict[str, Any]]] = []
+        self._progress: Dict[Hashable, int] = {}
+        self._records: List[Tuple[Hashable, Dict[str, Any], List[Tuple[int, str]]]] = []
+        self._errors: List[Tuple[Hashable, Dict[str, Any]]] = []
+        self._finishing: Set[Hashable] = set()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def __enter__(self) -> 'ResultWriter':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.flush()
+
+    def result_id(self, key: Hashable) -> Optional[int]:
+        """The id of the audit's row, once its start has been flushed (and until it's finished)."""
+        return self._ids.get(key, None)
+
+    def apply(self, op: Op) -> None:
+        kind = op[0]
+        if kind == 'start':
+            self._starts.append((op[1], op[2]))
+        elif kind == 'progress':
+            self._progress[op[1]] = op[2]
+        elif kind in ('record', 'error'):
+            if op[1] in self._finishing:
+                logger.warning("dropping a %r for the already-finished audit %s", kind, op[1])
+                return
+            self._finishing.add(op[1])
 
+            if kind == 'record':
+                self._records.append((op[1], op[2], op[3]))
             else:
-                logger.critical('unknown message %s', msg)
+                self._errors.append((op[1], op[2]))
+        else:
+            raise ValueError(f'unknown write {kind!r}')
+
+        self._pending += 1
+        self.maybe_flush()
+
+    def maybe_flush(self) -> None:
+        if self._pending >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+
+        conn = self.conn
+        with transaction(conn, immediate=True):
+            if self._starts:
+                next_id = conn.execute("SELECT coalesce(max(id), 0) + 1 FROM result").fetchone()[0]
+                rows = []
+                for key, row in self._starts:
+                    self._ids[key] = next_id
+                    rows.append({**row, "id": next_id})
+                    next_id += 1
+
+                conn.executemany("""
+                    INSERT INTO result (id, student_id, area_code, catalog, in_progress, run, ts)
+                    VALUES (:id, :student_id, :area_code, :catalog, true, :run, datetime('now'))
+                """, rows)
+
+            # an audit that finished in an earlier batch (or never started)
+            # has no id any more
+            records = [r for r in self._records if self._known(r[0], 'record')]
+            errors = [e for e in self._errors if self._known(e[0], 'error')]
+            finished = self._finishing
+
+            conn.executemany("""
+                UPDATE result
+                SET iterations = :count, duration = (strftime('%s','now') - strftime('%s', ts))
+                WHERE id = :result_id
+            """, [
+                {"result_id": self._ids[key], "count": count}
+                for key, count in self._progress.items()
+                if key not in finished and self._known(key, 'progress')
+            ])
+
+            conn.executemany("""
+                UPDATE result
+                SET iterations = :total_count
+                  , duration = :elapsed
+                  , per_iteration = :avg_iter_time
+                  , rank = :rank
+                  , max_rank = :max_rank
+                  , result = :result
+                  , ok = :ok
+                  , ts = datetime('now')
+                  , gpa = :gpa
+                  , in_progress = false
+                WHERE id = :result_id
+            """, [{**columns, "result_id": self._ids[key]} for key, columns, _ in records])
+
+            conn.executemany("""
+                INSERT INTO potential_clbids (result_id, clause_hash, clbids)
+                VALUES (:result_id, :clause_hash, :clbids)
+            """, [
+                {"result_id": self._ids[key], "clause_hash": clause_hash, "clbids": clbids}
+                for key, _, potentials in records
+                for clause_hash, clbids in potentials
+            ])
+
+            conn.executemany("""
+                UPDATE result
+                SET in_progress = false, error = :error
+                WHERE id = :result_id
+            """, [{"result_id": self._ids[key], "error": json.dumps(error)} for key, error in errors])
+
+        for key in finished:
+            self._ids.pop(key, None)
+        self._finishing = set()
+
+        self._starts.clear()
+        self._progress.clear()
+        self._records.clear()
+        self._errors.clear()
+        self._pending = 0
+
+    def _known(self, key: Hashable, kind: str) -> bool:
+        if key in self._ids:
+            return True
+        logger.warning("dropping a %r for the unknown or finished audit %s", kind, key)
+        return False
 
 
 @contextlib.contextmanager
@@ -90,18 +482,10 @@ def connect(filename: str) -> Iterator[sqlite3.Connection]:
 
 
 @contextlib.contextmanager
-def cursor(conn: sqlite3.Connection) -> Iterator[sqlite3.Cursor]:
-    curs = conn.cursor()
-    try:
-        yield curs
-    finally:
-        curs.close()
-
-
-@contextlib.contextmanager
-def transaction(conn: sqlite3.Connection) -> Iterator[None]:
+def transaction(conn: sqlite3.Connection, *, immediate: bool = False) -> Iterator[None]:
     # We must issue a "BEGIN" explicitly when running in auto-commit mode.
-    conn.execute('BEGIN')
+    # An immediate transaction takes the write lock up front.
+    conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
     try:
         # Yield control back to the caller.
         yield
@@ -119,49 +503,6 @@ def transaction(conn: sqlite3.Connection) -> Iterator[None]:
                     raise
 
 
-def record(*, message: ResultMsg, conn: sqlite3.Connection, result_id: Optional[int]) -> None:
-    result = message.result.to_dict()
-
-    avg_iter_s = sum(message.iterations) / max(len(message.iterations), 1)
-    avg_iter_time = pretty_ms(avg_iter_s * 1_000, format_sub_ms=True, unit_count=1)
-
-    with transaction(conn):
-        conn.execute("""
-            UPDATE result
-            SET iterations = :total_count
-              , duration = :elapsed
-              , per_iteration = :avg_iter_time
-              , rank = :rank
-              , max_rank = :max_rank
-              , result = :result
-              , ok = :ok
-              , ts = datetime('now')
-              , gpa = :gpa
-              , in_progress = false
-            WHERE id = :result_id
-        """, {
-            "result_id": result_id,
-            "total_count": message.count,
-            "elapsed": message.elapsed,
-            "avg_iter_time": avg_iter_time.strip("~"),
-            "result": json.dumps(result),
-            "rank": result["rank"],
-            "max_rank": result["max_rank"],
-            "gpa": result["gpa"],
-            "ok": result["ok"],
-        })
-
-        for clause_hash, clbids in message.potentials_for_all_clauses.items():
-            conn.execute("""
-                INSERT INTO potential_clbids (result_id, clause_hash, clbids)
-                VALUES (:result_id, :clause_hash, :clbids)
-            """, {
-                "result_id": result_id,
-                "clause_hash": clause_hash,
-                "clbids": json.dumps(clbids),
-            })
-
-
 def init_tables(*, conn: sqlite3.Connection) -> None:
     with transaction(conn):
         conn.execute("""
@@ -201,34 +542,5 @@ def init_tables(*, conn: sqlite3.Connection) -> None:
         """)
 
 
-def update_progress(*, conn: sqlite3.Connection, start_time: datetime, count: int, result_id: Optional[int]) -> None:
-    with transaction(conn):
-        conn.execute("""
-            UPDATE result
-            SET iterations = :count, duration = (strftime('%s','now') - strftime('%s', ts))
-            WHERE id = :result_id
-        """, {"result_id": result_id, "count": count, "start_time": start_time})
-
-
-def make_result_id(*, stnum: str, conn: sqlite3.Connection, area_code: str, catalog: str, run: Optional[int]) -> Optional[int]:
-    with cursor(conn) as curs:
-        with transaction(conn):
-            curs.execute("""
-                INSERT INTO result (student_id, area_code, catalog, in_progress, run, ts)
-                VALUES (:student_id, :area_code, :catalog, true, :run, datetime('now'))
-            """, {"student_id": stnum, "area_code": area_code, "catalog": catalog, "run": run})
-
-        return cast(int, curs.lastrowid)
-
-
-def record_error(*, conn: sqlite3.Connection, result_id: int, error: Dict[str, Any]) -> None:
-    with transaction(conn):
-        conn.execute("""
-            UPDATE result
-            SET in_progress = false, error = :error
-            WHERE id = :result_id
-        """, {"result_id": result_id, "error": json.dumps(error)})
-
-
 if __name__ == "__main__":
     cli()
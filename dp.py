@@ -1,24 +1,17 @@
-from typing import Any
+from typing import Any, TYPE_CHECKING
+from functools import lru_cache
 import argparse
 import logging
-import runpy
 import json
 import sys
 import os
-import dotenv
-import prettyprinter  # type: ignore
 
-from degreepath.ms import pretty_ms
-from degreepath.stringify import summarize
-from degreepath.stringify_csv import to_csv
-from degreepath.area import AreaResult
-from degreepath.audit import NoStudentsMsg, ResultMsg, AuditStartMsg, ExceptionMsg, NoAuditsCompletedMsg, ProgressMsg, Arguments, EstimateMsg, AreaFileNotFoundMsg
+# Only the standard library is imported up front; the engine (and the slower
+# third-party packages) are imported once the arguments have been parsed, so
+# that `--help` and argument errors return immediately. See tests/test_startup.py.
 
-dirpath = os.path.dirname(os.path.abspath(__file__))
-dp = runpy.run_path(dirpath + '/dp-common.py')
-
-prettyprinter.install_extras(['attrs', 'dataclasses'])
-dotenv.load_dotenv(verbose=False)
+if TYPE_CHECKING:
+    from degreepath.audit import ResultMsg
 
 logger = logging.getLogger(__name__)
 # logformat = "%(levelname)s:%(name)s:%(message)s"
@@ -30,6 +23,9 @@ def main() -> int:  # noqa: C901
     parser.add_argument("--area", dest="area_files", nargs="+", required=True)
     parser.add_argument("--student", dest="student_files", nargs="+", required=True)
     parser.add_argument("--archive", dest="archive_file")
+    parser.add_argument("--cohort", dest="cohort_file", help="a packed cohort file (see dp-cohort.py); --student then takes stnums")
+    parser.add_argument("--warm-start", dest="warm_start_file", help="a previous result (as JSON, or a stored row) whose choices the solver should try first, in that student's audit of that area")
+    parser.add_argument("--solver-workers", type=int, default=0, help="solve independent requirements concurrently, with this many workers")
     parser.add_argument("--loglevel", dest="loglevel", choices=("warn", "debug", "info", "critical"), default="info")
     parser.add_argument("--json", action='store_true')
     parser.add_argument("--csv", action='store_true')
@@ -47,6 +43,13 @@ def main() -> int:  # noqa: C901
     parser.add_argument("--no-ranks", dest='show_ranks', action='store_const', const=False)
     cli_args = parser.parse_args()
 
+    import dotenv
+    dotenv.load_dotenv(verbose=False)
+
+    from degreepath.ms import pretty_ms
+    from degreepath.entrypoint import load_common
+    from degreepath.audit import NoStudentsMsg, ResultMsg, AuditStartMsg, ExceptionMsg, NoAuditsCompletedMsg, ProgressMsg, Arguments, EstimateMsg, AreaFileNotFoundMsg
+
     loglevel = getattr(logging, cli_args.loglevel.upper())
     logging.basicConfig(level=loglevel, format=logformat)
 
@@ -59,13 +62,16 @@ def main() -> int:  # noqa: C901
         print_all=cli_args.print_all,
         estimate_only=False,
         archive_file=cli_args.archive_file,
+        cohort_file=cli_args.cohort_file,
+        warm_start_file=cli_args.warm_start_file,
+        solver_workers=cli_args.solver_workers,
     )
 
     if cli_args.tracemalloc_init or cli_args.tracemalloc_end:
         import tracemalloc
         tracemalloc.start()
 
-    for msg in dp['run'](args, transcript_only=cli_args.transcript, gpa_only=cli_args.gpa):
+    for msg in load_common().run(args, transcript_only=cli_args.transcript, gpa_only=cli_args.gpa):
         if isinstance(msg, NoStudentsMsg):
             logger.critical('no student files provided')
             return 3
@@ -126,7 +132,7 @@ def main() -> int:  # noqa: C901
 
 
 def result_str(
-    msg: ResultMsg, *,
+    msg: 'ResultMsg', *,
     as_json: bool,
     as_raw: bool,
     as_csv: bool,
@@ -140,15 +146,19 @@ def result_str(
     dict_result = msg.result.to_dict()
 
     if as_csv:
+        from degreepath.stringify_csv import to_csv
         return to_csv(dict_result, transcript=msg.transcript)
 
     if as_json:
         return json.dumps(dict_result)
 
     if as_raw:
+        prettyprinter = install_prettyprinter()
         prettyprinter.cpprint(dict_result)
         return ''
 
+    from degreepath.stringify import summarize
+
     dict_result = json.loads(json.dumps(dict_result))
 
     return "\n" + "".join(summarize(
@@ -192,9 +202,18 @@ def display_top(snapshot: Any, key_type: str = 'lineno', limit: int = 10) -> Non
     print("Total allocated size: %.1f KiB" % (total / 1024))
 
 
-@prettyprinter.register_pretty(AreaResult)  # type: ignore
-def pretty_arearesult(value: Any, ctx: Any) -> Any:
-    return prettyprinter.pretty_call(ctx, AreaResult, result=value.result)
+@lru_cache(1)
+def install_prettyprinter() -> Any:
+    import prettyprinter  # type: ignore
+    from degreepath.area import AreaResult
+
+    prettyprinter.install_extras(['attrs', 'dataclasses'])
+
+    @prettyprinter.register_pretty(AreaResult)  # type: ignore
+    def pretty_arearesult(value: Any, ctx: Any) -> Any:
+        return prettyprinter.pretty_call(ctx, AreaResult, result=value.result)
+
+    return prettyprinter
 
 
 if __name__ == "__main__":
@@ -0,0 +1,64 @@
+from degreepath.archive import IndexedArchive, load_index, clear_index_cache, INDEX_SUFFIX, CHUNKS_SUFFIX
+import io
+import json
+import os
+import tarfile
+import pytest
+
+
+students = {f"students/{n}.json": json.dumps({"stnum": str(n), "courses": []}).encode('utf-8') for n in range(5)}
+
+
+def write_archive(path, members, mode='w'):
+    with tarfile.open(path, mode) as tarball:
+        directory = tarfile.TarInfo('students')
+        directory.type = tarfile.DIRTYPE
+        tarball.addfile(directory)
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tarball.addfile(info, io.BytesIO(data))
+
+
+@pytest.fixture(autouse=True)
+def fresh_indexes():
+    clear_index_cache()
+    yield
+    clear_index_cache()
+
+
+@pytest.mark.parametrize("mode, suffix", [("w", ".tar"), ("w:gz", ".tar.gz"), ("w:xz", ".tar.xz")])
+def test_members_round_trip(tmp_path, mode, suffix):
+    path = str(tmp_path / f"students{suffix}")
+    write_archive(path, students, mode=mode)
+
+    with IndexedArchive.open(path) as archive:
+        assert sorted(archive.names()) == sorted(students.keys())
+        for name, data in students.items():
+            assert archive.read(name) == data
+
+        with pytest.raises(KeyError):
+            archive.read("students/missing.json")
+
+    assert os.path.exists(path + INDEX_SUFFIX)
+    assert os.path.exists(path + CHUNKS_SUFFIX) == (mode != "w")
+
+
+def test_the_index_is_reused_until_the_archive_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / "students.tar")
+    write_archive(path, students)
+    load_index(path)
+
+    # another process reads the sidecar instead of scanning the archive
+    clear_index_cache()
+    monkeypatch.setattr(tarfile, 'open', lambda *args, **kwargs: pytest.fail("rescanned the archive"))
+    with IndexedArchive.open(path) as archive:
+        assert archive.read("students/3.json") == students["students/3.json"]
+    monkeypatch.undo()
+
+    changed = {**students, "students/9.json": b'{"stnum": "9"}'}
+    write_archive(path, changed)
+    os.utime(path, ns=(0, 0))
+
+    with IndexedArchive.open(path) as archive:
+        assert archive.read("students/9.json") == b'{"stnum": "9"}'
@@ -0,0 +1,111 @@
+from degreepath.area import AreaOfStudy
+from degreepath.area_cache import load_area_file, clear_area_cache
+from degreepath.constants import Constants
+from degreepath.data import AreaPointer, course_from_str
+from degreepath.data.area_enums import AreaStatus, AreaType
+import yaml
+
+c = Constants(matriculation_year=2000)
+
+spec = """
+name: Test Major
+type: major
+code: '140'
+degree: B.A.
+
+emphases:
+  1:
+    name: Emphasis
+    result: {course: DEPT 345}
+
+result:
+  all:
+    - requirement: Core
+
+requirements:
+  Core:
+    message: Take *both* courses.
+    result:
+      all:
+        - course: DEPT 123
+        - course: DEPT 234
+"""
+
+
+def pointer(code, kind=AreaType.Major, dept=None):
+    return AreaPointer(code=code, status=AreaStatus.Declared, kind=kind, name='', degree='B.A.', dept=dept, gpa=None)
+
+
+def write_spec(tmp_path, text=spec):
+    path = tmp_path / "140.yaml"
+    path.write_text(text)
+    return str(path)
+
+
+def test_cached_load_matches_direct_load(tmp_path):
+    clear_area_cache()
+    area_file = write_spec(tmp_path)
+    areas = [pointer('140', dept='ART'), pointer('1', kind=AreaType.Emphasis)]
+
+    direct = AreaOfStudy.load(specification=yaml.load(spec, Loader=yaml.SafeLoader), c=c, areas=areas)
+    first = load_area_file(area_file, c=c, areas=areas)
+    second = load_area_file(area_file, c=c, areas=areas)
+
+    assert first == direct
+    assert second == direct
+    assert first.result is second.result
+
+
+def test_student_dependent_parts_are_reattached(tmp_path):
+    clear_area_cache()
+    area_file = write_spec(tmp_path)
+
+    plain = load_area_file(area_file, c=c, areas=[pointer('140', dept='ART')])
+    double = load_area_file(area_file, c=c, areas=[pointer('140', dept='ART'), pointer('135', dept='ART')])
+    no_emphasis = load_area_file(area_file, c=c, areas=[])
+    with_emphasis = load_area_file(area_file, c=c, areas=[pointer('1', kind=AreaType.Emphasis)])
+
+    assert plain.dept == 'ART'
+    assert plain.common_rules[2].result.assertions[0].assertion.expected == 21
+    assert double.common_rules[2].result.assertions[0].assertion.expected == 18
+    assert no_emphasis.dept is None
+
+    assert len(no_emphasis.result.items) == 1
+    assert len(with_emphasis.result.items) == 2
+
+
+def test_on_disk_cache(tmp_path):
+    clear_area_cache()
+    area_file = write_spec(tmp_path)
+    cache_root = str(tmp_path / "cache")
+
+    first = load_area_file(area_file, c=c, cache_root=cache_root)
+    clear_area_cache()
+    second = load_area_file(area_file, c=c, cache_root=cache_root)
+
+    assert first == second
+    assert hash(first.result) == hash(second.result)
+    assert first.result is not second.result
+    assert len(list((tmp_path / "cache" / "areas").iterdir())) == 1
+
+
+def test_conditional_areas_are_loaded_per_student(tmp_path):
+    clear_area_cache()
+    area_file = write_spec(tmp_path, """
+        result:
+          all:
+            - requirement: Maybe
+            - course: DEPT 123
+
+        requirements:
+          Maybe:
+            if: {from: courses, where: {subject: {$eq: ABC}}, assert: {count(courses): {$gte: 1}}}
+            then: {course: ABC 101}
+            else: {course: DEPT 234}
+    """)
+
+    without = load_area_file(area_file, c=c, transcript=[course_from_str("DEPT 123")])
+    with_abc = load_area_file(area_file, c=c, transcript=[course_from_str("ABC 101")])
+
+    assert without.result.items[0].result.course == 'DEPT 234'
+    assert with_abc.result.items[0].result.course == 'ABC 101'
@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+import importlib.util
+import os
+import pathlib
+
+import pytest
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+
+@pytest.fixture
+def dp_batch():
+    spec = importlib.util.spec_from_file_location('dp_batch', ROOT / 'dp-batch.py')
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def crashing_audit(job, cli_args):
+    stnum, catalog, area_code = job
+    if stnum == 'crash':
+        # kill the worker outright, as a segfault or the OOM killer would
+        os._exit(1)
+    return f"{stnum}\n", '', 0, 0.0
+
+
+def test_a_dead_worker_only_fails_its_own_job(dp_batch, monkeypatch):
+    monkeypatch.setattr(dp_batch, 'audit_job_captured', crashing_audit)
+
+    jobs = [(stnum, '2019-20', '140') for stnum in ['1', '2', 'crash', '4', '5', '6', '7', '8']]
+    outputs = list(dp_batch.run_parallel(jobs, SimpleNamespace(workers=2)))
+
+    assert [stdout for stdout, _, _, _ in outputs] == ['1\n', '2\n', '', '4\n', '5\n', '6\n', '7\n', '8\n']
+    assert [code for _, _, code, _ in outputs] == [0, 0, 1, 0, 0, 0, 0, 0]
+    assert 'worker failed' in outputs[2][1]
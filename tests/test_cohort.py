@@ -0,0 +1,118 @@
+import json
+from degreepath.cohort import write_cohort, CohortFile
+from degreepath.data import load_course
+import pytest
+
+
+def row(clbid, subject, number, **kwargs):
+    return {
+        "attributes": ["elective"] if number.startswith("3") else [],
+        "clbid": clbid,
+        "course_type": "SE",
+        "credits": "1.00",
+        "crsid": f"{subject}{number}",
+        "flag_gpa": True,
+        "flag_incomplete": False,
+        "flag_in_progress": False,
+        "flag_repeat": False,
+        "flag_stolaf": True,
+        "gereqs": ["WRI"],
+        "grade_code": "B",
+        "grade_option": "grade",
+        "grade_points": "3.00",
+        "grade_points_gpa": "3.00",
+        "level": number[0] + "00",
+        "name": f"{subject} {number}",
+        "number": number,
+        "section": "A",
+        "sub_type": "",
+        "subjects": [subject],
+        "term": "1",
+        "transcript_code": "",
+        "year": 2019,
+        **kwargs,
+    }
+
+
+students = [
+    {
+        "stnum": "200",
+        "matriculation": "2016",
+        "areas": [{"code": "140", "kind": "major"}],
+        "courses": [row("1", "ART", "102"), row("2", "ART", "301", flag_in_progress=True, grade_code="IP")],
+    },
+    {
+        "stnum": "100",
+        "matriculation": "2017",
+        "areas": [],
+        "courses": [row("3", "CSCI", "121", sub_type="lab", section=None)],
+    },
+]
+
+
+def test_cohort_round_trip(tmp_path):
+    path = str(tmp_path / "cohort.bin")
+    assert write_cohort(path, students) == 2
+
+    with CohortFile.open(path) as cohort:
+        assert cohort.stnums() == ["100", "200"]
+
+        for student in students:
+            assert cohort.courses(student["stnum"]) == tuple(load_course(r) for r in student["courses"])
+
+            data = cohort.student(student["stnum"])
+            assert data["matriculation"] == student["matriculation"]
+            assert data["areas"] == student["areas"]
+            assert tuple(load_course(r) for r in data["courses"]) == tuple(load_course(r) for r in student["courses"])
+
+
+def test_cohort_shares_offering_strings(tmp_path):
+    path = str(tmp_path / "cohort.bin")
+    write_cohort(path, students)
+
+    with CohortFile.open(path) as cohort:
+        a, b = cohort.courses("200")
+        assert a.gereqs is b.gereqs
+        assert a.subject is b.subject
+
+
+def test_cohort_missing_student(tmp_path):
+    path = str(tmp_path / "cohort.bin")
+    write_cohort(path, students)
+
+    with CohortFile.open(path) as cohort:
+        assert "300" not in cohort
+        with pytest.raises(KeyError):
+            cohort.courses("300")
+
+
+def test_cohort_unpacks_the_documents_that_were_packed(tmp_path):
+    typed = dict(row("4", "MATH", "220"), section=None, grade_points=3.0, grade_points_gpa=3, level=200, registrar_note={"a": [1, None]})
+    del typed["subjects"]
+    typed["subject"] = "MATH"
+    documents = students + [{"stnum": "150", "matriculation": 2018, "areas": [], "courses": [typed, row("5", "ART", "101")]}]
+
+    path = str(tmp_path / "cohort.bin")
+    write_cohort(path, json.loads(json.dumps(documents)))
+
+    with CohortFile.open(path) as cohort:
+        assert cohort.stnums() == ["100", "150", "200"]
+
+        for student in documents:
+            stnum = student["stnum"]
+            assert stnum in cohort
+            assert cohort.student(stnum) == student
+            assert cohort.courses(stnum) == tuple(load_course(r) for r in student["courses"])
+
+            data, courses = cohort.load(stnum)
+            assert data == student
+            assert courses == cohort.courses(stnum)
+
+        # the documents are copies, which can be changed safely
+        first = cohort.student("150")
+        first["courses"][0]["registrar_note"]["a"].append(2)
+        first["courses"][1]["attributes"].append("changed")
+        assert cohort.student("150") == documents[2]
+
+        assert "125" not in cohort
+        assert "999" not in cohort
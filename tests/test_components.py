@@ -0,0 +1,113 @@
+from degreepath.area import AreaOfStudy
+from degreepath.constants import Constants
+from degreepath.data import course_from_str
+from degreepath.rule.count import CountRule
+from degreepath.solution.query import QuerySolution
+
+c = Constants(matriculation_year=2000)
+
+# Inside of "Core", the two ART queries overlap with each other, and the two
+# MUSIC queries overlap with each other, but neither pair overlaps the other.
+specification = {
+    "result": {"all": [
+        {"requirement": "Core"},
+        {"requirement": "Capstone"},
+    ]},
+    "requirements": {
+        "Core": {
+            "result": {"all": [
+                {"from": "courses", "where": {"subject": {"$eq": "ART"}}, "assert": {"count(courses)": {"$gte": 3}}},
+                {"from": "courses", "where": {"$and": [{"subject": {"$eq": "ART"}}, {"level": {"$eq": 300}}]}, "assert": {"count(courses)": {"$gte": 1}}},
+                {"from": "courses", "where": {"subject": {"$eq": "MUSIC"}}, "assert": {"count(courses)": {"$gte": 2}}},
+                {"from": "courses", "where": {"$and": [{"subject": {"$eq": "MUSIC"}}, {"level": {"$eq": 300}}]}, "assert": {"count(courses)": {"$gte": 1}}},
+            ]},
+        },
+        "Capstone": {
+            "result": {"course": "CSCI 390"},
+        },
+    },
+}
+
+transcript = [course_from_str(s) for s in [
+    "ART 101", "ART 102", "ART 301", "ART 302",
+    "MUSIC 101", "MUSIC 201", "MUSIC 301",
+    "CSCI 390",
+]]
+
+
+def best_result(monkeypatch):
+    audited = []
+    real_audit = QuerySolution.audit
+    monkeypatch.setattr(QuerySolution, 'audit', lambda self, *, ctx: audited.append(self) or real_audit(self, ctx=ctx))
+
+    area = AreaOfStudy.load(c=c, specification=specification)
+
+    best = None
+    for solution in area.solutions(transcript=transcript, areas=[], exceptions=[]):
+        result = solution.audit()
+        if best is None or result.ok() or best.rank() < result.rank():
+            best = result
+        if result.ok():
+            break
+
+    assert best is not None
+    return best, len(audited)
+
+
+def test_components():
+    area = AreaOfStudy.load(c=c, specification=specification)
+    core = area.result.items[0].result
+    ctx = next(iter(area.solutions(transcript=transcript, areas=[], exceptions=[]))).context
+
+    components = core.find_components(items=core.items, ctx=ctx)
+    assert [[r.path[-2] for r in component] for component in components] == [["[0]", "[1]"], ["[2]", "[3]"]]
+    assert all(core.is_self_contained(component, ctx=ctx) for component in components)
+
+
+def test_components_are_solved_separately(monkeypatch):
+    decomposed, decomposed_audits = best_result(monkeypatch)
+
+    with monkeypatch.context() as m:
+        m.setattr(CountRule, 'is_self_contained', lambda self, component, *, ctx: False)
+        brute_force, brute_force_audits = best_result(m)
+
+    assert decomposed.ok() is True
+    assert decomposed.to_dict() == brute_force.to_dict()
+    assert decomposed_audits < brute_force_audits
+
+
+# The "Art" query is independent of everything else, but the root audits the
+# courses that it matches, so it can't be fixed at its first passing result.
+audited_specification = {
+    "result": {
+        "all": [{"requirement": "A"}, {"requirement": "B"}],
+        "audit": {"where": {"level": {"$eq": 300}}, "assert": {"count(courses)": {"$gte": 1}}},
+    },
+    "requirements": {
+        "A": {
+            "result": {"all": [{"requirement": "Art"}]},
+            "requirements": {
+                "Art": {
+                    "result": {"from": "courses", "where": {"subject": {"$eq": "ART"}}, "assert": {"count(courses)": {"$eq": 1}}},
+                },
+            },
+        },
+        "B": {
+            "result": {"from": "courses", "where": {"subject": {"$eq": "MUSIC"}}, "assert": {"count(courses)": {"$gte": 1}}},
+        },
+    },
+}
+
+
+def test_components_under_an_audit_are_not_fixed(monkeypatch):
+    solved = []
+    real_solve = CountRule.solve_independent_children
+    monkeypatch.setattr(CountRule, 'solve_independent_children', lambda self, *, ctx, independent_children: solved.extend(r.path for r in independent_children) or real_solve(self, ctx=ctx, independent_children=independent_children))
+
+    area = AreaOfStudy.load(c=c, specification=audited_specification)
+    a_count = area.result.items[0].result
+
+    results = [s.audit() for s in area.solutions(transcript=[course_from_str(s) for s in ["ART 101", "ART 301", "MUSIC 101"]], areas=[], exceptions=[])]
+
+    assert not any(path[:len(a_count.path)] == a_count.path for path in solved)
+    assert any(r.ok() for r in results)
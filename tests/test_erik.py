@@ -0,0 +1,275 @@
+import importlib.util
+import json
+import os
+import pathlib
+import uuid
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+# These tests need a throwaway Postgres database, e.g.
+#
+#     DP_TEST_DATABASE_URL=postgresql://localhost/dp_test pytest tests/test_erik.py
+#
+# Everything is created inside a fresh schema, which is dropped afterwards.
+#
+# The rest use a fake connection, and always run.
+DATABASE_URL = os.getenv('DP_TEST_DATABASE_URL', None)
+
+SCHEMA = """
+    CREATE TABLE result (
+        id serial PRIMARY KEY,
+        student_id text,
+        area_code text,
+        catalog text,
+        run integer,
+        input_data jsonb,
+        in_progress boolean,
+        iterations integer,
+        duration interval,
+        per_iteration interval,
+        rank numeric,
+        max_rank numeric,
+        result jsonb,
+        ok boolean,
+        ts timestamptz,
+        gpa numeric,
+        claimed_courses jsonb,
+        error jsonb
+    );
+
+    CREATE TABLE potential_clbids (
+        result_id integer,
+        clause_hash bigint,
+        clbids text[]
+    );
+"""
+
+
+def load_dp_erik():
+    path = pathlib.Path(__file__).parent.parent / 'dp-erik.py'
+    spec = importlib.util.spec_from_file_location('dp_erik', str(path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def conn():
+    if not DATABASE_URL:
+        pytest.skip("DP_TEST_DATABASE_URL is not set")
+
+    schema = f"dp_test_{uuid.uuid4().hex}"
+    connection = psycopg2.connect(DATABASE_URL)
+    with connection.cursor() as curs:
+        curs.execute(f"CREATE SCHEMA {schema}; SET search_path TO {schema};")
+        curs.execute(SCHEMA)
+    connection.commit()
+
+    try:
+        yield connection
+    finally:
+        connection.rollback()
+        with connection.cursor() as curs:
+            curs.execute(f"DROP SCHEMA {schema} CASCADE")
+        connection.commit()
+        connection.close()
+
+
+class FakeResult:
+    def to_dict(self):
+        return {"rank": "1.5", "max_rank": "2", "gpa": "3.50", "ok": True, "name": "tab\there \\ \"quoted\""}
+
+    def keyed_claims(self):
+        return {"0001": [["$", "A"]]}
+
+
+def test_bulk_writer_merges_staged_rows(conn):
+    dp_erik = load_dp_erik()
+    writer = dp_erik.BulkWriter(conn, batch_size=100)
+
+    for i in range(3):
+        start = dp_erik.AuditStartMsg(stnum=str(i), area_code="140", area_catalog="2019-20", student={"stnum": str(i), "note": "line\nbreak"})
+        result = dp_erik.ResultMsg(
+            result=FakeResult(), transcript=(), count=10, elapsed="2ms", iterations=[0.001],
+            startup_time=0.0, potentials_for_all_clauses={100 + i: ["0001", "0002"]},
+        )
+        writer.add(start=start, run_id=7, result=result)
+
+    failed = dp_erik.AuditStartMsg(stnum="9", area_code="140", area_catalog="2019-20", student={})
+    writer.add(start=failed, run_id=7, error={"error": "boom"})
+
+    assert writer.flush() == 4
+    assert writer.flush() == 0
+
+    with conn.cursor() as curs:
+        curs.execute("SELECT student_id, ok, result->>'name', input_data->>'note', error FROM result ORDER BY student_id")
+        rows = curs.fetchall()
+        curs.execute("SELECT r.student_id, p.clause_hash, p.clbids FROM potential_clbids p JOIN result r ON r.id = p.result_id ORDER BY 1")
+        potentials = curs.fetchall()
+
+    assert rows[0] == ("0", True, "tab\there \\ \"quoted\"", "line\nbreak", None)
+    assert rows[3] == ("9", None, None, None, json.loads('{"error": "boom"}'))
+    assert potentials == [("0", 100, ["0001", "0002"]), ("1", 101, ["0001", "0002"]), ("2", 102, ["0001", "0002"])]
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, sql):
+        if 'INSERT INTO result' in sql and self.conn.failing_merges:
+            self.conn.failing_merges -= 1
+            raise psycopg2.DatabaseError("merge failed")
+
+    def copy_expert(self, sql, file):
+        if 'result_staging' in sql:
+            self.conn.staged.append(file.getvalue().splitlines())
+
+    def fetchone(self):
+        return (len(self.conn.staged[-1]),)
+
+
+class FakeConnection:
+    """Records the rows that were COPY'd in each batch, and what was committed."""
+
+    def __init__(self):
+        self.staged = []
+        self.written = []
+        self.rollbacks = 0
+        self.failing_merges = 0
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.written.extend(self.staged)
+        self.staged = []
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.staged = []
+
+    def close(self):
+        self.closed = True
+
+
+def fake_outcome(dp_erik, stnum):
+    start = dp_erik.AuditStartMsg(stnum=stnum, area_code="140", area_catalog="2019-20", student={})
+    return start, None, {"error": "failed"}
+
+
+def test_bulk_writer_flushes_full_batches():
+    dp_erik = load_dp_erik()
+    conn = FakeConnection()
+    writer = dp_erik.BulkWriter(conn, batch_size=2)
+
+    counts = []
+    for stnum in "abcde":
+        start, _, error = fake_outcome(dp_erik, stnum)
+        counts.append(writer.add(start=start, run_id=1, error=error))
+
+    assert counts == [0, 2, 0, 2, 0]
+    assert [len(batch) for batch in conn.written] == [2, 2]
+
+    assert writer.flush() == 1
+    assert writer.flush() == 0
+    assert [len(batch) for batch in conn.written] == [2, 2, 1]
+
+
+def test_bulk_writer_records_a_batch_it_cannot_write_as_failed():
+    dp_erik = load_dp_erik()
+    conn = FakeConnection()
+    writer = dp_erik.BulkWriter(conn, batch_size=100)
+
+    start = dp_erik.AuditStartMsg(stnum="a", area_code="140", area_catalog="2019-20", student={})
+    result = dp_erik.ResultMsg(
+        result=FakeResult(), transcript=(), count=10, elapsed="2ms", iterations=[0.001],
+        startup_time=0.0, potentials_for_all_clauses={100: ["0001"]},
+    )
+    writer.add(start=start, run_id=1, result=result)
+    start, _, error = fake_outcome(dp_erik, "b")
+    writer.add(start=start, run_id=1, error=error)
+
+    # every audit in the batch still gets a row, as a failure
+    conn.failing_merges = 1
+    assert writer.flush() == 2
+    assert conn.rollbacks == 1
+
+    [batch] = conn.written
+    rows = [line.split('\t') for line in batch]
+    assert [row[1] for row in rows] == ["a", "b"]
+    assert all(column == '\\N' for row in rows for column in row[6:15])
+    assert json.loads(rows[0][15]) == {"error": "could not record the result: merge failed"}
+    assert json.loads(rows[1][15]) == {"error": "failed"}
+
+    # and if even that can't be written, the batch is raised
+    writer.add(start=start, run_id=1, error=error)
+    conn.failing_merges = 2
+    with pytest.raises(psycopg2.DatabaseError):
+        writer.flush()
+    assert writer.flush() == 0
+    assert len(conn.written) == 1
+
+
+def test_bulk_audit_records_every_job_and_counts_every_flush(monkeypatch):
+    dp_erik = load_dp_erik()
+    conn = FakeConnection()
+    monkeypatch.setattr(dp_erik, 'bulk_writer', dp_erik.BulkWriter(conn))
+
+    def audit_outcomes(*, student_file, area_file, archive_file):
+        if student_file == 'broken':
+            raise ValueError("unreadable student file")
+        yield fake_outcome(dp_erik, student_file)
+
+    monkeypatch.setattr(dp_erik, 'audit_outcomes', audit_outcomes)
+
+    chunk = [(stnum, 'area.yaml') for stnum in ['1', '2', 'broken', '4', '5']]
+    assert dp_erik.bulk_audit(chunk, None, 1, 2) == 4
+    assert [len(batch) for batch in conn.written] == [2, 2]
+
+    # a batch that can't be written at all is skipped, without ending the run
+    conn.failing_merges = 2
+    assert dp_erik.bulk_audit_star((chunk, None, 1, 2)) is None
+
+
+def test_bulk_main_counts_the_batches_it_lost_and_closes_its_connection(monkeypatch):
+    dp_erik = load_dp_erik()
+    conn = FakeConnection()
+    monkeypatch.setattr(dp_erik, 'connect', lambda: conn)
+
+    def audit_outcomes(*, student_file, area_file, archive_file):
+        if student_file == '3':
+            conn.failing_merges = 2
+        yield fake_outcome(dp_erik, student_file)
+
+    monkeypatch.setattr(dp_erik, 'audit_outcomes', audit_outcomes)
+
+    jobs = [(stnum, 'area.yaml') for stnum in ['1', '2', '3', '4', '5']]
+    assert dp_erik.bulk_main(jobs=jobs, archive_file=None, run_id=1, workers=1, batch_size=2) == 1
+    assert [len(batch) for batch in conn.written] == [2, 1]
+    assert conn.closed
+    assert dp_erik.bulk_writer is None
+
+
+def test_an_audit_that_raises_is_recorded_as_failed(monkeypatch):
+    dp_erik = load_dp_erik()
+    start, _, _ = fake_outcome(dp_erik, "1")
+
+    class Runner:
+        def run(self, args):
+            yield start
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(dp_erik, 'load_common', Runner)
+
+    outcomes = list(dp_erik.audit_outcomes(student_file="1.json", area_file="area.yaml", archive_file=None))
+    assert outcomes == [(start, None, {"error": "boom"})]
@@ -1,8 +1,10 @@
 from degreepath.area import AreaOfStudy
 from degreepath.data import course_from_str
 from degreepath.constants import Constants
+from degreepath.limit import LimitSet
 import pytest  # type: ignore
 import io
+import itertools
 import yaml
 import logging
 
@@ -82,8 +84,62 @@ def test_limits_esth(caplog):
     solutions = list(area.solutions(transcript=transcript, areas=[], exceptions=[]))
     course_sets = [list(s.solution.output) for s in solutions]
 
+    # the transcript without either STAT course is contained by the others, so it isn't tried
     assert course_sets == [
-        [psych_241],
         [psych_241, stat_212],
         [psych_241, ap_stat],
     ]
+
+
+def test_overlapping_limits():
+    limits = LimitSet.load([
+        {"at_most": 2, "where": {"subject": {"$eq": "BIO"}}},
+        {"at_most": 1, "where": {"level": {"$eq": 300}}},
+        {"at_most": 1, "where": {"subject": {"$eq": "CHEM"}}},
+    ], c=c)
+
+    transcript = [course_from_str(s) for s in ["BIO 101", "BIO 201", "BIO 301", "CHEM 301", "CHEM 110", "ART 101"]]
+    art_101 = transcript[-1]
+
+    # every set of courses that respects the limits (the ART course matches
+    # no limit, so it's always kept), and then the ones that no other one contains
+    feasible = [
+        frozenset(combo)
+        for n in range(len(transcript) + 1)
+        for combo in itertools.combinations(transcript, n)
+        if art_101 in combo and limits.check(sorted(combo))
+    ]
+    maximal = set(s for s in feasible if not any(s < other for other in feasible))
+
+    variants = list(limits.limited_transcripts(transcript))
+    assert len(variants) == len(set(variants)) == limits.count_limited_transcripts(transcript)
+    assert set(frozenset(v) for v in variants) == maximal
+
+    assert set(frozenset(v) for v in limits.limited_transcripts(transcript, maximal=False)) == set(feasible)
+
+
+def test_limits_with_unclaimed_query():
+    # the query judges every ART course that it sees, so it can only pass
+    # with a transcript that leaves out the limited courses with low grades
+    test_data = io.StringIO("""
+        limit:
+          - at_most: 2
+            where: {subject: {$eq: ART}}
+
+        result:
+          from: courses
+          where: {subject: {$eq: ART}}
+          claim: false
+          assert: {average(grades): {$gte: 3.5}}
+    """)
+
+    area = AreaOfStudy.load(specification=yaml.load(stream=test_data, Loader=yaml.SafeLoader), c=c)
+
+    transcript = [
+        course_from_str("ART 101", grade_code="A"),
+        course_from_str("ART 102", grade_code="C"),
+        course_from_str("ART 103", grade_code="C"),
+    ]
+
+    results = [s.audit() for s in area.solutions(transcript=transcript, areas=[], exceptions=[])]
+    assert any(r.ok() for r in results)
@@ -0,0 +1,21 @@
+from degreepath.area import AreaOfStudy
+from degreepath.base.requirement import render_message
+from degreepath.constants import Constants
+
+c = Constants(matriculation_year=2000)
+
+
+def test_messages_are_rendered_when_serialized():
+    area = AreaOfStudy.load(specification={
+        "result": {"requirement": "A"},
+        "requirements": {
+            "A": {"message": "Take *one* course.", "result": {"course": "DEPT 123"}},
+        },
+    }, c=c)
+
+    assert area.result.message == "Take *one* course."
+    assert area.result.to_dict()["message"] == "<p>Take <em>one</em> course.</p>"
+
+
+def test_rendered_messages_are_shared():
+    assert render_message("Some *text*") is render_message("Some *text*")
@@ -0,0 +1,107 @@
+from degreepath.data import load_course, course_from_str
+from degreepath.data import offering
+from degreepath.data.offering import clear_offering_pool, offering_pool_size
+
+
+def row(**kwargs):
+    return {
+        "attributes": ["csci_elective"],
+        "clbid": "0001",
+        "course_type": "SE",
+        "credits": "1.00",
+        "crsid": "0002",
+        "flag_gpa": True,
+        "flag_in_progress": False,
+        "flag_incomplete": False,
+        "flag_repeat": False,
+        "flag_stolaf": True,
+        "gereqs": ["FYW"],
+        "grade_code": "A",
+        "grade_option": "grade",
+        "grade_points": "4.00",
+        "grade_points_gpa": "4.00",
+        "level": 100,
+        "name": "Intro to Computing",
+        "number": "121",
+        "section": "A",
+        "sub_type": "",
+        "subject": "CSCI",
+        "term": "1",
+        "transcript_code": "",
+        "year": 2015,
+        **kwargs,
+    }
+
+
+def test_offerings_are_shared_between_students():
+    clear_offering_pool()
+
+    first = load_course(row())
+    second = load_course(row(grade_code="B", grade_points="3.00", grade_points_gpa="3.00", flag_repeat=True))
+
+    assert first.offering is second.offering
+    assert first.name is second.name
+    assert first.attributes is second.attributes
+    assert first.gereqs is second.gereqs
+    assert first.credits is second.credits
+    assert offering_pool_size() == 1
+
+    assert first.grade_code.value == "A" and second.grade_code.value == "B"
+    assert first.is_repeat is False and second.is_repeat is True
+    assert first != second
+
+
+def test_differing_offerings_are_not_merged():
+    clear_offering_pool()
+
+    first = load_course(row())
+    second = load_course(row(attributes=["csci_elective", "csci_core"]))
+
+    assert first.attributes == ("csci_elective",)
+    assert second.attributes == ("csci_elective", "csci_core")
+    assert offering_pool_size() == 2
+
+
+def test_derived_fields_come_from_the_offering():
+    clear_offering_pool()
+
+    course = course_from_str("CH/BI 125", sub_type="lab")
+
+    assert course.identity_ == "CH/BI 125.L"
+    assert course.is_lab is True
+    assert course.is_chbi_ is None
+
+
+def test_only_student_fields_are_kept_per_course():
+    clear_offering_pool()
+
+    course = load_course(row())
+
+    assert course.offering.name == "Intro to Computing"
+    assert not hasattr(course, '__dict__')
+    assert 'name' not in type(course).__slots__
+    assert course.to_dict()["name"] == "Intro to Computing"
+
+
+def test_changing_an_offering_field_recomputes_the_identity():
+    clear_offering_pool()
+
+    course = course_from_str("CSCI 121")
+    renamed = course.evolve_offering(subject="CH/BI", number="125")
+
+    assert renamed.identity_ == "CH/BI 125"
+    assert renamed.is_chbi_ == 125
+    assert renamed.grade_code is course.grade_code
+    assert course.identity_ == "CSCI 121"
+
+
+def test_the_pool_is_bounded(monkeypatch):
+    clear_offering_pool()
+    monkeypatch.setattr(offering, 'MAX_POOLED_OFFERINGS', 2)
+
+    first = load_course(row(clbid="1"))
+    load_course(row(clbid="2"))
+    load_course(row(clbid="3"))
+
+    assert offering_pool_size() == 1
+    assert first.clbid == "1"
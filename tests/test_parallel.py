@@ -0,0 +1,75 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from degreepath.area import AreaOfStudy
+from degreepath.audit import audit, ResultMsg
+from degreepath.constants import Constants
+from degreepath.data import course_from_str
+from degreepath.solve import solver_pool
+import pytest
+
+c = Constants(matriculation_year=2000)
+
+# each requirement matches a different department, so they're all independent
+specification = {
+    "result": {"all": [{"requirement": subject} for subject in ["ART", "MUSIC", "CSCI", "HIST"]]},
+    "requirements": {
+        subject: {
+            "result": {
+                "from": "courses",
+                "where": {"subject": {"$eq": subject}},
+                "all": [
+                    {"assert": {"count(courses)": {"$gte": 2}}},
+                    {"where": {"level": {"$eq": 300}}, "assert": {"count(courses)": {"$gte": 1}}},
+                ],
+            },
+        }
+        for subject in ["ART", "MUSIC", "CSCI", "HIST"]
+    },
+}
+
+transcript = tuple(course_from_str(s) for s in [
+    "ART 101", "ART 201", "ART 301",
+    "MUSIC 101", "MUSIC 201",
+    "CSCI 121", "CSCI 251", "CSCI 350", "CSCI 390",
+    "HIST 301",
+])
+
+
+def best_result(executor):
+    area = AreaOfStudy.load(c=c, specification=specification)
+    *_, msg = audit(
+        area=area,
+        transcript=transcript,
+        constants=c,
+        exceptions=[],
+        area_pointers=[],
+        print_all=False,
+        estimate_only=False,
+        executor=executor,
+    )
+    assert isinstance(msg, ResultMsg)
+    return msg.result
+
+
+@pytest.mark.parametrize("pool", [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_concurrent_results_match(pool, monkeypatch):
+    serial = best_result(None)
+
+    submitted = []
+    with pool(max_workers=2) as executor:
+        real_submit = executor.submit
+        monkeypatch.setattr(executor, 'submit', lambda fn, *args: submitted.append(args[0].path) or real_submit(fn, *args))
+        concurrent = best_result(executor)
+
+    assert len(submitted) == 4
+
+    assert serial.ok() is False
+    assert [r.ok() for r in serial.result.items] == [True, False, True, False]
+    assert concurrent.to_dict() == serial.to_dict()
+
+
+def test_solver_pool():
+    with solver_pool(1) as executor:
+        assert executor is None
+
+    with solver_pool(2) as executor:
+        assert executor is not None
@@ -0,0 +1,95 @@
+from degreepath.area import AreaOfStudy
+from degreepath.base import sort_by_path
+from degreepath.base.bases import path_sort_key
+from degreepath.constants import Constants
+from degreepath.data import course_from_str
+from degreepath.rule.count import child_solutions
+from degreepath.solution.count import CountSolution
+import functools
+import itertools
+import pytest
+
+
+def compare_path_tuples__lt(a, b):
+    """The comparator that paths were sorted with before path_sort_key."""
+    if len(a) < len(b):
+        return True
+    if len(b) < len(a):
+        return False
+
+    for _1, _2 in zip(a, b):
+        # convert indices to integers
+        if _1 and _1[0] == '[':
+            _1 = int(_1[1:-1])
+        if _2 and _2[0] == '[':
+            _2 = int(_2[1:-1])
+
+        if type(_1) is type(_2):
+            if _1 == _2:
+                continue
+            return _1 < _2
+        elif isinstance(_1, int):
+            return True
+        else:
+            return False
+
+    return True
+
+
+def compare_paths(a, b):
+    if a.path == b.path:
+        return 0
+    return -1 if compare_path_tuples__lt(a.path, b.path) else 1
+
+
+@pytest.mark.parametrize("a, b", [
+    (('$', '.count', '[2]'), ('$', '.count', '[10]')),
+    (('$', '.count'), ('$', '[10]')),
+    (('$', '[10]'), ('$', '.count')),
+    (('$', '.count', '[2]'), ('$', '.count')),
+    (('$', '.count', '[2]'), ('$', '.count', '[3]', '.count', '[1]')),
+    (('$', '.count', '[3]', '.count', '[1]'), ('$', '.count', '[3]', '.count', '[0]')),
+    (('$', '%Art'), ('$', '%Music')),
+    (('$', '.count', '[9]', '.query'), ('$', '.count', '[10]', '.query')),
+])
+def test_path_sort_key_matches_the_old_comparator(a, b):
+    assert (path_sort_key(a) < path_sort_key(b)) == compare_path_tuples__lt(a, b)
+    assert (path_sort_key(b) < path_sort_key(a)) == compare_path_tuples__lt(b, a)
+
+
+specification = {
+    "result": {
+        "count": 3,
+        "of": [{"course": f"DEPT {100 + i}"} for i in range(10)] + [
+            {"from": "courses", "where": {"subject": {"$eq": "ART"}}, "assert": {"count(courses)": {"$gte": 1}}},
+            {"from": "courses", "where": {"subject": {"$eq": "MUSIC"}}, "assert": {"count(courses)": {"$gte": 1}}},
+        ],
+    },
+}
+
+transcript = [course_from_str(s) for s in ["DEPT 102", "DEPT 109", "ART 101", "ART 102", "MUSIC 101", "MUSIC 102"]]
+
+
+def test_make_combinations_matches_sorting_each_solution_set():
+    c = Constants(matriculation_year=2000)
+    area = AreaOfStudy.load(c=c, specification=specification)
+    ctx = next(iter(area.solutions(transcript=transcript, areas=[], exceptions=[]))).context
+
+    rule = area.result
+    items = tuple(sorted((child for child in rule.items if child.has_potential(ctx=ctx)), key=sort_by_path))
+    all_children = set(rule.items)
+    assert len(items) == 4
+
+    combinations = list(rule.make_combinations(items=items, results=(), children_with_results=set(), all_children=all_children, r=3, count=3, ctx=ctx))
+
+    # what make_combinations used to do: sort every solution set on its own
+    expected = []
+    for selected in itertools.combinations(items, 3):
+        deselected = tuple(all_children.difference(selected))
+        for solution_set in itertools.product(*(child_solutions(child, ctx=ctx) for child in selected)):
+            expected.append(tuple(sorted(solution_set + deselected, key=functools.cmp_to_key(compare_paths))))
+
+    # the queries have several solutions each, so several slots are filled in
+    assert len(expected) > len(list(itertools.combinations(items, 3)))
+    assert all(isinstance(combo, CountSolution) for combo in combinations)
+    assert [combo.items for combo in combinations] == expected
@@ -0,0 +1,129 @@
+from degreepath.area import AreaOfStudy
+from degreepath.catalog import load_catalog, clear_catalog_cache
+from degreepath.clause import load_clause
+from degreepath.constants import Constants
+from degreepath import discover_potentials
+from degreepath.discover_potentials import discover_clause_potential, clear_potentials_cache
+import json
+import pytest
+
+c = Constants(matriculation_year=2018)
+
+
+def offering(clbid, subject, number, *, year=2019, attributes=(), gereqs=(), level=None):
+    return {
+        "clbid": clbid,
+        "course_type": "SE",
+        "crsid": clbid,
+        "name": f"{subject} {number}",
+        "subject": subject,
+        "number": number,
+        "level": level or int(number[0]) * 100,
+        "term": "1",
+        "year": year,
+        "attributes": list(attributes),
+        "gereqs": list(gereqs),
+    }
+
+
+OFFERINGS = [
+    offering("1", "CSCI", "121", attributes=["csci_elective"]),
+    offering("2", "CSCI", "251", attributes=["csci_elective", "csci_systems"]),
+    offering("3", "CSCI", "333", attributes=["csci_systems"], gereqs=["WRI"]),
+    offering("4", "MATH", "220"),
+    offering("5", "CH/BI", "125"),
+    offering("6", "CSCI", "251", year=2010, attributes=["csci_elective"]),
+]
+
+
+@pytest.fixture
+def catalog_file(tmp_path):
+    path = tmp_path / "catalog.jsonl"
+    path.write_text("\n".join(json.dumps(row) for row in OFFERINGS) + "\n")
+    yield str(path)
+    clear_catalog_cache()
+    clear_potentials_cache()
+
+
+@pytest.mark.parametrize("clause, expected", [
+    ({"attributes": {"$eq": "csci_elective"}}, ["1", "2"]),
+    ({"attributes": {"$in": ["csci_elective", "csci_systems"]}}, ["1", "2", "3"]),
+    ({"attributes": {"$neq": "csci_elective"}}, ["3", "4", "5"]),
+    ({"$and": [{"subject": {"$eq": "CSCI"}}, {"level": {"$gte": 200}}]}, ["2", "3"]),
+    ({"$or": [{"gereqs": {"$eq": "WRI"}}, {"subject": {"$eq": "CHEM"}}]}, ["3", "5"]),
+    ({"$or": [{"attributes": {"$eq": "csci_systems"}}, {"number": {"$eq": "220"}}]}, ["2", "3", "4"]),
+])
+def test_catalog_matches_the_clause(catalog_file, clause, expected):
+    catalog = load_catalog(catalog_file)
+    loaded = load_clause(clause, c=c)
+
+    assert catalog.matching_clbids(loaded, since_year=c.matriculation_year) == expected
+
+    # the index only narrows the search; the answer matches checking every course
+    brute_force = sorted(set(
+        course.clbid
+        for course in catalog.courses
+        if course.year >= c.matriculation_year and loaded.apply(course)
+    ))
+    assert brute_force == expected
+
+
+area_spec = {
+    "name": "Test",
+    "type": "concentration",
+    "code": "001",
+    "result": {
+        "all": [
+            {"from": "courses", "where": {"attributes": {"$eq": "csci_elective"}}, "assert": {"count(courses)": {"$gte": 1}}},
+            {"from": "courses", "where": {"subject": {"$eq": "MATH"}}, "assert": {"count(courses)": {"$gte": 1}}},
+        ],
+    },
+}
+
+
+def test_discovers_potentials_from_a_local_catalog(catalog_file, monkeypatch):
+    monkeypatch.delenv('POTENTIALS_URL', raising=False)
+    area = AreaOfStudy.load(specification=area_spec, c=c)
+
+    potentials = discover_clause_potential(area, c, catalog_file=catalog_file)
+
+    assert sorted(potentials.values()) == [["1", "2"], ["4"]]
+    assert all(isinstance(key, int) for key in potentials)
+
+
+def test_potentials_are_cached_per_clause_and_matriculation(catalog_file, tmp_path, monkeypatch):
+    monkeypatch.delenv('POTENTIALS_CATALOG', raising=False)
+    area = AreaOfStudy.load(specification=area_spec, c=c)
+
+    calls = []
+
+    def fake_request(url, clause, matriculation):
+        calls.append((url, matriculation))
+        return ["1"]
+
+    monkeypatch.setattr(discover_potentials, 'request_clause_potential', fake_request)
+
+    cache_root = str(tmp_path / "cache")
+    first = discover_clause_potential(area, c, url="http://potentials.invalid", cache_root=cache_root)
+    assert len(calls) == 2
+
+    discover_clause_potential(area, c, url="http://potentials.invalid", cache_root=cache_root)
+    assert len(calls) == 2
+
+    # the on-disk cache survives the in-process one
+    clear_potentials_cache()
+    again = discover_clause_potential(area, c, url="http://potentials.invalid", cache_root=cache_root)
+    assert len(calls) == 2
+    assert again == first
+
+    # another matriculation year is another question
+    discover_clause_potential(area, Constants(matriculation_year=2010), url="http://potentials.invalid", cache_root=cache_root)
+    assert len(calls) == 4
+
+
+def test_no_source_means_no_potentials(monkeypatch):
+    monkeypatch.delenv('POTENTIALS_URL', raising=False)
+    monkeypatch.delenv('POTENTIALS_CATALOG', raising=False)
+    area = AreaOfStudy.load(specification=area_spec, c=c)
+
+    assert discover_clause_potential(area, c) == {}
@@ -0,0 +1,168 @@
+from degreepath.area import AreaOfStudy
+from degreepath.audit import ResultMsg
+from degreepath.constants import Constants
+from degreepath.data import load_course
+from degreepath.entrypoint import load_common
+from degreepath import projection
+from degreepath.projection import analyze_area, project_transcript, clear_projected_results
+import pytest
+import yaml
+
+c = Constants(matriculation_year=2015)
+
+spec = """
+name: Test Minor
+type: concentration
+code: '900'
+
+result:
+  all:
+    - requirement: Intro
+    - requirement: Electives
+
+requirements:
+  Intro:
+    result:
+      count: 1
+      of:
+        - course: DEPT 121
+        - course: DEPT 125
+
+  Electives:
+    result:
+      from: courses
+      where: {attributes: {$eq: dept_elective}}
+      assert: {count(courses): {$gte: 2}}
+"""
+
+
+def row(clbid, number, *, subject="DEPT", attributes=(), grade="A"):
+    return {
+        "attributes": list(attributes), "clbid": clbid, "course_type": "SE", "credits": "1.00", "crsid": f"{subject}{number}",
+        "flag_gpa": True, "flag_in_progress": False, "flag_incomplete": False, "flag_repeat": False, "flag_stolaf": True,
+        "gereqs": [], "grade_code": grade, "grade_option": "grade", "grade_points": "4.00", "grade_points_gpa": "4.00",
+        "level": int(number[0]) * 100, "name": f"{subject} {number} ({clbid})", "number": number, "section": "A",
+        "sub_type": "", "subject": subject, "term": "1", "transcript_code": "", "year": 2016,
+    }
+
+
+def student(stnum, courses, **changes):
+    return {"stnum": stnum, "matriculation": "2015", "areas": [], "exceptions": [], "courses": courses, **changes}
+
+
+# the same relevant courses, under different clbids, with unrelated courses mixed in
+alice = student("1", [
+    row("100", "121"),
+    row("105", "250", attributes=["dept_elective"]),
+    row("110", "260", attributes=["dept_elective"]),
+    row("120", "101", subject="ART"),
+])
+bobby = student("2", [
+    row("900", "110", subject="MUSIC"),
+    row("905", "121"),
+    row("910", "250", attributes=["dept_elective"]),
+    row("915", "260", attributes=["dept_elective"]),
+    row("920", "350", subject="ENGL"),
+])
+carol = student("3", [
+    row("300", "125"),
+    row("305", "250", attributes=["dept_elective"]),
+])
+
+
+def load(data):
+    return tuple(load_course(r) for r in data['courses'])
+
+
+def test_analysis():
+    area = AreaOfStudy.load(specification=yaml.safe_load(spec), c=c)
+    analysis = analyze_area(area)
+
+    assert analysis.projectable is True
+    assert analysis.courses == frozenset(["DEPT 121", "DEPT 125"])
+
+    major = AreaOfStudy.load(specification=yaml.safe_load(spec.replace("type: concentration", "type: major")), c=c)
+    assert analyze_area(major).projectable is False
+
+    unfiltered = yaml.safe_load(spec)
+    del unfiltered["requirements"]["Electives"]["result"]["where"]
+    assert analyze_area(AreaOfStudy.load(specification=unfiltered, c=c)).projectable is False
+
+
+def test_projections_ignore_irrelevant_courses_and_clbids():
+    area = AreaOfStudy.load(specification=yaml.safe_load(spec), c=c)
+    analysis = analyze_area(area)
+
+    a = project_transcript(analysis, transcript=load(alice), transcript_with_failed=load(alice))
+    b = project_transcript(analysis, transcript=load(bobby), transcript_with_failed=load(bobby))
+    x = project_transcript(analysis, transcript=load(carol), transcript_with_failed=load(carol))
+
+    assert a.transcript == b.transcript
+    assert a.transcript != x.transcript
+    assert [course.clbid for course in b.courses] == ["905", "910", "915"]
+
+
+@pytest.fixture
+def common(monkeypatch):
+    monkeypatch.delenv('DP_CACHE_DIR', raising=False)
+    monkeypatch.delenv('POTENTIALS_URL', raising=False)
+    monkeypatch.delenv('POTENTIALS_CATALOG', raising=False)
+    clear_projected_results()
+
+    module = load_common()
+    audits = []
+    real_audit = module.audit
+
+    def counting_audit(**kwargs):
+        audits.append(kwargs)
+        return real_audit(**kwargs)
+
+    monkeypatch.setattr(module, 'audit', counting_audit)
+    yield module, audits
+    clear_projected_results()
+
+
+def final_result(common, area_file, data, *, dedupe):
+    messages = list(common.audit_student(data, load(data), area_files=[str(area_file)], dedupe=dedupe))
+    assert isinstance(messages[-1], ResultMsg)
+    return messages[-1]
+
+
+def test_shared_projections_are_audited_once(common, tmp_path, monkeypatch):
+    module, audits = common
+    area_file = tmp_path / "900.yaml"
+    area_file.write_text(spec)
+
+    direct = {s["stnum"]: final_result(module, area_file, s, dedupe=False) for s in (alice, bobby, carol)}
+    assert len(audits) == 3
+
+    projected_audits = []
+    real_audit = projection.audit
+    monkeypatch.setattr(projection, 'audit', lambda **kwargs: projected_audits.append(kwargs) or real_audit(**kwargs))
+
+    deduped = {s["stnum"]: final_result(module, area_file, s, dedupe=True) for s in (alice, bobby, carol)}
+    assert len(audits) == 3
+    assert len(projected_audits) == 2
+
+    for stnum, msg in deduped.items():
+        assert msg.result.to_dict() == direct[stnum].result.to_dict()
+        assert msg.result.keyed_claims() == direct[stnum].result.keyed_claims()
+        assert msg.result.gpa() == direct[stnum].result.gpa()
+        assert msg.transcript == direct[stnum].transcript
+
+    assert "905" in deduped["2"].result.keyed_claims()
+
+
+def test_exceptions_skip_the_projection(common, tmp_path, monkeypatch):
+    module, audits = common
+    area_file = tmp_path / "900.yaml"
+    area_file.write_text(spec)
+
+    projected = []
+    monkeypatch.setattr(module, 'audit_projection', lambda *args, **kwargs: projected.append(args) or iter([]))
+
+    exception = {"area_code": "900", "type": "override", "path": ["$", "%Intro"], "status": "pass"}
+    final_result(module, area_file, student("4", alice["courses"], exceptions=[exception]), dedupe=True)
+
+    assert projected == []
+    assert len(audits) == 1
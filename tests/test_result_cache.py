@@ -0,0 +1,177 @@
+from degreepath.audit import Arguments, AuditStartMsg, ExceptionMsg, ResultMsg
+from degreepath.data import load_course
+from degreepath.entrypoint import load_common
+from degreepath.warm_start import SearchHints
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import attr
+import json
+import pytest
+
+spec = """
+name: Test Major
+type: concentration
+code: '140'
+degree: B.A.
+
+result:
+  all:
+    - course: DEPT 123
+"""
+
+course = {
+    "attributes": [], "clbid": "0001", "course_type": "SE", "credits": "1.00", "crsid": "0002",
+    "flag_gpa": True, "flag_in_progress": False, "flag_incomplete": False, "flag_repeat": False, "flag_stolaf": True,
+    "gereqs": [], "grade_code": "A", "grade_option": "grade", "grade_points": "4.00", "grade_points_gpa": "4.00",
+    "level": 100, "name": "A Course", "number": "123", "section": "", "sub_type": "", "subject": "DEPT",
+    "term": "1", "transcript_code": "", "year": 2015,
+}
+
+
+def student(**changes):
+    return {"stnum": "123", "matriculation": "2015", "areas": [], "exceptions": [], "courses": [course], **changes}
+
+
+@pytest.fixture
+def common(tmp_path, monkeypatch):
+    monkeypatch.setenv('DP_CACHE_DIR', str(tmp_path / "cache"))
+    monkeypatch.delenv('POTENTIALS_URL', raising=False)
+    monkeypatch.delenv('POTENTIALS_CATALOG', raising=False)
+
+    module = load_common()
+    audits = []
+    real_audit = module.audit
+
+    def counting_audit(**kwargs):
+        audits.append(kwargs)
+        return real_audit(**kwargs)
+
+    monkeypatch.setattr(module, 'audit', counting_audit)
+    module.audits = audits
+    yield module
+    del module.audits
+
+
+def run_audit(common, area_file, data, **kwargs):
+    courses = tuple(load_course(row) for row in data['courses'])
+    return list(common.audit_student(data, courses, area_files=[str(area_file)], **kwargs))
+
+
+def test_unchanged_audits_come_from_the_cache(common, tmp_path):
+    area_file = tmp_path / "140.yaml"
+    area_file.write_text(spec)
+
+    first = run_audit(common, area_file, student())
+    second = run_audit(common, area_file, student())
+
+    assert len(common.audits) == 1
+    assert isinstance(second[0], AuditStartMsg)
+    assert isinstance(second[-1], ResultMsg)
+    assert second[-1].result.to_dict() == first[-1].result.to_dict()
+    assert second[-1].transcript == first[-1].transcript
+
+
+def test_changes_miss_the_cache(common, tmp_path):
+    area_file = tmp_path / "140.yaml"
+    area_file.write_text(spec)
+
+    run_audit(common, area_file, student())
+
+    exception = {"area_code": "140", "type": "override", "path": ["$", "*DEPT 123"], "status": "pass"}
+    run_audit(common, area_file, student(exceptions=[exception]))
+    assert len(common.audits) == 2
+
+    run_audit(common, area_file, student(courses=[dict(course, grade_code="B", grade_points="3.00")]))
+    assert len(common.audits) == 3
+
+    run_audit(common, area_file, student(matriculation="2016"))
+    assert len(common.audits) == 4
+
+    area_file.write_text(spec.replace("Test Major", "Another Major"))
+    result = run_audit(common, area_file, student())
+    assert len(common.audits) == 5
+    assert result[-1].result.to_dict()["name"] == "Another Major"
+
+    # runs that print every result always audit
+    run_audit(common, area_file, student(), print_all=True)
+    assert len(common.audits) == 6
+
+
+def test_warm_starts_are_cached_by_their_hints(common, tmp_path):
+    area_file = tmp_path / "140.yaml"
+    area_file.write_text(spec)
+
+    hints = SearchHints(claimed={("$",): frozenset(["0001"])}, selected={("$",): frozenset([("$", "*DEPT 123")])})
+    same_hints = SearchHints(claimed={("$",): frozenset(("0001",))}, selected={("$",): frozenset([("$", "*DEPT 123")])})
+    other_hints = SearchHints(claimed={("$",): frozenset(["0002"])})
+
+    run_audit(common, area_file, student())
+    run_audit(common, area_file, student(), warm_start=hints)
+    assert len(common.audits) == 2
+    assert common.audits[-1]["warm_start"] is hints
+
+    run_audit(common, area_file, student(), warm_start=same_hints)
+    assert len(common.audits) == 2
+
+    run_audit(common, area_file, student(), warm_start=other_hints)
+    assert len(common.audits) == 3
+
+    run_audit(common, area_file, student())
+    assert len(common.audits) == 3
+
+
+def test_warm_starts_only_apply_to_their_own_audit(common, tmp_path):
+    area_file = tmp_path / "140.yaml"
+    area_file.write_text(spec)
+
+    run_audit(common, area_file, student())
+
+    # hints from another student's audit, or another area, are ignored, and
+    # so don't split the cache either
+    for hints in [SearchHints(claimed={("$",): frozenset(["0001"])}, stnum="456", area_code="140"),
+                  SearchHints(claimed={("$",): frozenset(["0001"])}, stnum="123", area_code="150")]:
+        run_audit(common, area_file, student(), warm_start=hints)
+        assert len(common.audits) == 1
+
+    hints = SearchHints(claimed={("$",): frozenset(["0001"])}, stnum="123", area_code="140")
+    run_audit(common, area_file, student(), warm_start=hints)
+    assert len(common.audits) == 2
+    assert common.audits[-1]["warm_start"] is hints
+
+
+def test_anonymous_warm_starts_need_a_single_audit(common, tmp_path):
+    area_file = tmp_path / "140.yaml"
+    area_file.write_text(spec)
+    student_files = []
+    for stnum in ["123", "456"]:
+        student_file = tmp_path / f"{stnum}.json"
+        student_file.write_text(json.dumps(student(stnum=stnum)))
+        student_files.append(str(student_file))
+
+    warm_start_file = tmp_path / "previous.json"
+    warm_start_file.write_text(json.dumps({"type": "count", "path": ["$"], "ok": True, "items": []}))
+
+    args = Arguments(area_files=[str(area_file)], student_files=student_files, archive_file=None, warm_start_file=str(warm_start_file))
+    [msg] = list(common.run(args))
+    assert isinstance(msg, ExceptionMsg)
+    assert "can only warm-start a single audit" in str(msg.ex)
+
+    msgs = list(common.run(attr.evolve(args, student_files=student_files[:1])))
+    assert isinstance(msgs[-1], ResultMsg)
+
+
+@pytest.mark.parametrize("pool", [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_results_are_cached_with_solver_workers(common, tmp_path, pool):
+    area_file = tmp_path / "140.yaml"
+    area_file.write_text(spec)
+
+    with pool(max_workers=2) as executor:
+        first = run_audit(common, area_file, student(), executor=executor)
+        second = run_audit(common, area_file, student(), executor=executor)
+
+    assert isinstance(first[-1], ResultMsg)
+    assert first[-1].result.context.executor is not None
+
+    assert len(common.audits) == 1
+    assert isinstance(second[-1], ResultMsg)
+    assert second[-1].result.to_dict() == first[-1].result.to_dict()
+    assert second[-1].result.context.executor is None
@@ -0,0 +1,66 @@
+from degreepath.area import AreaOfStudy
+from degreepath.base import BaseCountRule, BaseRequirementRule
+from degreepath.constants import Constants
+from degreepath.data import course_from_str
+import attr
+
+c = Constants(matriculation_year=2000)
+
+specification = {
+    "result": {"all": [
+        {"requirement": "Art"},
+        {"requirement": "Music"},
+    ]},
+    "requirements": {
+        "Art": {
+            "result": {"from": "courses", "where": {"subject": {"$eq": "ART"}}, "assert": {"count(courses)": {"$gte": 2}}},
+        },
+        "Music": {
+            "result": {"from": "courses", "where": {"subject": {"$eq": "MUSIC"}}, "assert": {"count(courses)": {"$gte": 2}}},
+        },
+    },
+}
+
+transcript = [course_from_str(s) for s in ["ART 101", "ART 102", "MUSIC 101"]]
+
+
+def audit_area():
+    area = AreaOfStudy.load(c=c, specification=specification)
+    return next(iter(area.solutions(transcript=transcript, areas=[], exceptions=[]))).audit()
+
+
+def test_aggregates_are_computed_once(monkeypatch):
+    result = audit_area()
+
+    ranked = []
+    real_count_rank = BaseCountRule.rank
+    real_requirement_rank = BaseRequirementRule.rank
+    monkeypatch.setattr(BaseCountRule, 'rank', lambda self: ranked.append(self.path) or real_count_rank(self))
+    monkeypatch.setattr(BaseRequirementRule, 'rank', lambda self: ranked.append(self.path) or real_requirement_rank(self))
+
+    for _ in range(3):
+        result.rank()
+        result.ok()
+        result.to_dict()
+
+    # the count and the requirements work out their rank at most once (some
+    # were already ranked while the children were being solved)
+    assert len(ranked) == len(set(ranked))
+    assert ranked.count(result.result.path) == 1
+
+
+def test_aggregates_match_the_uncached_values():
+    result = audit_area()
+    count = result.result
+
+    assert count.ok() is False
+    assert count.rank() == BaseCountRule.rank(count)
+    assert count.max_rank() == BaseCountRule.max_rank(count)
+    assert count.claims() == BaseCountRule.claims(count)
+    assert {c.course() for c in result.matched()} == {"ART 101", "ART 102", "MUSIC 101"}
+    assert result.matched() == {claim.get_course() for claim in result.claims()}
+
+    # changing a result makes a new one, which doesn't share the old values
+    evolved = attr.evolve(count, count=1)
+    assert evolved.ok() is True
+    assert count.ok() is False
@@ -0,0 +1,66 @@
+from degreepath.schedule import CostModel, load_history, longest_first, schedule_report
+import sqlite3
+
+
+def write_history(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE result (
+            id INTEGER PRIMARY KEY, iterations INTEGER, duration TEXT, student_id TEXT, area_code TEXT, catalog TEXT,
+            in_progress BOOLEAN, run INTEGER, error TEXT, per_iteration TEXT, rank NUMERIC, max_rank NUMERIC,
+            result TEXT, ok BOOLEAN, ts TEXT, gpa NUMERIC
+        )
+    """)
+    conn.executemany("""
+        INSERT INTO result (student_id, catalog, area_code, duration, per_iteration, in_progress, error, ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+
+
+def test_predictions_from_history(tmp_path):
+    path = str(tmp_path / "results.db")
+    write_history(path, [
+        ("100", "2019-20", "140", "1m 5.4s", "~2ms", False, None, "2019-10-01"),
+        ("100", "2019-20", "140", "30s", "~2ms", False, None, "2019-10-02"),
+        ("200", "2019-20", "140", "10s", "~1ms", False, None, "2019-10-02"),
+        ("300", "2019-20", "140", "15s", "~1ms", False, None, "2019-10-02"),
+        ("400", "2019-20", "140", "1s", None, True, None, "2019-10-02"),
+        ("500", "2019-20", "140", "2s", None, False, "failed", "2019-10-02"),
+    ])
+
+    model = load_history(path)
+
+    # the most recent duration wins
+    assert model.predict(("100", "2019-20", "140")).seconds == 30.0
+    assert model.predict(("100", "2019-20", "140")).source == "history"
+
+    # unfinished and failed audits are ignored, and fall back to the area's median
+    assert model.predict(("400", "2019-20", "140")).seconds == 15.0
+    assert model.predict(("400", "2019-20", "140")).source == "area"
+
+    estimated = model.predict(("100", "2019-20", "150"), estimate=lambda job: 2_000)
+    assert estimated.source == "estimate"
+    assert estimated.seconds == 2_000 * 0.0015
+
+    assert model.predict(("100", "2019-20", "150")).source == "default"
+
+
+def test_longest_jobs_are_dispatched_first():
+    jobs = [("1", "c", "a"), ("2", "c", "b"), ("3", "c", "a"), ("2", "c", "b")]
+    model = CostModel.from_history({("2", "c", "b"): 60.0, ("1", "c", "a"): 1.0, ("3", "c", "a"): 3.0})
+    predictions = {job: model.predict(job) for job in jobs}
+
+    order = longest_first(jobs, predictions)
+    assert order == [1, 3, 2, 0]
+
+    report = list(schedule_report(
+        [jobs[i] for i in order],
+        predictions=predictions,
+        actuals={("1", "c", "a"): 1.0, ("2", "c", "b"): 50.0, ("3", "c", "a"): 3.0},
+        workers=2,
+        elapsed=50.5,
+    ))
+    assert report[0] == "predictions: 4 from history"
+    assert report[1] == "makespan: predicted 63.00s, actual 50.50s (over 2 workers)"
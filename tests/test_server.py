@@ -0,0 +1,150 @@
+import json
+import os
+import signal
+import stat
+import threading
+import time
+
+from degreepath.audit import AuditStartMsg, ResultMsg, ExceptionMsg, ProgressMsg
+from degreepath.server import AuditServer, request_audit, worker_main
+
+spec = """
+name: Test Major
+type: concentration
+code: '140'
+degree: B.A.
+
+result:
+  all:
+    - course: DEPT 123
+"""
+
+course = {
+    "attributes": [], "clbid": "0001", "course_type": "SE", "credits": "1.00", "crsid": "0002",
+    "flag_gpa": True, "flag_in_progress": False, "flag_incomplete": False, "flag_repeat": False, "flag_stolaf": True,
+    "gereqs": [], "grade_code": "A", "grade_option": "grade", "grade_points": "4.00", "grade_points_gpa": "4.00",
+    "level": 100, "name": "A Course", "number": "123", "section": "", "sub_type": "", "subject": "DEPT",
+    "term": "1", "transcript_code": "", "year": 2015,
+}
+
+student = {"stnum": "123", "matriculation": "2015", "areas": [], "exceptions": [], "courses": [course]}
+
+
+def test_server_audits_and_streams_messages(tmp_path):
+    (tmp_path / "areas" / "2019-20").mkdir(parents=True)
+    (tmp_path / "areas" / "2019-20" / "140.yaml").write_text(spec)
+
+    server = AuditServer(socket_path=str(tmp_path / "dp.sock"), areas_dir=str(tmp_path / "areas"), workers=1)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    try:
+        messages = list(request_audit(server.socket_path, student=student, area_code="140", catalog="2019-20", progress=False))
+
+        assert isinstance(messages[0], AuditStartMsg)
+        assert isinstance(messages[-1], ResultMsg)
+        assert not any(isinstance(m, ProgressMsg) for m in messages)
+        assert messages[-1].result.ok() is True
+        assert messages[-1].result.to_dict()["name"] == "Test Major"
+
+        # exceptions in the request replace the student's own
+        exception = {"area_code": "140", "type": "override", "path": ["$", "*DEPT 123"], "status": "pass"}
+        excepted = list(request_audit(server.socket_path, student=json.loads(json.dumps(student)), area_code="140", catalog="2019-20", exceptions=[exception]))
+        assert excepted[0].student["exceptions"] == [exception]
+
+        invalid = list(request_audit(server.socket_path, student=student, area_code="../140", catalog="2019-20"))
+        assert len(invalid) == 1
+        assert isinstance(invalid[0], ExceptionMsg)
+    finally:
+        server.shutdown()
+        thread.join()
+
+    assert not (tmp_path / "dp.sock").exists()
+
+
+def test_a_dead_worker_fails_its_job_and_is_replaced(tmp_path):
+    (tmp_path / "areas" / "2019-20").mkdir(parents=True)
+    (tmp_path / "areas" / "2019-20" / "140.yaml").write_text(spec)
+
+    server = AuditServer(socket_path=str(tmp_path / "dp.sock"), areas_dir=str(tmp_path / "areas"), workers=1)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    try:
+        assert stat.S_IMODE(os.stat(server.socket_path).st_mode) == 0o600
+
+        # once the worker has preloaded the areas, give it one that it'll
+        # wait on forever: reading a fifo that nothing writes to
+        list(request_audit(server.socket_path, student=student, area_code="140", catalog="2019-20"))
+        (tmp_path / "areas" / "2020-21").mkdir()
+        os.mkfifo(tmp_path / "areas" / "2020-21" / "140.yaml")
+
+        messages = []
+        client = threading.Thread(target=lambda: messages.extend(request_audit(server.socket_path, student=student, area_code="140", catalog="2020-21")))
+        client.start()
+
+        deadline = time.monotonic() + 30
+        while not server._running and time.monotonic() < deadline:
+            time.sleep(0.05)
+        (pid, _), = server._running.items()
+        os.kill(pid, signal.SIGKILL)
+
+        client.join(timeout=30)
+        assert not client.is_alive()
+        assert isinstance(messages[-1], ExceptionMsg)
+        assert "exited with code" in str(messages[-1].ex)
+
+        # the worker's replacement takes the next audit
+        again = list(request_audit(server.socket_path, student=student, area_code="140", catalog="2019-20", progress=False))
+        assert isinstance(again[-1], ResultMsg)
+        assert server._workers[0].pid != pid
+    finally:
+        server.shutdown()
+        thread.join()
+
+
+def vanishing_worker(areas_dir, jobs, results, marker):
+    # the first worker takes a job and dies before it can announce it; its
+    # replacement is an ordinary worker
+    if os.path.exists(marker):
+        return worker_main(areas_dir, jobs, results)
+
+    with open(marker, 'w'):
+        pass
+    jobs.get()
+    os._exit(1)
+
+
+class VanishingWorkerServer(AuditServer):
+    def _start_worker(self):
+        marker = os.path.join(self.areas_dir, 'vanished')
+        worker = self._context.Process(target=vanishing_worker, args=(self.areas_dir, self._jobs, self._results, marker), daemon=True)
+        worker.start()
+        return worker
+
+
+def test_a_worker_that_dies_before_announcing_its_job_fails_it(tmp_path):
+    (tmp_path / "areas" / "2019-20").mkdir(parents=True)
+    (tmp_path / "areas" / "2019-20" / "140.yaml").write_text(spec)
+
+    server = VanishingWorkerServer(socket_path=str(tmp_path / "dp.sock"), areas_dir=str(tmp_path / "areas"), workers=1)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    try:
+        messages = []
+        client = threading.Thread(target=lambda: messages.extend(request_audit(server.socket_path, student=student, area_code="140", catalog="2019-20")))
+        client.start()
+        client.join(timeout=30)
+
+        assert not client.is_alive()
+        assert len(messages) == 1
+        assert isinstance(messages[0], ExceptionMsg)
+        assert "exited with code 1" in str(messages[0].ex)
+        assert not server._unannounced
+
+        again = list(request_audit(server.socket_path, student=student, area_code="140", catalog="2019-20", progress=False))
+        assert isinstance(again[-1], ResultMsg)
+    finally:
+        server.shutdown()
+        thread.join()
@@ -0,0 +1,103 @@
+from degreepath.audit import ResultMsg
+from degreepath.clause import SingleClause
+from degreepath.data import load_course
+from degreepath.entrypoint import load_common
+from degreepath.session import StudentSession, partition_transcript
+import pickle
+import pytest
+
+minor = """
+name: Test Minor
+type: minor
+code: '{code}'
+
+result:
+  from: courses
+  where: {{attributes: {{$eq: elective}}}}
+  assert: {{count(courses): {{$gte: 2}}}}
+"""
+
+
+def row(clbid, number, *, grade="A", **changes):
+    return {
+        "attributes": ["elective"], "clbid": clbid, "course_type": "SE", "credits": "1.00", "crsid": f"DEPT{number}",
+        "flag_gpa": True, "flag_in_progress": False, "flag_incomplete": False, "flag_repeat": False, "flag_stolaf": True,
+        "gereqs": [], "grade_code": grade, "grade_option": "grade", "grade_points": "4.00", "grade_points_gpa": "4.00",
+        "level": 200, "name": f"DEPT {number}", "number": number, "section": "A",
+        "sub_type": "", "subject": "DEPT", "term": "1", "transcript_code": "", "year": 2016, **changes,
+    }
+
+
+rows = [
+    row("1", "201"),
+    row("2", "202", grade="F"),
+    row("3", "203", grade="W"),
+    row("4", "204", grade_option="audit"),
+    row("5", "205", transcript_code="R"),
+    row("6", "206"),
+]
+
+student = {
+    "stnum": "100",
+    "matriculation": "2015",
+    "areas": [],
+    "exceptions": [{"area_code": "901", "type": "override", "path": ["$", ".query"], "status": "pass"}],
+    "courses": rows,
+}
+
+
+@pytest.fixture
+def common(monkeypatch):
+    monkeypatch.delenv('DP_CACHE_DIR', raising=False)
+    monkeypatch.delenv('POTENTIALS_URL', raising=False)
+    monkeypatch.delenv('POTENTIALS_CATALOG', raising=False)
+    return load_common()
+
+
+def test_partition_matches_the_filters(common):
+    courses = [load_course(r) for r in rows]
+    transcript, transcript_with_failed = partition_transcript(courses)
+
+    assert transcript == tuple(common.filter_transcript(courses))
+    assert transcript_with_failed == tuple(common.filter_transcript(courses, include_failed=True))
+    assert [c.clbid for c in transcript_with_failed] == ["1", "2", "6"]
+
+
+def test_sessions_share_matches_between_areas(common, tmp_path, monkeypatch):
+    area_files = []
+    for code in ("900", "901", "902"):
+        (tmp_path / f"{code}.yaml").write_text(minor.format(code=code))
+        area_files.append(str(tmp_path / f"{code}.yaml"))
+
+    courses = tuple(load_course(r) for r in rows)
+    session = StudentSession.load(student, courses)
+    assert [len(session.exceptions_for(code)) for code in ("900", "901")] == [0, 1]
+
+    applied = []
+    real_apply = SingleClause.apply
+    monkeypatch.setattr(SingleClause, 'apply', lambda self, item: applied.append(item) or real_apply(self, item))
+
+    results = [msg for msg in common.audit_student(student, courses, area_files=area_files) if isinstance(msg, ResultMsg)]
+
+    # the clause is checked against each course once, for all three areas
+    assert len(applied) == len(session.transcript)
+    assert [r.result.ok() for r in results] == [True, True, True]
+
+    # and each area's result is the same as it is when audited alone
+    for area_file, shared in zip(area_files, results):
+        alone = [msg for msg in common.audit_student(student, courses, area_files=[area_file]) if isinstance(msg, ResultMsg)]
+        assert alone[0].result.to_dict() == shared.result.to_dict()
+
+
+def test_indexes_are_not_pickled_with_results(common, tmp_path):
+    (tmp_path / "900.yaml").write_text(minor.format(code="900"))
+
+    courses = tuple(load_course(r) for r in rows)
+    result = [msg for msg in common.audit_student(student, courses, area_files=[str(tmp_path / "900.yaml")]) if isinstance(msg, ResultMsg)][0]
+
+    assert result.result.context.indexes is not None
+    assert result.result.context.indexes.matches
+
+    restored = pickle.loads(pickle.dumps(result))
+    assert restored.result.context.indexes is None
+    assert restored.result.to_dict() == result.result.to_dict()
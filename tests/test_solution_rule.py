@@ -0,0 +1,41 @@
+from degreepath.area import AreaOfStudy
+from degreepath.constants import Constants
+from degreepath.data import course_from_str
+from degreepath.solution.course import CourseSolution
+from degreepath.solution.query import QuerySolution
+
+c = Constants(matriculation_year=2000)
+
+specification = {
+    "result": {"all": [
+        {"course": "CSCI 121"},
+        {"from": "courses", "where": {"subject": {"$eq": "ART"}}, "assert": {"count(courses)": {"$gte": 1}}},
+    ]},
+}
+
+transcript = [course_from_str(s) for s in ["CSCI 121", "ART 101", "ART 102"]]
+
+
+def test_solutions_share_their_rule():
+    area = AreaOfStudy.load(c=c, specification=specification)
+    course_rule, query_rule = area.result.items
+    solutions = list(area.solutions(transcript=transcript, areas=[], exceptions=[]))
+    ctx = solutions[0].context
+
+    courses = list(course_rule.solutions(ctx=ctx))
+    queries = list(query_rule.solutions(ctx=ctx))
+
+    assert all(isinstance(s, CourseSolution) and s.rule is course_rule for s in courses)
+    assert all(isinstance(s, QuerySolution) and s.rule is query_rule for s in queries)
+    assert {c.course() for s in queries for c in s.output} == {"ART 101", "ART 102"}
+
+    query = queries[0]
+    assert query.where == query_rule.where
+    assert query.to_dict()["where"] == query_rule.to_dict()["where"]
+    assert query.to_dict()["output"] == [x.to_dict() for x in query.output]
+
+    result = solutions[0].audit().result
+    assert result.ok() is True
+    assert [r.path for r in result.items] == [course_rule.path, query_rule.path]
+    assert result.items[0].course == "CSCI 121"
+    assert result.items[1].where == query_rule.where
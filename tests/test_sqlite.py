@@ -0,0 +1,248 @@
+import importlib.util
+import json
+import os
+import pathlib
+import time
+
+import pytest
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+
+@pytest.fixture
+def dp_sqlite():
+    spec = importlib.util.spec_from_file_location('dp_sqlite', ROOT / 'dp-sqlite.py')
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / 'results.db')
+
+
+def start(key, stnum):
+    return ('start', key, {"student_id": stnum, "area_code": "140", "catalog": "2019-20", "run": 1})
+
+
+def record(key, *, count=10, ok=True):
+    columns = {
+        "total_count": count,
+        "elapsed": "1s",
+        "avg_iter_time": "1ms",
+        "result": json.dumps({}),
+        "rank": 1,
+        "max_rank": 2,
+        "gpa": 3.5,
+        "ok": ok,
+    }
+    return ('record', key, columns, [(123, json.dumps(["1", "2"]))])
+
+
+def rows(conn):
+    return [dict(row) for row in conn.execute("SELECT * FROM result ORDER BY id")]
+
+
+def test_writes_are_held_until_the_batch_is_full(dp_sqlite, db):
+    with dp_sqlite.connect(db) as conn:
+        dp_sqlite.init_tables(conn=conn)
+        writer = dp_sqlite.ResultWriter(conn, batch_size=3, flush_interval=3600)
+
+        writer.apply(start('a', '100'))
+        writer.apply(start('b', '200'))
+        assert rows(conn) == []
+        assert writer.result_id('a') is None
+
+        writer.apply(start('c', '300'))
+        assert [row["student_id"] for row in rows(conn)] == ['100', '200', '300']
+        assert [writer.result_id(key) for key in 'abc'] == [1, 2, 3]
+
+
+def test_only_the_latest_progress_is_written(dp_sqlite, db):
+    with dp_sqlite.connect(db) as conn:
+        dp_sqlite.init_tables(conn=conn)
+
+        updates = []
+        real_executemany = dp_sqlite.sqlite3.Connection.executemany
+
+        class Conn(dp_sqlite.sqlite3.Connection):
+            def executemany(self, sql, params):
+                params = list(params)
+                if 'SET iterations = :count' in sql:
+                    updates.extend(params)
+                return real_executemany(self, sql, params)
+
+        conn.close()
+        conn = dp_sqlite.sqlite3.connect(db, isolation_level=None, factory=Conn)
+        conn.row_factory = dp_sqlite.sqlite3.Row
+
+        with dp_sqlite.ResultWriter(conn, batch_size=100, flush_interval=3600) as writer:
+            writer.apply(start('a', '100'))
+            writer.flush()
+
+            for count in [1000, 2000, 3000]:
+                writer.apply(('progress', 'a', count))
+
+        assert updates == [{"result_id": 1, "count": 3000}]
+        assert rows(conn)[0]["iterations"] == 3000
+        assert rows(conn)[0]["in_progress"] == 1
+        conn.close()
+
+
+def test_a_finished_audit_skips_its_progress(dp_sqlite, db):
+    with dp_sqlite.connect(db) as conn:
+        dp_sqlite.init_tables(conn=conn)
+
+        with dp_sqlite.ResultWriter(conn, batch_size=100, flush_interval=3600) as writer:
+            writer.apply(start('a', '100'))
+            writer.apply(('progress', 'a', 5))
+            writer.apply(record('a', count=10))
+
+        [row] = rows(conn)
+        assert row["iterations"] == 10
+        assert row["in_progress"] == 0
+        assert row["ok"] == 1
+        assert writer.result_id('a') is None
+
+        potentials = [dict(r) for r in conn.execute("SELECT * FROM potential_clbids")]
+        assert potentials == [{"result_id": 1, "clause_hash": 123, "clbids": '["1", "2"]'}]
+
+
+def test_leaving_the_writer_flushes_everything(dp_sqlite, db):
+    with dp_sqlite.connect(db) as conn:
+        dp_sqlite.init_tables(conn=conn)
+
+        with dp_sqlite.ResultWriter(conn, batch_size=100, flush_interval=3600) as writer:
+            writer.apply(start('a', '100'))
+            writer.apply(record('a'))
+            writer.apply(start('b', '200'))
+            writer.apply(('error', 'b', {"error": "boom"}))
+            writer.apply(start('c', '300'))
+            assert rows(conn) == []
+
+        result = rows(conn)
+        assert [(row["student_id"], row["in_progress"]) for row in result] == [('100', 0), ('200', 0), ('300', 1)]
+        assert json.loads(result[1]["error"]) == {"error": "boom"}
+
+
+def test_writers_sharing_a_database_get_distinct_ids(dp_sqlite, db):
+    with dp_sqlite.connect(db) as first, dp_sqlite.connect(db) as second:
+        dp_sqlite.init_tables(conn=first)
+
+        one = dp_sqlite.ResultWriter(first, batch_size=100, flush_interval=3600)
+        two = dp_sqlite.ResultWriter(second, batch_size=100, flush_interval=3600)
+
+        one.apply(start('a', '100'))
+        two.apply(start('a', '200'))
+        one.apply(start('b', '300'))
+
+        # the second writer takes the write lock first, so its ids come first
+        two.flush()
+        one.flush()
+
+        assert two.result_id('a') == 1
+        assert [one.result_id('a'), one.result_id('b')] == [2, 3]
+        assert [row["student_id"] for row in rows(first)] == ['200', '100', '300']
+
+        # and a writer can't allocate ids while another holds the lock
+        second.execute("BEGIN IMMEDIATE")
+        first.execute("pragma busy_timeout = 0")
+        one.apply(start('c', '400'))
+        with pytest.raises(dp_sqlite.sqlite3.OperationalError):
+            one.flush()
+        second.execute("ROLLBACK")
+
+
+def test_late_writes_for_a_finished_audit_are_dropped(dp_sqlite, db):
+    with dp_sqlite.connect(db) as conn:
+        dp_sqlite.init_tables(conn=conn)
+        writer = dp_sqlite.ResultWriter(conn, batch_size=100, flush_interval=3600)
+
+        # a dead worker's audit is failed, and its record shows up afterwards
+        writer.apply(start('a', '100'))
+        writer.flush()
+        writer.apply(('error', 'a', {"error": "the worker exited with code 1"}))
+        writer.flush()
+        writer.apply(record('a'))
+        writer.apply(('progress', 'a', 5))
+        writer.flush()
+
+        # a record and an error for the same audit, in one batch
+        writer.apply(start('b', '200'))
+        writer.apply(record('b'))
+        writer.apply(('error', 'b', {"error": "boom"}))
+        writer.flush()
+
+        # writes for an audit that never started
+        writer.apply(record('c'))
+        writer.flush()
+
+        a, b = rows(conn)
+        assert (a["in_progress"], a["ok"], json.loads(a["error"])) == (0, None, {"error": "the worker exited with code 1"})
+        assert (b["in_progress"], b["ok"], b["error"]) == (0, 1, None)
+        assert [dict(r)["result_id"] for r in conn.execute("SELECT * FROM potential_clbids")] == [2]
+
+
+class DeadProcess:
+    pid = 1234
+    exitcode = -9
+
+    def is_alive(self):
+        return False
+
+
+def test_a_dead_workers_last_writes_are_kept(dp_sqlite, db, monkeypatch):
+    with dp_sqlite.connect(db) as conn:
+        dp_sqlite.init_tables(conn=conn)
+
+        with dp_sqlite.ResultWriter(conn, batch_size=100, flush_interval=3600) as writer:
+            pool = dp_sqlite.WorkerPool(writer, jobs=[('1', 'area.yaml'), ('2', 'area.yaml')], run_id=1)
+            pool.ops = dp_sqlite.queue.Queue()
+            monkeypatch.setattr(pool, 'start', lambda index: None)
+
+            # the worker finished one audit and started another before it
+            # died, but none of that had been read yet
+            pool._procs, pool._tasks, pool._assigned = [DeadProcess()], [None], [0]
+            pool._pending.popleft()
+            for op in [start((0, 0), '1'), record((0, 0)), start((0, 1), '1')]:
+                pool.ops.put(op)
+
+            pool.check_workers()
+
+            # and a start that it sent just before dying arrives late
+            pool.handle(start((0, 2), '1'))
+            pool.handle(record((0, 2)))
+
+        result = rows(conn)
+        assert [(row["ok"], row["in_progress"]) for row in result] == [(1, 0), (None, 0), (None, 0)]
+        assert json.loads(result[1]["error"]) == {"error": "the worker exited with code -9"}
+        assert json.loads(result[2]["error"]) == {"error": "the worker exited with code -9"}
+
+
+def crashing_audit_ops(*, job_id, student_file, area_file, run_id):
+    key = (job_id, 0)
+    yield start(key, student_file)
+    if student_file == 'crash':
+        # give the start time to reach the writer, and then kill the worker
+        # outright, as a segfault or the OOM killer would
+        time.sleep(0.5)
+        os._exit(1)
+    yield record(key)
+
+
+def test_a_dead_worker_fails_its_audits_and_is_replaced(dp_sqlite, db, monkeypatch):
+    monkeypatch.setattr(dp_sqlite, 'audit_ops', crashing_audit_ops)
+    monkeypatch.setattr(dp_sqlite, 'WORKER_CHECK_INTERVAL', 0.1)
+
+    jobs = [(stnum, 'area.yaml') for stnum in ['1', '2', 'crash', '4', '5', '6']]
+    dp_sqlite.main(jobs=jobs, run_id=1, db=db, workers=2, flush_interval=0.1)
+
+    with dp_sqlite.connect(db) as conn:
+        result = {row["student_id"]: row for row in rows(conn)}
+
+    assert set(result) == {'1', '2', 'crash', '4', '5', '6'}
+    assert all(row["in_progress"] == 0 for row in result.values())
+    assert all(row["ok"] == 1 for stnum, row in result.items() if stnum != 'crash')
+    assert json.loads(result['crash']["error"]) == {"error": "the worker exited with code 1"}
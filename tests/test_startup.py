@@ -0,0 +1,75 @@
+from typing import Dict
+import os
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+# `-X importtime` is new in Python 3.7 (and so is the lazy package __init__)
+pytestmark = pytest.mark.skipif(sys.version_info < (3, 7), reason="requires python 3.7+")
+
+# `python dp.py --help` should only need the standard library. If any of these
+# show up, something at the top of an entry point has started importing eagerly.
+HEAVY_MODULES = ('degreepath.area', 'degreepath.audit', 'requests', 'prettyprinter', 'yaml', 'dotenv', 'markdown')
+
+# the time spent importing modules beyond what a bare interpreter imports;
+# generous, because CI machines are slow and noisy
+BUDGET_MS = float(os.getenv('DP_STARTUP_BUDGET_MS', '75'))
+
+
+def import_times(*args: str) -> Dict[str, int]:
+    """Runs python with -X importtime and returns each module's self time, in microseconds."""
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True,
+    )
+
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(self_us)
+
+    return times
+
+
+def test_help_does_not_import_the_engine():
+    imported = import_times('dp.py', '--help')
+
+    assert [m for m in HEAVY_MODULES if m in imported] == []
+
+
+def test_help_import_time_budget():
+    baseline = import_times('-c', 'pass')
+    imported = import_times('dp.py', '--help')
+
+    extra_ms = sum(us for name, us in imported.items() if name not in baseline) / 1000
+
+    assert extra_ms < BUDGET_MS
+
+
+def test_package_imports_lazily():
+    imported = import_times('-c', 'import degreepath, degreepath.ms, degreepath.discover_potentials; degreepath.Constants')
+
+    assert 'degreepath.constants' in imported
+    assert 'degreepath.discover_potentials' in imported
+    assert 'requests' not in imported
+
+
+def test_modules_import_on_their_own():
+    # now that the package root no longer imports everything, each module has
+    # to be importable first, without relying on another import order
+    package = ROOT / 'degreepath'
+    modules = sorted(f"degreepath.{path.stem}" for path in package.glob('*.py') if path.stem != '__init__')
+
+    failed = []
+    for module in modules:
+        process = subprocess.run([sys.executable, '-c', f'import {module}'], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if process.returncode != 0:
+            failed.append(module)
+
+    assert failed == []
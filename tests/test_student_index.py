@@ -0,0 +1,48 @@
+from degreepath import student_index
+from degreepath.student_index import open_index, update_index, query_index
+import json
+import os
+
+
+def write_student(directory, stnum, *codes):
+    path = directory / f"{stnum}.json"
+    areas = [{"code": code, "name": f"Area {code}", "kind": "major", "status": "declared", "degree": "B.A.", "dept": ""} for code in codes]
+    path.write_text(json.dumps({"stnum": stnum, "catalog": "2019", "areas": areas, "courses": []}))
+    return path
+
+
+def codes(conn):
+    return sorted((stnum, code) for stnum, _, code, _, _ in query_index(conn, "1 = 1"))
+
+
+def test_updates_are_incremental(tmp_path):
+    write_student(tmp_path, "100", "140")
+    write_student(tmp_path, "200", "140", "150")
+    conn = open_index(str(tmp_path / "index.sqlite3"))
+
+    assert update_index(conn, str(tmp_path)) == (2, 0)
+    assert codes(conn) == [("100", "140"), ("200", "140"), ("200", "150")]
+    assert update_index(conn, str(tmp_path)) == (0, 0)
+
+    # a changed file is re-read, and a deleted one is forgotten
+    changed = write_student(tmp_path, "100", "160")
+    os.utime(changed, ns=(0, 0))
+    os.unlink(tmp_path / "200.json")
+
+    assert update_index(conn, str(tmp_path)) == (1, 1)
+    assert codes(conn) == [("100", "160")]
+
+    assert [r[0] for r in query_index(conn, "code = '160' and type = 'major'")] == ["100"]
+
+    indexes = {name for name, in conn.execute("select name from sqlite_master where type = 'index'")}
+    assert {"area_code_idx", "area_catalog_idx", "area_type_idx"} <= indexes
+
+
+def test_files_are_parsed_in_a_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(student_index, 'POOL_THRESHOLD', 2)
+    for stnum in range(10):
+        write_student(tmp_path, str(stnum), "140")
+    conn = open_index(str(tmp_path / "index.sqlite3"))
+
+    assert update_index(conn, str(tmp_path), workers=2) == (10, 0)
+    assert codes(conn) == sorted((str(stnum), "140") for stnum in range(10))
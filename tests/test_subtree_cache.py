@@ -0,0 +1,61 @@
+from degreepath.area import AreaOfStudy
+from degreepath.constants import Constants
+from degreepath.data import course_from_str
+from degreepath.rule import count
+from degreepath.solution.query import QuerySolution
+
+c = Constants(matriculation_year=2000)
+
+# the limit makes three transcripts (one with each BIO 1xx course), but only
+# "Biology" can see the difference between them
+specification = {
+    "limit": [
+        {"at_most": 1, "where": {"$and": [{"subject": {"$eq": "BIO"}}, {"level": {"$eq": 100}}]}},
+    ],
+    "result": {"all": [
+        {"requirement": "Biology"},
+        {"requirement": "Music"},
+    ]},
+    "requirements": {
+        "Biology": {
+            "result": {"from": "courses", "where": {"subject": {"$eq": "BIO"}}, "assert": {"count(courses)": {"$gte": 3}}},
+        },
+        "Music": {
+            "result": {"from": "courses", "where": {"subject": {"$eq": "MUSIC"}}, "assert": {"count(courses)": {"$gte": 3}}},
+        },
+    },
+}
+
+real_audit = QuerySolution.audit
+
+transcript = [course_from_str(s) for s in [
+    "BIO 101", "BIO 102", "BIO 103", "BIO 201",
+    "MUSIC 101", "MUSIC 102",
+]]
+
+
+def audit_area(monkeypatch):
+    audited = []
+    monkeypatch.setattr(QuerySolution, 'audit', lambda self, *, ctx: audited.append(self.path[3]) or real_audit(self, ctx=ctx))
+
+    area = AreaOfStudy.load(c=c, specification=specification)
+    results = [solution.audit() for solution in area.solutions(transcript=transcript, areas=[], exceptions=[])]
+
+    return results, audited
+
+
+def test_unaffected_subtrees_are_reused(monkeypatch):
+    cached, cached_audits = audit_area(monkeypatch)
+
+    with monkeypatch.context() as m:
+        m.setattr(count, 'subtree_key', lambda rule, *, ctx: None)
+        uncached, uncached_audits = audit_area(m)
+
+    assert len(cached) == len(uncached) == 3
+    assert [r.to_dict() for r in cached] == [r.to_dict() for r in uncached]
+    assert all(r.ok() is False for r in cached)
+
+    # "Music" is solved once, instead of once per transcript
+    assert cached_audits.count('%Music') == 1
+    assert uncached_audits.count('%Music') == 3
+    assert cached_audits.count('%Biology') == uncached_audits.count('%Biology')
@@ -0,0 +1,148 @@
+from degreepath.area import AreaOfStudy
+from degreepath.audit import audit, ResultMsg
+from degreepath.constants import Constants
+from degreepath.data import load_course
+from degreepath.solution.query import QuerySolution
+from degreepath.warm_start import hints_from_result, hints_from_row
+import json
+import yaml
+
+c = Constants(matriculation_year=2015)
+
+spec = """
+name: Test Minor
+type: concentration
+code: '900'
+
+result:
+  all:
+    - requirement: Electives
+
+requirements:
+  Electives:
+    result:
+      from: courses
+      where: {attributes: {$eq: elective}}
+      all:
+        - assert: {count(courses): {$gte: 3}}
+        - assert: {count(subjects): {$gte: 2}}
+"""
+
+
+def row(clbid, number, *, subject="DEPT"):
+    return {
+        "attributes": ["elective"], "clbid": clbid, "course_type": "SE", "credits": "1.00", "crsid": f"{subject}{number}",
+        "flag_gpa": True, "flag_in_progress": False, "flag_incomplete": False, "flag_repeat": False, "flag_stolaf": True,
+        "gereqs": [], "grade_code": "A", "grade_option": "grade", "grade_points": "4.00", "grade_points_gpa": "4.00",
+        "level": int(number[0]) * 100, "name": f"{subject} {number}", "number": number, "section": "A",
+        "sub_type": "", "subject": subject, "term": "1", "transcript_code": "", "year": 2016,
+    }
+
+
+courses = [row("10", "201"), row("11", "202"), row("12", "203"), row("13", "204"), row("20", "101", subject="ART")]
+
+
+def run(transcript, *, warm_start=None):
+    area = AreaOfStudy.load(specification=yaml.safe_load(spec), c=c)
+    transcript = tuple(load_course(r) for r in transcript)
+    *_, msg = audit(
+        area=area,
+        transcript=transcript,
+        constants=c,
+        exceptions=[],
+        area_pointers=[],
+        print_all=False,
+        estimate_only=False,
+        warm_start=warm_start,
+    )
+    assert isinstance(msg, ResultMsg)
+    return msg
+
+
+def previous_hints():
+    previous = run(courses)
+    assert previous.result.ok() is True
+    assert set(previous.result.keyed_claims()) == {"10", "11", "20"}
+
+    # round-trip through JSON, like a stored result
+    return hints_from_result(json.loads(json.dumps(previous.result.to_dict())))
+
+
+def count_attempts(monkeypatch):
+    attempts = []
+    real_audit = QuerySolution.audit
+
+    def counting_audit(self, **kwargs):
+        attempts.append(self.output)
+        return real_audit(self, **kwargs)
+
+    monkeypatch.setattr(QuerySolution, 'audit', counting_audit)
+    return attempts
+
+
+def test_warm_start_tries_the_previous_choice_first(monkeypatch):
+    # a new course sorts ahead of the old ones, so a cold audit changes course
+    transcript = [row("05", "205"), *courses]
+    hints = previous_hints()
+    attempts = count_attempts(monkeypatch)
+
+    cold = run(transcript)
+    cold_attempts = len(attempts)
+    attempts.clear()
+
+    warm = run(transcript, warm_start=hints)
+
+    assert cold.result.ok() is True
+    assert warm.result.ok() is True
+    assert len(attempts) == 1
+    assert cold_attempts > len(attempts)
+    assert set(warm.result.keyed_claims()) == {"10", "11", "20"}
+
+
+def test_warm_start_falls_back_to_the_full_search(monkeypatch):
+    # without one of the previous courses, the hint can't pass the assertion
+    transcript = [c for c in courses if c["clbid"] != "11"]
+    hints = previous_hints()
+    attempts = count_attempts(monkeypatch)
+
+    cold = run(transcript)
+    cold_attempts = list(attempts)
+    attempts.clear()
+
+    warm = run(transcript, warm_start=hints)
+
+    assert warm.result.to_dict() == cold.result.to_dict()
+    assert attempts == cold_attempts
+
+    # and without enough courses to pass at all, the best result is unchanged
+    transcript = [c for c in courses if c["clbid"] in ("10", "20")]
+
+    cold = run(transcript)
+    warm = run(transcript, warm_start=previous_hints())
+
+    assert cold.result.ok() is False
+    assert warm.result.to_dict() == cold.result.to_dict()
+
+
+def test_hints_from_row():
+    result = run(courses).result.to_dict()
+
+    from_row = hints_from_row({"result": json.dumps(result)})
+    assert from_row == hints_from_result(result)
+    assert frozenset(["10", "11", "20"]) in from_row.claimed.values()
+
+
+def test_hints_remember_where_they_came_from():
+    result = run(courses).result.to_dict()
+
+    hints = hints_from_row({"result": json.dumps(result), "student_id": "123", "area_code": "900"})
+    assert (hints.stnum, hints.area_code) == ("123", "900")
+    assert hints.applies_to(stnum="123", area_code="900")
+    assert not hints.applies_to(stnum="456", area_code="900")
+    assert not hints.applies_to(stnum="123", area_code="140")
+
+    # a bare result names its area, but not its student
+    hints = hints_from_result(result)
+    assert (hints.stnum, hints.area_code) == (None, "900")
+    assert hints.applies_to(stnum="456", area_code="900")
+    assert not hints.applies_to(stnum="456", area_code="140")